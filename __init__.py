@@ -1,32 +1,108 @@
 # -*- coding: utf-8 -*-
 
-import argparse, codecs, unicodedata, regex as regexlib
+import argparse, bisect, codecs, copy, functools, hashlib, json, multiprocessing, os, random, sys, tempfile, threading, timeit, unicodedata, warnings, regex as regexlib
 from ply import lex, yacc
-from collections import namedtuple, deque
+from collections import namedtuple, defaultdict, deque, OrderedDict
+from fractions import Fraction
+
+try:
+    from . import parsetab
+except (ImportError, ValueError, SystemError): # not imported as a package, e.g. when running tests.py
+    import parsetab
+
+try:
+    from . import lextab
+except (ImportError, ValueError, SystemError):
+    try:
+        import lextab
+    except ImportError: # not generated yet, lex will (re)generate it
+        lextab = 'lextab'
 
 try:
     unicode
 except NameError: # python 3
     unicode = str
 
+try:
+    unichr
+except NameError: # python 3
+    unichr = chr
+
 
-def oprex(source_code):
+def oprex(source_code, **options):
     source_lines = sanitize(source_code)
-    lexer = build_lexer(source_lines)
-    result = parse(lexer=lexer)
-    cleanup(lexer=lexer)
-    return result
+    return translate(source_lines, Options(**options)).regex
+
+
+class Options(namedtuple('Options', 'share_definitions factor_literals possessify atomize refuse_backtracking peephole prune order_lookaheads evaluate_charclasses canonicalize_charclasses keep_captures')):
+    # translation options, all off by default so the output is a literal translation of the source:
+    # share_definitions -- None, or the minimum length of a definition's regex for it to be emitted once
+    #                      in a (?(DEFINE)...) block and called with (?N) instead of inlined -- as a
+    #                      numbered group, so the match objects' group names are the same as without sharing
+    # factor_literals   -- factor the string-literal branches of OR-blocks into a prefix trie
+    # possessify        -- make greedy quantifiers possessive where giving back characters can't help
+    # atomize           -- make OR-blocks atomic where backtracking into them can't help: no two branches
+    #                      can match at the same position, nor any of them in more than one way
+    # refuse_backtracking -- None, or a severity from SEVERITIES: raise OprexBacktrackingError instead of
+    #                      returning a regex with a backtracking risk that severe or worse, see analyze()
+    # peephole          -- leave out redundant groups & flags, merge nested quantifiers, hoist scoped flags that
+    #                      are the same wherever they matter to the global flags
+    # prune             -- leave out what can never match, e.g. OR-block branches with FAIL! in them (captures
+    #                      in them stay as groups, never set), each reported with an OprexWarning, see prune()
+    # order_lookaheads  -- try the lookaheads next to each other cheapest first, see order_lookaheads()
+    # evaluate_charclasses -- emit the character classes with set operations in them as the ranges they
+    #                      come to, where that's sure to match the same, see evaluated_class()
+    # canonicalize_charclasses -- emit the other character classes with their items merged and sorted, so the
+    #                      same class comes out the same whichever way it's written, see canonical_class()
+    # keep_captures     -- None, or the names of the captures the caller needs: the others are emitted as
+    #                      plain definitions, unless a backreference, conditional or recursion needs them
+    __slots__ = ()
+    def __new__(cls, *args, **kwargs):
+        options = super(Options, cls).__new__(cls, *args, **kwargs)
+        if options.keep_captures is not None: # hashable & JSON-able, for the caches
+            options = options._replace(keep_captures=tuple(sorted(set(options.keep_captures))))
+        return options
+super(Options, Options).__new__.__defaults__ = (None, False, False, False, None, False, False, False, False, False, None)
+DEFAULT_OPTIONS = Options()
+
+
+class Translation(namedtuple('Translation', 'regex capture_names shared_definitions inlined_size atomized pruned')):
+    # capture_names: the captures of the source
+    # shared_definitions: names of the definitions emitted in the (?(DEFINE)...) block, as numbered groups
+    # inlined_size: length of the regex with every definition inlined, i.e. without sharing
+    # atomized: line numbers of the OR-blocks made atomic by the atomize option
+    # pruned: the Pruned parts left out by the prune option
+    __slots__ = ()
+Translation.__new__.__defaults__ = ((), None, (), ())
+
+
+def translate(source_lines, options=DEFAULT_OPTIONS):
+    return get_compiler().translate(source_lines, options)
+
+
+def analyze(source_code, **options):
+    # the catastrophic-backtracking risks of the regex the source translates to, as Findings sorted by
+    # line number, see backtracking_risks()
+    source_lines = sanitize(source_code)
+    return get_compiler().analyze(source_lines, Options(**options))
 
 
 class OprexError(Exception):
     def __init__(self, lineno, msg):
+        self.lineno = lineno
+        self.msg = msg
         msg = msg.replace('\t', ' ')
         if lineno:
             msg = 'Line %d: %s' % (lineno, msg)
         Exception.__init__(self, '\n' + msg)
 
+    def __reduce__(self): # for pickling, e.g. when sent back from a worker process
+        return self.__class__, (self.lineno, self.msg)
+
 class OprexSyntaxError(OprexError): pass
 class OprexInternalError(OprexError): pass
+class OprexBacktrackingError(OprexError): pass
+class OprexWarning(UserWarning): pass
 
 
 def sanitize(source_code):
@@ -98,7 +174,7 @@ tokens = [
     'STRING',
     'VARNAME',
     'WHITESPACE',
-] + list(reserved.values())
+] + sorted(reserved.values()) # sorted, so the grammar signature (thus parsetab validity) doesn't depend on dict ordering
 
 GLOBALMARK   = '*)'
 t_AT         = r'\@'
@@ -168,6 +244,7 @@ class VariableLookup(object):
             return self.get_value(scope)
         elif self.varname in lexer.ongoing_declarations:
             lexer.ongoing_declarations[self.varname].capture = True
+            lexer.references.append(self) # a recursion, needs the capture
             return Regex(self.varname, modifier='(?&') 
         else:
             raise OprexSyntaxError(self.lineno, "'%s' is not defined" % self.varname)
@@ -199,36 +276,87 @@ class Backreference(VariableLookup):
 
 
 class MatchUntil(VariableLookup):
+    # __ matches the characters up to where the limiter -- the lookup after it in the chain -- can match.
+    # When the limiter can only start with some characters, that's an unrolled loop (normal* (special normal*)*):
+    # runs of the other characters, and the limiter's first characters only where the limiter doesn't match,
+    # e.g. (?>[^E]*(?:E(?!ND)[^E]*)*) for __? before 'END'. Atomic, as what follows can't match any earlier.
     def resolve(self, scope, lexer):
-        value = '.'
         limiter = self.next_lookup_in_chain
+        first_chars = None
         if isinstance(limiter, VariableLookup):
-            limiter_value = limiter.resolve(scope, lexer)
-            if isinstance(limiter_value, CharClass):
-                value = limiter_value.negated()
-            elif isinstance(limiter_value, StringLiteral):
-                prefixed = limiter_value[:2] in (r'\b', r'\B')
-                if prefixed:
-                    prefix = limiter_value[:2]
-                    limiter_value = limiter_value[2:]
-                if limiter_value != '':
-                    if limiter_value.startswith('\\'):
-                        first_char = ESCAPE_SEQUENCE_RE.match(limiter_value).group(0)
-                    else:
-                        first_char = limiter_value[0]
-                        
-                    first_char_negated = CharClass(first_char, is_set_op=False).negated()
-                    rest = limiter_value[len(first_char):]
-                    if not rest and not prefixed: # limiter_value is single-char, note that e.g. \N{FULL STOP} is counted as single char
-                        value = first_char_negated
-                    else:
-                        value = '%s++' % first_char_negated
-                        if prefixed:
-                            value += '|(?<!%s)%s' % (prefix, first_char)
-                        if rest:
-                            value += '|%s(?!%s)' % (first_char, rest)
-                        value = '(?:%s)' % value
-        return Regex(value, modifier='+?' if value =='.' else '++')
+            first_chars = limiter_first_chars(limiter.resolve(scope, lexer))
+        if first_chars is None:
+            return Regex('.', modifier='*?' if self.optional else '+?')
+        first_char, special = first_chars
+        normal = first_char.negated()
+        if special is None: # the limiter is just the first character
+            return Regex(normal, modifier='*+' if self.optional else '++')
+        value = '%s*(?:%s%s*)*' % (normal, special, normal)
+        if not self.optional:
+            value = '(?:%s|%s)%s' % (normal, special, value)
+        return Regex(value, modifier='(?>')
+
+
+def split_first_char(string_literal):
+    # (\b or \B prefix or '', first character, rest) of a string literal, None if there's no first character
+    prefix = string_literal[:2] if string_literal[:2] in (r'\b', r'\B') else ''
+    value = string_literal[len(prefix):]
+    if value == '':
+        return None
+    if value.startswith('\\'):
+        first_char = ESCAPE_SEQUENCE_RE.match(value).group(0)
+    else:
+        first_char = value[0]
+    return prefix, first_char, value[len(first_char):]
+
+
+def limiter_first_chars(limiter_value):
+    # for MatchUntil: (CharClass of the characters the limiter can start with, the regex of one of them where
+    # the limiter doesn't match -- None if the limiter is just that one character), or None if unknown
+    if isinstance(limiter_value, CharClass):
+        return limiter_value, None
+    if isinstance(limiter_value, StringLiteral):
+        split = split_first_char(limiter_value)
+        if split is None:
+            return None
+        prefix, first_char, rest = split
+        first_class = CharClass(first_char, is_set_op=False)
+        if prefix:
+            return first_class, '(?!%s)%s' % (limiter_value, first_char)
+        if rest:
+            return first_class, '%s(?!%s)' % (first_char, rest)
+        return first_class, None
+    if isinstance(limiter_value, Alternation):
+        class_items = []
+        single_chars = True # every branch is one character
+        for item in limiter_value.items:
+            if isinstance(item, CharClass):
+                is_nested = item.startswith('[^') or item.is_set_op # set operations bind looser than the union
+                class_item = item[1:-1] if item.startswith('[') and not is_nested else item
+            elif isinstance(item, StringLiteral):
+                split = split_first_char(item)
+                if split is None:
+                    return None
+                class_item = split[1]
+                single_chars = single_chars and split[0] == split[2] == ''
+            else:
+                break
+            class_item = CharClass.escapes.get(class_item, class_item) # a lone - or ^ isn't a range/negation
+            if class_item not in class_items:
+                class_items.append(class_item)
+        else:
+            first_class = CharClass('[%s]' % ''.join(class_items), is_set_op=False)
+            if single_chars:
+                return first_class, None
+            return first_class, '(?!%s)%s' % (limiter_value, first_class)
+    # anything else: what it can start with per its output tree -- not with captures, which would be
+    # duplicated in the lookahead
+    if '(?P<' in limiter_value:
+        return None
+    first_class = first_chars_class(limiter_value)
+    if first_class is None:
+        return None
+    return first_class, '(?!%s)%s' % (limiter_value, first_class)
 
 
 class CaptureCondition(namedtuple('CaptureCondition', 'varname lineno')):
@@ -256,10 +384,12 @@ class Block(namedtuple('Block', 'variables starting_lineno')):
 class Scope(dict):
     types = ('ROOTSCOPE', 'BLOCKSCOPE', 'FLAGSCOPE')
     ROOTSCOPE, BLOCKSCOPE, FLAGSCOPE = tuple(range(3))
-    __slots__ = ('starting_lineno', 'type')
-    def __init__(self, type, starting_lineno, parent_scope):
+    __slots__ = ('starting_lineno', 'type', 'inline_only')
+    def __init__(self, type, starting_lineno, parent_scope, inline_only=False):
         self.starting_lineno = starting_lineno
         self.type = type
+        # inline_only: lookups in this scope must not become subroutine calls (see share_definitions)
+        self.inline_only = inline_only or (parent_scope is not None and parent_scope.inline_only)
         if parent_scope:
             self.update(parent_scope)
 
@@ -808,7 +938,7 @@ def p_oprex(t):
     if 'V' not in flags: # use V1 by default
         flags = 'V1' + flags # put at the front so it can easily be trimmed-out if unwanted
 
-    t[0] = '(?%s)%s' % (flags, expression)
+    t[0] = '(?%s)%s%s' % (flags, expression, shared_definitions_block(t.lexer))
 
 
 def p_root_expression(t):
@@ -833,6 +963,7 @@ def p_global_flags(t):
     '''global_flags : LPAREN FLAGSET RPAREN NEWLINE'''
     flags = t[2]
     root_scope = t.lexer.scopes[0]
+    t.lexer.ascii = 'a' in flags.turn_ons
     if 'u' in flags.turn_ons: 
         root_scope.update(
             alpha    = BuiltinCC('alpha',    r'\p{Alphabetic}'),
@@ -920,7 +1051,47 @@ def p_numrange_shortcut(t):
         high = t[4]
     else:
         high = 'infinity'
-                
+    t[0] = numrange_regex(low, high, t.lineno(0))
+
+
+# Number ranges e.g. '1'..'12', '00'..'59', 'o1'..'31', '1'..
+# For every number-length in the range, the range is split into sub-ranges following the states of the
+# range's minimal digit automaton (tight on the low bound, tight on the high bound, or free). The free states
+# become \d{n}, the tight ones a digit class followed by the next digit's states. Generating is done without
+# recursion so bounds can have any number of digits, and results are cached -- the same ranges (months, hours,
+# octets, ...) show up in pattern after pattern.
+
+def numrange_regex(low, high, lineno):
+    key = low, high # the leading-o's/zeroes are part of the key
+    cached = numrange_cache.get(key)
+    if cached is None:
+        cached = gen_numrange(low, high, lineno)
+        numrange_cache.put(key, cached)
+    value, modifier = cached
+    return NumRangeRegex(value, modifier)
+
+
+def evaluate(expand, args):
+    # Evaluates a recursively-defined function using an explicit stack instead of recursion.
+    # expand(args) returns (combine, list_of_subargs), then the result is combine(list of the subresults).
+    stack = [expand(args) + ([],)]
+    while True:
+        combine, subargs, subresults = stack[-1]
+        if len(subresults) < len(subargs):
+            stack.append(expand(subargs[len(subresults)]) + ([],))
+        else:
+            stack.pop()
+            result = combine(subresults)
+            if not stack:
+                return result
+            stack[-1][2].append(result)
+
+
+SINGLE_DIGIT_RE = regexlib.compile(r'\d|\[[0-9-]+\]')
+
+
+def gen_numrange(low, high, lineno):
+    # returns (value, modifier) of the NumRangeRegex
     o_led     = lambda str: str.startswith('o')
     zero_led  = lambda str: str.startswith('0') and str != '0'
     all_zero  = lambda str: all(digit == '0' for digit in str)
@@ -929,17 +1100,17 @@ def p_numrange_shortcut(t):
     
     def check_format(fmt):
         if not regexlib.fullmatch(r'o*\d+', fmt):
-            raise OprexSyntaxError(t.lineno(0), "Bad number-range format: '%s'" % fmt)
+            raise OprexSyntaxError(lineno, "Bad number-range format: '%s'" % fmt)
         if regexlib.match(r'o+0+\d+', fmt):
-            raise OprexSyntaxError(t.lineno(0), "Bad number-range format: '%s' (ambiguous leading-zero spec)" % fmt)
+            raise OprexSyntaxError(lineno, "Bad number-range format: '%s' (ambiguous leading-zero spec)" % fmt)
             
     check_format(low)
     
     if high == 'infinity':
         if zero_led(low):
-            raise OprexSyntaxError(t.lineno(0), "Infinite range cannot have (non-optional) leading zero: '%s'.." % low)        
+            raise OprexSyntaxError(lineno, "Infinite range cannot have (non-optional) leading zero: '%s'.." % low)        
         if o_led(low) and low.count('o') > 1:
-            raise OprexSyntaxError(t.lineno(0), "Infinite range: excessive leading-o: '%s'.." % low)
+            raise OprexSyntaxError(lineno, "Infinite range: excessive leading-o: '%s'.." % low)
             
     else: # high != infinity
         check_format(high)
@@ -947,12 +1118,12 @@ def p_numrange_shortcut(t):
         # using zero-led/o-led format? len(low) must be == len(high)
         if zero_led(low) or zero_led(high) or o_led(low) or o_led(high):
             if len(low) != len(high):
-                raise OprexSyntaxError(t.lineno(0), 
+                raise OprexSyntaxError(lineno, 
                     "Bad number-range format: '%s'..'%s' (lengths must be the same if using leading-zero/o format)" % (low, high))
         
         # zero-led/o-led cannot be mixed
         if zero_led(low) and o_led(high) or o_led(low) and zero_led(high):
-            raise OprexSyntaxError(t.lineno(0),
+            raise OprexSyntaxError(lineno,
                 "Bad number-range format: '%s'..'%s' (one cannot be o-led while the other is zero-led)" % (low, high))
             
     # process leading-o (if any), leading o(s) = allow optional leading zero(es)
@@ -974,49 +1145,65 @@ def p_numrange_shortcut(t):
     low = low.lstrip('o')    
     high = high.lstrip('o')
     if high != 'infinity' and int(high) < int(low):
-        raise OprexSyntaxError(t.lineno(0), "Bad number-range format: '%s'..'%s' (start > end)" % (low, high))
+        raise OprexSyntaxError(lineno, "Bad number-range format: '%s'..'%s' (start > end)" % (low, high))
     
     def gen_optzeros(numos):
         return '0{,%d}%s' % (numos, o_eagerness)
-    
-    def gen(low, high):
-        len_low  = len(low)
-        len_high = len(high)
-        low_mag  = len_low - 1 # e.g. order-of-magnitude of "42" is 1 (4.2 x 10^1), "1337" is 3 (1.337 x 10^3), etc
-        high_mag = len_high - 1
-                
-        def gen_all(steppers=[], should_gen_o=False):
+
+    def constant(value):
+        return (lambda subresults: value), []
+
+    def prefixed(prefix, low, high):
+        return (lambda subresults: prefix + subresults[0]), [(low, high)]
+
+    def gen_all(steppers=[], should_gen_o=False):
+        subranges = []
+        while steppers: # steppers should be in pairs (low-high-low-high etc)
+            subhigh = steppers.pop()
+            sublow = steppers.pop()                    
+            if int(sublow) > int(subhigh): # this happens when e.g. '7'..'11'
+                continue # the 7 produces steppers 7-9-10 and the 11 produces 9-10-11, resulting in subsets: 7-9, 10-9, and 10-11
+                                                                                     # the 10-9 needs to be skipped
+            subranges.append((sublow, subhigh))
+
+        def combine(subresults):
             subsets = []
-            while steppers: # steppers should be in pairs (low-high-low-high etc)
-                subhigh = steppers.pop()
-                sublow = steppers.pop()                    
-                if int(sublow) > int(subhigh): # this happens when e.g. '7'..'11'
-                    continue # the 7 produces steppers 7-9-10 and the 11 produces 9-10-11, resulting in subsets: 7-9, 10-9, and 10-11
-                                                                                         # the 10-9 needs to be skipped
-                subset = gen(sublow, subhigh)
+            for (sublow, subhigh), subset in zip(subranges, subresults):
                 if should_gen_o and len(subhigh) < maxdigits:
                     numos = maxdigits - len(subhigh)
                     subset = gen_optzeros(numos) + subset
                 if subset.startswith('(?>'):
                     subset = subset[3:-1]
-                subsets.append(subset)
+                prefix = subsets and subsets[-1][:-len(subset)]
+                if prefix and subsets[-1].endswith(subset) and SINGLE_DIGIT_RE.fullmatch(prefix):
+                    subsets[-1] = prefix + '?' + subset # e.g. 1\d|\d --> 1?\d
+                else:
+                    subsets.append(subset)
             return '(?>%s)' % '|'.join(subsets)
-        
+        return combine, subranges
+    
+    def expand(args): # one step of gen(low, high), see evaluate()
+        low, high = args
+        len_low  = len(low)
+        len_high = len(high)
+        low_mag  = len_low - 1 # e.g. order-of-magnitude of "42" is 1 (4.2 x 10^1), "1337" is 3 (1.337 x 10^3), etc
+        high_mag = len_high - 1
+                
         if low == high:
-            return low
+            return constant(low)
         if len_low == len_high:
             length = len_low # = len_high
             mag = length - 1
             if length == 1:
                 if int(low) == int(high) - 1:
-                    return '[%s%s]' % (low, high)
-                return '[%s-%s]' % (low, high)
+                    return constant('[%s%s]' % (low, high))
+                return constant('[%s-%s]' % (low, high))
             if low[0] == high[0]:
-                return low[0] + gen(low[1:], high[1:])
+                return prefixed(low[0], low[1:], high[1:])
             if all_zero(low) and all_nine(high):
-                return r'\d{%d}' % length
+                return constant(r'\d{%d}' % length)
             if all_zero(low[1:]) and all_nine(high[1:]):
-                return gen(low[0], high[0]) + gen(low[1:], high[1:])
+                return (lambda subresults: ''.join(subresults)), [(low[0], high[0]), (low[1:], high[1:])]
             
             steppers = []
             steppers.append(low)
@@ -1034,9 +1221,9 @@ def p_numrange_shortcut(t):
             if not is_o_led: # if not o-led, we can take some shortcuts
                 if all_nine(high):
                     if is_powten(low):
-                        return r'[1-9]\d{%d,%d}+' % (low_mag, high_mag)
+                        return constant(r'[1-9]\d{%d,%d}+' % (low_mag, high_mag))
                     if low == '0':
-                        return '(?>%s|0)' % gen('1', high)
+                        return (lambda subresults: '(?>%s|0)' % subresults[0]), [('1', high)]
                     
             steppers = []
             steppers.append(low)
@@ -1056,6 +1243,9 @@ def p_numrange_shortcut(t):
                 steppers.append(high_mag_smallest_int)               #         put 1000
             steppers.append(high)
             return gen_all(steppers, should_gen_o=is_o_led and not defer_gen_o)
+
+    def gen(low, high):
+        return evaluate(expand, (low, high))
     
     def infinite_range():
         if low == '0':
@@ -1103,7 +1293,7 @@ def p_numrange_shortcut(t):
         modifier = '' 
         # value stays unchanged
         
-    t[0] = NumRangeRegex(value, modifier)
+    return value, modifier
 
 
 def p_charclass_negation(t):
@@ -1116,13 +1306,14 @@ class QuantifiedExpr(Expr):
     def apply(self, scope):
         regex, refs = self.quantified.apply(scope)
         regex = quantify(regex, quantifier=self.quantifier)
+        self.lexer.quantifiers.append((self.lineno, regex))
         return regex, refs
 
 
 def p_quantified_expr(t):
     '''quantified_expr : quantifier WHITESPACE expr
                        | quantifier COLON      charclass'''
-    t[0] = QuantifiedExpr(quantifier=t[1], quantified=t[3])
+    t[0] = QuantifiedExpr(quantifier=t[1], quantified=t[3], lexer=t.lexer, lineno=t.lineno(1))
 
 
 def p_quantifier(t):
@@ -1248,6 +1439,7 @@ class FlaggedExpr(Expr):
             type = Scope.FLAGSCOPE,          # i.e. not using lexer.begin_a_scope()
             starting_lineno = self.flagline, # i.e. not appended into lexer.scopes
             parent_scope = scope,            # so, no cleanup/lexer.end_a_scope() needed
+            inline_only = True,              # a subroutine call would use the flags of the definition site
         )
         flags_redef_builtins(                                                                      
             flags = self.flags, 
@@ -1286,37 +1478,237 @@ class OrBlockExpr(Expr):
             expression, refs = or_item.apply(scope)
             subexpressions.append(expression)
             references.extend(refs)
-        return Alternation(subexpressions, self.is_atomic), references
+        if self.lexer.options.factor_literals:
+            subexpressions = factor_literals(subexpressions, self.is_atomic)
+        alternation = Alternation(subexpressions, self.is_atomic)
+        if not self.is_atomic:
+            self.lexer.orblocks.append((self.lineno, alternation))
+        return alternation, references
 
 
 def p_orblock_expr(t):
     '''orblock_expr : BEGIN_ORBLOCK NEWLINE oritems END_OF_ORBLOCK'''
+    oritems = t[3]
+    conditional = pending_conditional(oritems)
+    if conditional:
+        raise OprexSyntaxError(conditional.lineno, 'The last branch of OR-block must not be conditional')
+
     t[0] = OrBlockExpr(
         is_atomic = t[1].startswith('@'),
-        items = t[3],
+        items = oritems,
+        lexer = t.lexer,
+        lineno = t.lineno(1),
     )
 
 
+# factor_literals: consecutive string-literal branches are factored into a prefix trie, e.g.
+# 'cat'|'car'|'dog' -> ca[tr]|dog, so the engine tests each common prefix once instead of once per branch.
+# The branches' order matters when more than one of them can match at the same position, which for
+# literals means one is a prefix of the other. So the trie is used only when:
+#  - no branch is a prefix of another (at most one can match, order is irrelevant), or
+#  - the OR-block is atomic, where the first matching branch wins: the trie is then built to try the
+#    branches in their original priority, and branches made unreachable by an earlier prefix are dropped.
+# Branches are compared case-insensitively too (the block could be under the ignorecase flag).
+
+LITERAL_ESCAPE_RE = regexlib.compile(r'''\\
+    ( N\{[^}]++\}
+    | U[0-9a-fA-F]{8}
+    | u[0-9a-fA-F]{4}
+    | x[0-9a-fA-F]{2}
+    | 0[0-7]{0,2} | [0-7]{3}
+    | .
+    )''', regexlib.VERBOSE)
+
+
+def unescape_literal(token):
+    # the character matched by an escape sequence of a string literal, None if it's not a literal character
+    escaped = token[1:]
+    if escaped.startswith('N{'):
+        return unicodedata.lookup(escaped[2:-1])
+    if escaped[0] in 'Uux' and len(escaped) > 1:
+        codepoint = int(escaped[1:], 16)
+    elif escaped[0].isdigit():
+        if len(escaped) == 1 and escaped != '0': # \1 .. \9 are backreferences
+            return None
+        codepoint = int(escaped, 8)
+    elif escaped in 'tnr':
+        return {'t': '\t', 'n': '\n', 'r': '\r'}[escaped]
+    elif escaped.isalnum(): # e.g. \b \B word boundaries, \d classes
+        return None
+    else:
+        return escaped
+    try:
+        return unichr(codepoint)
+    except ValueError: # narrow python build
+        return None
+
+
+def literal_chars(literal):
+    # the [(token, character)] of a StringLiteral, None when it's not all literal characters (e.g. has WOBs)
+    chars = []
+    pos = 0
+    while pos < len(literal):
+        if literal[pos] == '\\':
+            token = LITERAL_ESCAPE_RE.match(literal, pos).group(0)
+            char = unescape_literal(token)
+            if char is None:
+                return None
+        elif literal[pos] in '()[]{}|.^$?*+': # not escaped, so not part of a literal
+            return None
+        else:
+            token = char = literal[pos]
+        chars.append((token, char))
+        pos += len(token)
+    return chars
+
+
+def class_escape(char):
+    if char in '\\[]^-&|~':
+        return '\\' + char
+    codepoint = ord(char)
+    if codepoint < 0x20 or 0x7F <= codepoint < 0xA0:
+        return '\\x%02x' % codepoint
+    return char
+
+
+def fold(char):
+    return char.upper().lower()
+
+
+class TrieNode(object):
+    __slots__ = ('children', 'folds', 'end', 'first')
+    def __init__(self, first):
+        self.children = OrderedDict() # char -> (token, TrieNode), in order of first use
+        self.folds = {}               # fold(char) -> char, of the children
+        self.end = None               # index of the branch ending here
+        self.first = first            # smallest index of the branches going through here
+
+
+def build_trie(words, is_atomic):
+    # returns the root TrieNode, or None when factoring the words could change the matching
+    root = TrieNode(0)
+    for index, chars in enumerate(words):
+        node = root
+        for token, char in chars:
+            if node.end is not None and not is_atomic:
+                return None # an earlier branch is a prefix of this one
+            try:
+                _, node = node.children[char]
+            except KeyError:
+                if node.folds.setdefault(fold(char), char) != char: # e.g. 'a' & 'A' -- same char under ignorecase
+                    return None
+                child = TrieNode(index)
+                node.children[char] = token, child
+                node = child
+        if node.end is None:
+            if node.children and not is_atomic:
+                return None # this branch is a prefix of an earlier one
+            node.end = index
+        # else: a duplicate, or unreachable behind an earlier branch -- dropped
+    return root
+
+
+def trie_alternatives(node, limit):
+    # [(regex, is_single_char)] matching the words below the node, in order of priority. Words with
+    # index >= limit are unreachable: an earlier word ending above the node is tried first, and always matches.
+    alternatives = []
+    single_chars = []
+    for char, (token, child) in node.children.items():
+        if child.first >= limit:
+            continue
+        is_end = child.end is not None and child.end < limit
+        suffix = trie_suffix(child, child.end if is_end else limit, is_end)
+        if suffix:
+            alternatives.append((token + suffix, False))
+        else:
+            if not single_chars: # the children are mutually exclusive, so single chars can go in one class
+                alternatives.append(single_chars)
+            single_chars.append((token, char))
+
+    def as_regex(alternative):
+        if alternative is not single_chars:
+            return alternative
+        if len(single_chars) == 1:
+            return single_chars[0][0], True
+        return '[%s]' % ''.join(class_escape(char) for _, char in single_chars), True
+    return list(map(as_regex, alternatives))
+
+
+def trie_suffix(node, limit, is_end):
+    alternatives = trie_alternatives(node, limit)
+    if not alternatives:
+        return ''
+    if len(alternatives) == 1:
+        regex, is_single_char = alternatives[0]
+        if not is_end:
+            return regex
+        if is_single_char:
+            return regex + '?'
+    body = '|'.join(regex for regex, _ in alternatives)
+    if is_end: # the longer words have priority, then the empty suffix
+        return '(?:%s)?' % body
+    return '(?:%s)' % body
+
+
+def factor_literals(branches, is_atomic):
+    factored = []
+    run = [] # [(branch, chars)]
+    def flush():
+        root = build_trie([chars for _, chars in run], is_atomic) if len(run) > 1 else None
+        if root is None:
+            factored.extend(branch for branch, _ in run)
+        else:
+            limit = len(run) if root.end is None else root.end
+            factored.extend(Regex(regex) for regex, _ in trie_alternatives(root, limit))
+            if root.end is not None: # the empty string is one of the branches, it goes last
+                factored.append(Regex(''))
+        del run[:]
+
+    for branch in branches:
+        chars = literal_chars(branch) if isinstance(branch, StringLiteral) else None
+        if chars is None:
+            flush()
+            factored.append(branch)
+        else:
+            run.append((branch, chars))
+    flush()
+    return factored
+
+
 OrItems = deque
 
 
+# The list productions (oritems, lookitems, charitems, lookup_chain, definitions) are left-recursive:
+# each item is reduced into the list as soon as it's parsed, keeping the parser stack constant-size
+# regardless of the number of items.
+
 def p_oritems(t):
     '''oritems : oritem
-               | oritem oritems'''
-    try:
-        oritems = t[2]
-    except IndexError:
+               | oritems oritem'''
+    if len(t) == 2:
         oritems = OrItems()
-        
-    if isinstance(t[1], ConditionalExpr):
-        try:
-            t[1].else_expr = oritems.popleft()
-        except IndexError:
-            raise OprexSyntaxError(t.lineno(1), 'The last branch of OR-block must not be conditional')
-    
-    oritems.appendleft(t[1])    
+        oritem = t[1]
+    else:
+        oritems = t[1]
+        oritem = t[2]
+
+    conditional = pending_conditional(oritems)
+    if conditional: # the previous branch is conditional, this branch becomes its else-branch
+        conditional.else_expr = oritem
+    else:
+        oritems.append(oritem)
     t[0] = oritems
-    
+
+
+def pending_conditional(oritems):
+    # the conditional branch that still awaits its else-branch, if any
+    branch = oritems[-1] if oritems else None
+    while isinstance(branch, ConditionalExpr):
+        if branch.else_expr is None:
+            return branch
+        branch = branch.else_expr
+    return None
+
 
 def p_oritem(t):
     '''oritem : or condition WHITESPACE QUESTMARK WHITESPACE expr
@@ -1329,7 +1721,7 @@ def p_oritem(t):
     else:
         expr = t_last
     if len(t) > 3:
-        t[0] = ConditionalExpr(condition=t[2], then_expr=expr)
+        t[0] = ConditionalExpr(condition=t[2], then_expr=expr, else_expr=None, lineno=t.lineno(1))
     else:
         t[0] = expr
 
@@ -1366,7 +1758,12 @@ class LookaroundExpr(Expr):
         references = []
 
         for lookitem in self.items:
-            expression, refs = lookitem.expr.apply(scope)
+            sharing = self.lexer.options.share_definitions is not None
+            if sharing and lookitem.type in ('(?<=', '(?<!'): # the regex module mishandles subroutine calls in lookbehinds
+                item_scope = Scope(type=scope.type, starting_lineno=scope.starting_lineno, parent_scope=scope, inline_only=True)
+            else:
+                item_scope = scope
+            expression, refs = lookitem.expr.apply(item_scope)
             subexpressions.append(Regex(expression, modifier=lookitem.type))
             references.extend(refs)
 
@@ -1376,20 +1773,22 @@ class LookaroundExpr(Expr):
 
 def p_lookaround_expr(t):
     '''lookaround_expr : BEGIN_LOOKAROUND NEWLINE lookitems END_OF_LOOKAROUND'''
-    t[0] = LookaroundExpr(items=t[3])
+    t[0] = LookaroundExpr(items=t[3], lexer=t.lexer)
 
 
 LookItems = deque
 
 
 def p_lookitems(t):
-    '''lookitems : lookitem NEWLINE
-                 | lookitem NEWLINE lookitems'''
-    try:
-        t[0] = t[3]
-    except IndexError:
+    '''lookitems :           lookitem NEWLINE
+                 | lookitems lookitem NEWLINE'''
+    if len(t) == 3:
         t[0] = LookItems()
-    t[0].appendleft(LookItem(*t[1]))
+        lookitem = t[1]
+    else:
+        t[0] = t[1]
+        lookitem = t[2]
+    t[0].append(LookItem(*lookitem))
 
 
 class LookItem(namedtuple('LookItem', 'type expr')):   
@@ -1450,11 +1849,19 @@ def p_lookitem(t):
 class LookupExpr(Expr):
     def apply(self, scope):
         is_single_lookup = len(self.items) == 1
+        sharing = self.lexer.options.share_definitions is not None
 
         def resolve(lookup):
             value = lookup.resolve(scope, self.lexer)
+            if sharing and type(lookup) is VariableLookup:
+                value = share_definition(lookup, value, scope, self.lexer)
+            if type(lookup) is MatchUntil: # __? is resolved as such, see MatchUntil
+                self.lexer.quantifiers.append((lookup.lineno, value))
+                return value
             if lookup.optional:
-                return quantify(value, quantifier=lookup.optional)
+                value = quantify(value, quantifier=lookup.optional)
+                self.lexer.quantifiers.append((lookup.lineno, value))
+                return value
             elif isinstance(value, Alternation) and not value.grouping_unnecessary and not is_single_lookup:
                 return Regex(value, modifier='(?:')
             else:
@@ -1470,6 +1877,114 @@ class LookupExpr(Expr):
         return regex, self.items
 
 
+def share_definition(lookup, value, scope, lexer):
+    # For the share_definitions option: the first pass only records the use, the second pass (when
+    # the definition was chosen for sharing) returns a subroutine call in place of the value.
+    var = scope.get(lookup.varname)
+    if var is None or var.is_builtin(): # None: recursive reference, already a subroutine call
+        return value
+    key = var.name, var.lineno
+    groupname = lexer.shared_definitions.get(key)
+    if groupname is None:
+        lexer.definition_uses.append((key, tuple(lexer.declaration_stack), scope.inline_only))
+        lexer.definition_values[key] = var.value
+        return value
+    lexer.shared_values[key] = var.value
+    return Regex(groupname, modifier='(?&')
+
+
+def is_shareable(value):
+    # captures, backreferences & conditionals must stay where they are, charclasses and numranges are
+    # short and get special treatment depending on where they're used
+    if isinstance(value, (CharClass, NumRangeRegex)):
+        return False
+    return not any(construct in value for construct in ('(?P<', '(?P=', '(?('))
+
+
+def choose_shared_definitions(lexer, threshold):
+    # Pick the definitions to be emitted once in a (?(DEFINE)...) block, based on the uses recorded
+    # in the first pass. Returns {(varname, lineno): groupname}.
+    uses_of = {}
+    used_in = {}
+    for key, declaration_stack, inline_only in lexer.definition_uses:
+        uses_of.setdefault(key, []).append(declaration_stack)
+        for declaration in declaration_stack:
+            used_in.setdefault(declaration, set()).add(key)
+
+    # definitions used in flagged expressions & lookbehinds must be inlined, so must everything they use
+    pinned = set(key for key, _, inline_only in lexer.definition_uses if inline_only)
+    to_visit = list(pinned)
+    while to_visit:
+        for key in used_in.get(to_visit.pop(), ()):
+            if key not in pinned:
+                pinned.add(key)
+                to_visit.append(key)
+
+    counts = {}
+    def occurrences(key): # number of times the definition's regex appears in the inlined output
+        if key not in counts:
+            total = 0
+            for declaration_stack in uses_of.get(key, ()):
+                if declaration_stack:
+                    # the innermost assignment, possibly with several declarations e.g. a = b = ...
+                    lineno = declaration_stack[-1][1]
+                    total += sum(occurrences(declaration) for declaration in declaration_stack if declaration[1] == lineno)
+                else:
+                    total += 1
+            counts[key] = total
+        return counts[key]
+
+    taken = set(lexer.capture_names)
+    shared = {}
+    for key in sorted(lexer.definition_values, key=lambda key: (key[1], key[0])):
+        value = lexer.definition_values[key]
+        if key in pinned or len(value) < threshold or not is_shareable(value) or occurrences(key) < 2:
+            continue
+        varname, lineno = key
+        groupname = varname if varname not in taken else '%s_%d' % (varname, lineno)
+        while groupname in taken:
+            groupname += '_'
+        taken.add(groupname)
+        shared[key] = groupname
+    return shared
+
+
+def shared_definitions_block(lexer):
+    # a named group per shared definition, for (?&name) to call -- never matched itself, and numbered once
+    # the regex is done, see number_shared_definitions()
+    if not lexer.shared_values:
+        return ''
+    keys = sorted(lexer.shared_values, key=lambda key: (key[1], key[0]))
+    return '(?(DEFINE)%s)' % ''.join(
+        '(?P<%s>%s)' % (lexer.shared_definitions[key], lexer.shared_values[key]) for key in keys
+    )
+
+
+SHARED_TOKEN_RE = regexlib.compile(r'(?s)\\.|(?P<open>\[\^?\]?)|(?P<close>\])|\(\?P<(?P<group>\w+)>|\(\?&(?P<call>\w+)\)|[^\\\[\]()]+|.')
+
+
+def number_shared_definitions(regex, names):
+    # The regex with the groups of the shared definitions numbered instead of named, and called with (?N):
+    # named ones would show in match objects (groupdict(), always None), where the inlined definitions
+    # don't. The (?(DEFINE)...) block comes last, so the captures keep their numbers.
+    numbers = regexlib.compile(regex).groupindex
+    pieces = []
+    depth = 0 # of the character classes the token is in, they nest in version 1
+    for token in SHARED_TOKEN_RE.finditer(regex):
+        if token.group('open'):
+            depth += 1
+        elif token.group('close') and depth:
+            depth -= 1
+        elif not depth and token.group('group') in names:
+            pieces.append('(')
+            continue
+        elif not depth and token.group('call') in names:
+            pieces.append('(?%d)' % numbers[token.group('call')])
+            continue
+        pieces.append(token.group())
+    return ''.join(pieces)
+
+
 def p_lookup_expr(t):
     '''lookup_expr : lookup NEWLINE'''
     t[0] = t[1]
@@ -1525,18 +2040,17 @@ LookupChain = deque
 
 
 def p_lookup_chain(t):
-    '''lookup_chain : lookup_item SLASH
-                    | lookup_item SLASH lookup_chain'''
-    item = t[1]
-    try:
-        chain = t[3]
-        next_item = chain[0]
-    except IndexError:
+    '''lookup_chain :              lookup_item SLASH
+                    | lookup_chain lookup_item SLASH'''
+    if len(t) == 3:
         chain = LookupChain()
-        next_item = None
+        item = t[1]
+    else:
+        chain = t[1]
+        item = t[2]
+        chain[-1].next_lookup_in_chain = item
 
-    item.next_lookup_in_chain = next_item
-    chain.appendleft(item)
+    chain.append(item)
     t[0] = chain
 
 
@@ -1646,6 +2160,13 @@ class CharClassExpr(Expr):
             elif len(items) > 1 or has_range:
                 value = '[' + value + ']'
             value = value.replace('^^', '') # remove double negation
+            options = self.lexer.options
+            if has_set_op and options.evaluate_charclasses:
+                evaluated = evaluated_class(value, self.lexer.ascii)
+                if evaluated:
+                    value, has_set_op = evaluated, False
+            if not has_set_op and options.canonicalize_charclasses and value.startswith('['):
+                value = canonical_class(value, self.lexer.ascii) or value
             regex = CharClass(value, is_set_op=has_set_op)
 
         return regex, includes
@@ -1653,17 +2174,18 @@ class CharClassExpr(Expr):
 
 def p_charclass(t):
     '''charclass : charitems NEWLINE'''
-    t[0] = CharClassExpr(items=t[1], lineno=t.lineno(1))
+    t[0] = CharClassExpr(items=t[1], lexer=t.lexer, lineno=t.lineno(1))
 
 
 def p_charitems(t):
-    '''charitems : WHITESPACE charitem
-                 | WHITESPACE charitem charitems'''
-    try:
-        t[0] = t[3]
-    except IndexError:
+    '''charitems :           WHITESPACE charitem
+                 | charitems WHITESPACE charitem'''
+    if len(t) == 3:
         t[0] = deque()
-    t[0].appendleft(t[2])
+        t[0].append(t[2])
+    else:
+        t[0] = t[1]
+        t[0].append(t[3])
 
 
 def p_charitem(t):
@@ -1729,12 +2251,11 @@ def optional_subblock_cleanup(lexer, subblock, reffed_varnames):
 
 
 def p_definitions(t):
-    '''definitions : definition
-                   | definition definitions'''
-    try:
-        t[0] = t[1] + t[2]
-    except IndexError:
-        t[0] = t[1]
+    '''definitions :             definition
+                   | definitions definition'''
+    t[0] = t[1]
+    if len(t) == 3:
+        t[0].extend(t[2])
 
 
 def p_definition(t):
@@ -1750,7 +2271,7 @@ def p_definition(t):
 
     def variable_from(declaration):
         def make_var(varname, capture, value, lineno):
-            if capture:
+            if capture and varname not in t.lexer.elided_captures:
                 value = Regex(value, modifier='(?P<%s>' % varname)
                 t.lexer.capture_names.add(varname)
             return Variable(varname, value, lineno)
@@ -1798,6 +2319,7 @@ def p_assignment(t):
     declaration = t[1]
     lineno = t.lineno(1)
     del t.lexer.ongoing_declarations[declaration.varname]
+    t.lexer.declaration_stack.pop()
     if isinstance(t[3], Assignment):
         assignment = t[3]
         assignment.declarations.append(declaration)
@@ -1829,6 +2351,7 @@ def p_declaration(t):
     except KeyError: # no parent declaration with the same name, safe to declare
         declaration = VariableDeclaration(varname, t.lineno(0), capture)
         t.lexer.ongoing_declarations[varname] = declaration
+        t.lexer.declaration_stack.append((varname, declaration.lineno))
         t[0] = declaration
     else:
         raise OprexError(t.lineno(0), 
@@ -1855,29 +2378,28 @@ def p_error(t):
 
 def find_column(t, index=None):
     lexpos = t.lexpos(index) if index else t.lexpos
-    last_newline = t.lexer.lexdata.rfind('\n', 0, lexpos)
-    if last_newline < 0:
+    newline_positions = t.lexer.newline_positions
+    num_newlines_before = bisect.bisect_left(newline_positions, lexpos)
+    if num_newlines_before:
+        last_newline = newline_positions[num_newlines_before - 1]
+    else:
         last_newline = 0
     return lexpos - last_newline
 
 
-lexer0 = lex.lex()
-def build_lexer(source_lines):
-    lexer = CustomLexer(lexer0.clone())
-    lexer.source_lines = source_lines
-    lexer.input('\n'.join(source_lines)) # all newlines are now just \n, simplifying the lexer
-    lexer.indent_stack = [0] # for keeping track of indentation depths
-    lexer.ongoing_declarations = {}
-    lexer.capture_names = set()
-    lexer.references = []
-    lexer.flag_dependent_builtins = FLAG_DEPENDENT_BUILTINS
+def find_newline_positions(source_lines):
+    # offsets of the \n's in '\n'.join(source_lines), computed once per translation so that
+    # find_column() can bisect instead of searching the lexdata
+    positions = []
+    position = -1
+    for line in source_lines[:-1]:
+        position += len(line) + 1
+        positions.append(position)
+    return positions
 
-    root_scope = Scope(type=Scope.ROOTSCOPE, starting_lineno=0, parent_scope=None)
-    for var in BUILTINS:
-        root_scope[var.name] = var
-    lexer.scopes = [root_scope]
 
-    return lexer
+def build_lexer(source_lines):
+    return get_compiler().build_lexer(source_lines)
 
 
 class CustomLexer:
@@ -1940,9 +2462,145 @@ class CustomLexer:
                 (Scope.types[type], at, Scope.types[removed_scope.type], removed_scope.starting_lineno))
 
 
-parser = yacc.yacc()
+FASTSTART = os.environ.get('OPREX_FASTSTART', '') not in ('', '0')
+
+
+def build_tables(faststart=FASTSTART):
+    # faststart loads the prebuilt lextab/parsetab directly: no grammar reflection, no signature check,
+    # no table/debug files written. The shipped tables are trusted to be up-to-date with the grammar.
+    if faststart:
+        lexer0 = lex.lex(optimize=True, lextab=lextab)
+        lrtable = yacc.LRTable()
+        lrtable.read_table(parsetab)
+        lrtable.bind_callables(globals())
+        parser = yacc.LRParser(lrtable, p_error)
+    else:
+        lexer0 = lex.lex()
+        parser = yacc.yacc()
+    return lexer0, parser
+
+
+tables = None
+tables_lock = threading.Lock()
+def get_tables():
+    # the lexer & parser are built on first use rather than at import time
+    global tables
+    if tables is None:
+        with tables_lock:
+            if tables is None:
+                tables = build_tables()
+    return tables
+
+
 def parse(lexer):
-    return unicode(parser.parse(lexer=lexer, tracking=True))
+    return get_compiler().parse(lexer)
+
+
+class Compiler(object):
+    # A compilation context owning its parser, lexer and builtin tables -- nothing mutable is shared with
+    # other Compilers, so separate Compilers (e.g. one per thread) can translate concurrently.
+    # Only the read-only LALR/lexer tables are shared.
+    def __init__(self):
+        lexer0, parser = get_tables()
+        self.lexer0 = lexer0.clone()
+        self.parser = copy.copy(parser) # the parse state (statestack, symstack, etc) is kept in the parser object
+        self.builtins = list(BUILTINS)
+        self.flag_dependent_builtins = dict(
+            (flag, dict((is_on, list(variables)) for is_on, variables in builtins.items()))
+            for flag, builtins in FLAG_DEPENDENT_BUILTINS.items()
+        )
+
+    def build_lexer(self, source_lines, options=DEFAULT_OPTIONS):
+        real_lexer = self.lexer0.clone()
+        real_lexer.lexstatestack = [] # otherwise shared with the lexer it's cloned from
+        lexer = CustomLexer(real_lexer)
+        lexer.source_lines = source_lines
+        lexer.input('\n'.join(source_lines)) # all newlines are now just \n, simplifying the lexer
+        lexer.newline_positions = find_newline_positions(source_lines)
+        lexer.indent_stack = [0] # for keeping track of indentation depths
+        lexer.ongoing_declarations = {}
+        lexer.capture_names = set()
+        lexer.elided_captures = set() # for keep_captures, see emit()
+        lexer.references = []
+        lexer.flag_dependent_builtins = self.flag_dependent_builtins
+        lexer.options = options
+        lexer.ascii = False # whether the global ASCII flag is on, for evaluate_charclasses & canonicalize_charclasses
+        lexer.declaration_stack = [] # (varname, lineno) of the ongoing declarations, innermost last
+        lexer.definition_uses = []   # for share_definitions, see share_definition()
+        lexer.definition_values = {}
+        lexer.shared_definitions = {}
+        lexer.shared_values = {}
+        lexer.orblocks = []    # (lineno, regex) of the non-atomic OR-blocks, for atomize() and analyze()
+        lexer.quantifiers = [] # (lineno, regex) of the quantified expressions, for analyze()
+
+        root_scope = Scope(type=Scope.ROOTSCOPE, starting_lineno=0, parent_scope=None)
+        for var in self.builtins:
+            root_scope[var.name] = var
+        lexer.scopes = [root_scope]
+
+        return lexer
+
+    def parse(self, lexer):
+        return unicode(self.parser.parse(lexer=lexer, tracking=True))
+
+    def emit(self, source_lines, options):
+        # the regex before optimize(), the lexer of the pass that emitted it, and the Translation fields
+        # known by then: capture_names, shared_definitions and inlined_size
+        lexer = self.build_lexer(source_lines, options)
+        regex = self.parse(lexer)
+        cleanup(lexer=lexer)
+        elided = set()
+        if options.keep_captures is not None:
+            elided = lexer.capture_names - set(options.keep_captures) - set(ref.varname for ref in lexer.references)
+            if elided: # second pass, emitting the captures not needed as plain definitions
+                lexer = self.build_lexer(source_lines, options)
+                lexer.elided_captures = elided
+                regex = self.parse(lexer)
+                cleanup(lexer=lexer)
+        capture_names = sorted(lexer.capture_names)
+        inlined_size = len(regex)
+        shared_names = []
+
+        if options.share_definitions is not None:
+            shared = choose_shared_definitions(lexer, options.share_definitions)
+            if shared: # second pass, emitting subroutine calls for the shared definitions
+                shared_lexer = self.build_lexer(source_lines, options)
+                shared_lexer.shared_definitions = shared
+                shared_lexer.elided_captures = elided
+                shared_regex = self.parse(shared_lexer)
+                cleanup(lexer=shared_lexer)
+                if len(shared_regex) < len(regex):
+                    regex = shared_regex
+                    lexer = shared_lexer
+                    shared_names = sorted(shared[key] for key in lexer.shared_values)
+
+        return regex, lexer, capture_names, shared_names, inlined_size
+
+    def translate(self, source_lines, options=DEFAULT_OPTIONS):
+        regex, lexer, capture_names, shared_names, inlined_size = self.emit(source_lines, options)
+        regex, atomized, pruned = optimize(regex, options, lexer.orblocks, lexer.quantifiers)
+        for lineno, message in pruned:
+            warnings.warn('Line %d: %s' % (lineno, message) if lineno else message, OprexWarning)
+        if options.refuse_backtracking is not None:
+            refuse_backtracking(regex, lexer.orblocks + lexer.quantifiers, options.refuse_backtracking)
+        if shared_names:
+            regex = number_shared_definitions(regex, set(shared_names))
+        return Translation(regex, capture_names, shared_names, inlined_size, atomized, pruned)
+
+    def analyze(self, source_lines, options=DEFAULT_OPTIONS):
+        regex, lexer = self.emit(source_lines, options)[:2]
+        regex = optimize(regex, options, lexer.orblocks, lexer.quantifiers)[0]
+        return backtracking_risks(OutputTree(regex), lexer.orblocks + lexer.quantifiers)
+
+
+compilers = threading.local()
+def get_compiler():
+    # the module-level functions use one Compiler per thread
+    try:
+        return compilers.compiler
+    except AttributeError:
+        compilers.compiler = Compiler()
+        return compilers.compiler
 
 
 def cleanup(lexer):
@@ -1961,17 +2619,2831 @@ def cleanup(lexer):
     check_unclosed_scope()
 
 
+# The output tree: the emitted regex parsed back into nodes, for the options that analyze/rewrite the
+# translation as a whole (see optimize()). The parser understands the dialect oprex emits -- version 1, no
+# whitespace/comments in verbose mode, no reverse matching -- and raises Unparsable for anything else, in
+# which case the regex is left as it is. Nodes keep their source text, so unparse(OutputTree(regex).root) == regex.
+
+class Unparsable(Exception):
+    pass
+
+
+MAX_CODEPOINT = 0x10FFFF
+
+class CodeSet(tuple):
+    # a set of code points, as a sorted tuple of disjoint, non-adjacent (first, last) ranges
+    __slots__ = ()
+
+    def __new__(cls, ranges=()):
+        merged = []
+        for first, last in sorted(ranges):
+            if merged and first <= merged[-1][1] + 1:
+                if last > merged[-1][1]:
+                    merged[-1] = (merged[-1][0], last)
+            else:
+                merged.append((first, last))
+        return tuple.__new__(cls, merged)
+
+    @staticmethod
+    def of(chars):
+        return CodeSet((ord(char), ord(char)) for char in chars)
+
+    def __or__(self, other):
+        return CodeSet(tuple(self) + tuple(other))
+
+    def __and__(self, other):
+        return (self.complement() | other.complement()).complement()
+
+    def __sub__(self, other):
+        return self & other.complement()
+
+    def complement(self):
+        ranges = []
+        start = 0
+        for first, last in self:
+            if first > start:
+                ranges.append((start, first - 1))
+            start = last + 1
+        if start <= MAX_CODEPOINT:
+            ranges.append((start, MAX_CODEPOINT))
+        return CodeSet(ranges)
+
+    def isdisjoint(self, other):
+        i = j = 0
+        while i < len(self) and j < len(other):
+            if self[i][1] < other[j][0]:
+                i += 1
+            elif other[j][1] < self[i][0]:
+                j += 1
+            else:
+                return False
+        return True
+
+    def __contains__(self, codepoint):
+        i = bisect.bisect(self, (codepoint, MAX_CODEPOINT)) - 1
+        return i >= 0 and self[i][0] <= codepoint <= self[i][1]
+
+NO_CODES = CodeSet()
+ALL_CODES = CodeSet([(0, MAX_CODEPOINT)])
+ASCII_LETTERS = CodeSet([(0x41, 0x5A), (0x61, 0x7A)])
+PRINTABLE_ASCII = CodeSet([(0x20, 0x7E)])
+NON_ASCII = CodeSet([(0x80, MAX_CODEPOINT)])
+# the non-ASCII characters with ASCII letters among their case variants (KELVIN SIGN ~ k, LONG S ~ s,
+# LATIN SMALL LIGATURE FI ~ FI, etc), per unicodedata -- the regex module knows a subset of these
+ASCII_FOLDS = dict(
+    a = [0x1E9A],
+    f = [0xFB00, 0xFB01, 0xFB02, 0xFB03, 0xFB04],
+    h = [0x1E96],
+    i = [0x130, 0x131, 0xFB01, 0xFB03],
+    j = [0x1F0],
+    k = [0x212A],
+    l = [0xFB02, 0xFB04],
+    n = [0x149],
+    s = [0xDF, 0x17F, 0x1E9E, 0xFB05, 0xFB06],
+    t = [0x1E97, 0xFB05, 0xFB06],
+    w = [0x1E98],
+    y = [0x1E99],
+)
+FOLDS_WITH_ASCII = CodeSet((code, code) for codes in ASCII_FOLDS.values() for code in codes)
+
+
+class Chars(namedtuple('Chars', 'sure maybe')):
+    # a set of characters known only approximately: the `sure` ones are in it, anything outside `maybe` is not.
+    # E.g. whether \d matches non-ASCII digits depends on the flags the regex is compiled with, so
+    # \d is Chars(sure=[0-9], maybe=[0-9] plus all of non-ASCII).
+    __slots__ = ()
+
+    @staticmethod
+    def exactly(codes):
+        return Chars(codes, codes)
+
+    def __invert__(self):
+        return Chars(self.maybe.complement(), self.sure.complement())
+
+    def __or__(self, other):
+        return Chars(self.sure | other.sure, self.maybe | other.maybe)
+
+    def __and__(self, other):
+        return Chars(self.sure & other.sure, self.maybe & other.maybe)
+
+    def __sub__(self, other):
+        return Chars(self.sure - other.maybe, self.maybe - other.sure)
+
+    def __xor__(self, other):
+        return (self - other) | (other - self)
+
+UNKNOWN_CHARS = Chars(NO_CODES, ALL_CODES)
+
+def ascii_approximation(ranges, non_ascii=NON_ASCII):
+    # for the shorthand classes: sure of their ASCII members, not sure of anything non-ASCII
+    codes = CodeSet(ranges)
+    return Chars(codes, codes | non_ascii)
+
+SHORTHAND_CHARS = dict(
+    d = ascii_approximation([(0x30, 0x39)], NON_ASCII - FOLDS_WITH_ASCII),
+    w = ascii_approximation([(0x30, 0x39), (0x41, 0x5A), (0x5F, 0x5F), (0x61, 0x7A)]),
+    s = ascii_approximation([(0x09, 0x0D), (0x1C, 0x20)], NON_ASCII - FOLDS_WITH_ASCII),
+)
+for shorthand in 'dws':
+    SHORTHAND_CHARS[shorthand.upper()] = ~SHORTHAND_CHARS[shorthand]
+
+
+def case_closure(codes):
+    # a superset of what `codes` matches case-insensitively: ASCII letters pair up with their other case
+    # and their ASCII_FOLDS, other characters may fold to/from any other non-ASCII character
+    letters = set()
+    for first, last in codes & ASCII_LETTERS:
+        letters.update(unichr(code).lower() for code in range(first, last + 1))
+    for letter, folds in ASCII_FOLDS.items():
+        if not codes.isdisjoint(CodeSet((code, code) for code in folds)):
+            letters.add(letter)
+    closure = codes | CodeSet.of(''.join(letters) + ''.join(letters).upper())
+    closure = closure | CodeSet((code, code) for letter in letters for code in ASCII_FOLDS.get(letter, ()))
+    if not codes.isdisjoint(NON_ASCII - FOLDS_WITH_ASCII):
+        closure = closure | (NON_ASCII - FOLDS_WITH_ASCII)
+    return closure
+
+
+class Char(namedtuple('Char', 'text codepoint chars')):
+    __slots__ = ()
+
+class CharSet(namedtuple('CharSet', 'text chars')): # [...], \d, \p{...}, .
+    __slots__ = ()
+
+class Assertion(namedtuple('Assertion', 'text kind')):
+    # kind is one of:
+    #   'flags'    -- the global flags, matches nothing and tests nothing
+    #   'position' -- ^ \A \b \B \m \M and lookbehinds: zero-width tests of the surroundings
+    #   'eol'      -- $, which can't match before a next character other than \n
+    #   'eos'      -- \Z, which can't match before any next character
+    __slots__ = ()
+
+class Opaque(namedtuple('Opaque', 'text')): # backreferences, subroutine calls, \X
+    __slots__ = ()
+
+class Group(namedtuple('Group', 'opener body')):
+    __slots__ = ()
+    LOOKAHEADS = ('(?=', '(?!')
+    LOOKBEHINDS = ('(?<=', '(?<!')
+
+    @property
+    def name(self):
+        if self.opener.startswith('(?P<'):
+            return self.opener[4:-1]
+
+class Repeat(namedtuple('Repeat', 'body min max quantifier mode')):
+    # max is None for unbounded, mode is '' (greedy), '?' (lazy) or '+' (possessive)
+    __slots__ = ()
+
+class Sequence(namedtuple('Sequence', 'items')):
+    __slots__ = ()
+
+class Branches(namedtuple('Branches', 'items')):
+    __slots__ = ()
+
+class Conditional(namedtuple('Conditional', 'opener yes no')): # (?(name)yes|no), (?(DEFINE)...)
+    __slots__ = ()
+
+
+def unparse(node, unwrapped=()):
+    # unwrapped: ids of groups to leave out, unparsing just their body
+    node_type = type(node)
+    if node_type in (Char, CharSet, Assertion, Opaque):
+        return node.text
+    if node_type is Sequence:
+        return ''.join(unparse(item, unwrapped) for item in node.items)
+    if node_type is Branches:
+        return '|'.join(unparse(item, unwrapped) for item in node.items)
+    if node_type is Group:
+        if id(node) in unwrapped:
+            return unparse(node.body, unwrapped)
+        return node.opener + unparse(node.body, unwrapped) + ')'
+    if node_type is Repeat:
+        return unparse(node.body, unwrapped) + node.quantifier + node.mode
+    if node_type is Conditional:
+        no = '' if node.no is None else '|' + unparse(node.no, unwrapped)
+        return node.opener + unparse(node.yes, unwrapped) + no + ')'
+
+
+GLOBAL_FLAGS_RE = regexlib.compile(r'\(\?([a-zA-Z0-9]+)(?:-[a-zA-Z]+)?\)')
+SCOPED_FLAGS_RE = regexlib.compile(r'\(\?([a-zA-Z]*)(?:-([a-zA-Z]+))?:')
+QUANTIFIER_RE = regexlib.compile(r'(?:[?*+]|\{(\d*)(,?)(\d*)\})([?+]?)')
+OUTPUT_ESCAPE_RE = regexlib.compile(r'''(?x)\\(?:
+    (?P<single>[afnrtv])
+    | x(?P<hex>[0-9a-fA-F]{2}) | u(?P<hex4>[0-9a-fA-F]{4}) | U(?P<hex8>[0-9a-fA-F]{8})
+    | N\{(?P<name>[^}]+)\}
+    | (?P<octal>[0-7]{3}|0[0-7]{0,2})
+    | (?P<property>[pP](?:\{[^}]*\}|[A-Za-z]))
+    | (?P<shorthand>[dDwWsS])
+    | (?P<assertion>[bBmMAGZ])
+    | (?P<opaque>[1-9][0-9]?|g<\w+>|X)
+    | (?P<literal>[^0-9A-Za-z])
+)''')
+CLASS_OCTAL_RE = regexlib.compile(r'\\([0-7]{1,3})')
+SINGLE_ESCAPES = dict(a=0x07, b=0x08, f=0x0C, n=0x0A, r=0x0D, t=0x09, v=0x0B)
+SET_OPERATORS = ('||', '~~', '&&', '--') # in increasing precedence, implicit union binds tightest
+
+
+# Character class evaluation, for the evaluate_charclasses option: a class with set operations in it is
+# computed at compile time into the code points it matches, and emitted as a sorted list of ranges. Only
+# where that's sure to be the same: the class can only match the characters of its own plain items (so
+# it's over a few of them), no cased non-ASCII character is among those, properties are general categories
+# found assigned in unicodedata (its version may be older than the regex module's), and the regex module
+# itself agrees on every character that may match, with and without IGNORECASE -- which makes the engine
+# test each operand for the case variants of a character, its own way. \d \w \s and \p{..} are only
+# known with the global ASCII flag, and only the former are evaluated then.
+MAX_EVALUATED_CODES = 0x1000 # the most code points a class is evaluated over
+GENERAL_CATEGORY_RE = regexlib.compile(r'(?:gc=|General_Category=)?(?P<category>[LMNPSZC][a-z]?)\Z')
+ASCII_SHORTHAND_CODES = dict( # with the ASCII flag
+    d = CodeSet([(0x30, 0x39)]),
+    w = CodeSet([(0x30, 0x39), (0x41, 0x5A), (0x5F, 0x5F), (0x61, 0x7A)]),
+    s = CodeSet([(0x09, 0x0D), (0x20, 0x20)]),
+)
+
+
+class ClassParser(object):
+    # parses the text of a character class into nodes: ('codes', CodeSet), ('property', text),
+    # ('shorthand', letter), ('not', node) and (set operator, left node, right node) -- '||' for the implicit
+    # union too. Reuses OutputParser's reading of class characters.
+    def __init__(self, text):
+        self.reader = OutputParser(text, flags=0)
+
+    def parse(self):
+        node = self.charclass()
+        if self.reader.pos != len(self.reader.text):
+            raise Unparsable('unexpected %s' % self.reader.peek())
+        return node
+
+    def charclass(self):
+        reader = self.reader
+        if reader.peek() != '[': # a lone escape, e.g. \p{Lu}
+            return self.item()
+        reader.pos += 1
+        negated = reader.peek() == '^'
+        if negated:
+            reader.pos += 1
+        node = self.set_operation(0)
+        if reader.peek() != ']':
+            raise Unparsable('unclosed character class')
+        reader.pos += 1
+        return ('not', node) if negated else node
+
+    def set_operation(self, level):
+        if level == len(SET_OPERATORS):
+            return self.set_items()
+        operator = SET_OPERATORS[level]
+        node = self.set_operation(level + 1)
+        while self.reader.peek(2) == operator:
+            self.reader.pos += 2
+            node = (operator, node, self.set_operation(level + 1))
+        return node
+
+    def set_items(self):
+        reader = self.reader
+        codes = None # the characters and ranges, one operand tested as a whole
+        others = []
+        while reader.peek() != ']' and reader.peek(2) not in SET_OPERATORS:
+            if reader.pos >= len(reader.text) or reader.peek(2) == '[:':
+                raise Unparsable('unclosed or POSIX class')
+            item = self.charclass() if reader.peek() == '[' else self.item()
+            if item[0] == 'codes' and reader.peek() == '-' and reader.peek(2) != '--' and (
+                    reader.text[reader.pos + 1:reader.pos + 2] not in ('', ']')):
+                reader.pos += 1
+                last = self.item()
+                if last[0] != 'codes' or len(item[1]) != 1 or len(last[1]) != 1 or last[1][0][0] < item[1][0][0]:
+                    raise Unparsable('bad range')
+                item = ('codes', CodeSet([(item[1][0][0], last[1][0][0])]))
+            if item[0] == 'codes':
+                codes = item[1] if codes is None else codes | item[1]
+            else:
+                others.append(item)
+        items = ([] if codes is None else [('codes', codes)]) + others
+        if not items:
+            raise Unparsable('empty set')
+        return functools.reduce(lambda left, right: ('||', left, right), items)
+
+    def item(self):
+        reader = self.reader
+        match = OUTPUT_ESCAPE_RE.match(reader.text, reader.pos) if reader.peek() == '\\' else None
+        if match and match.group('property'):
+            reader.pos = match.end()
+            return ('property', match.group(0))
+        if match and match.group('shorthand'):
+            reader.pos = match.end()
+            return ('shorthand', match.group('shorthand'))
+        code = reader.class_char()
+        if isinstance(code, Chars):
+            raise Unparsable('unknown set')
+        return ('codes', CodeSet([(code, code)]))
+
+
+def set_leaves(node):
+    if node[0] in ('codes', 'property', 'shorthand'):
+        return [node]
+    return [leaf for child in node[1:] for leaf in set_leaves(child)]
+
+
+def is_bounded(node):
+    # whether what the node matches is within what its 'codes' and 'shorthand' leaves match
+    kind = node[0]
+    if kind == 'codes' or kind == 'shorthand' and node[1].islower():
+        return True
+    if kind in ('property', 'shorthand', 'not'):
+        return False
+    if kind == '&&':
+        return is_bounded(node[1]) or is_bounded(node[2])
+    if kind == '--':
+        return is_bounded(node[1])
+    return is_bounded(node[1]) and is_bounded(node[2]) # || ~~
+
+
+def evaluate_set(node, universe, leaf_codes):
+    # what the node matches among the universe's code points, leaf_codes(leaf) being what a leaf matches there
+    kind = node[0]
+    if kind in ('codes', 'property', 'shorthand'):
+        return leaf_codes(node)
+    if kind == 'not':
+        return universe - evaluate_set(node[1], universe, leaf_codes)
+    left = evaluate_set(node[1], universe, leaf_codes)
+    right = evaluate_set(node[2], universe, leaf_codes)
+    return {
+        '||' : lambda: left | right,
+        '~~' : lambda: (left - right) | (right - left),
+        '&&' : lambda: left & right,
+        '--' : lambda: left - right,
+    }[kind]()
+
+
+def property_codes(text, codes):
+    # the ones of the code points that have the (negated, for \P) general category property, None if unknown
+    category = GENERAL_CATEGORY_RE.match(text[3:-1] if text.endswith('}') else text[2:])
+    if not category:
+        return None
+    category = category.group('category')
+    found = []
+    for first, last in codes:
+        for code in range(first, last + 1):
+            code_category = unicodedata.category(unichr(code))
+            if code_category == 'Cn':
+                return None
+            if code_category.startswith(category):
+                found.append((code, code))
+    found = CodeSet(found)
+    return codes - found if text[1] == 'P' else found
+
+
+def evaluated_class(text, ascii=False):
+    # the text of a character class computed into its sorted ranges, None if it's not sure to match the same;
+    # ascii: whether the regex has the ASCII flag, making \d \w \s exact and \p{..} ASCII-only
+    try:
+        node = ClassParser(text).parse()
+    except Unparsable:
+        return None
+    negated = node[0] == 'not'
+    if negated:
+        node = node[1]
+    if not is_bounded(node):
+        return None
+
+    leaves = set_leaves(node)
+    if any(leaf[0] == ('property' if ascii else 'shorthand') for leaf in leaves):
+        return None
+    def exact_codes(leaf):
+        if leaf[0] == 'codes':
+            return leaf[1]
+        codes = ASCII_SHORTHAND_CODES[leaf[1].lower()]
+        return codes.complement() if leaf[1].isupper() else codes
+    bound = NO_CODES # what the class can match is among these
+    for leaf in leaves:
+        if is_bounded(leaf):
+            bound = bound | exact_codes(leaf)
+    if sum(last - first + 1 for first, last in bound) > MAX_EVALUATED_CODES or bound[-1][1] > 0xFFFF:
+        return None
+    for first, last in bound - CodeSet([(0, 0x7F)]) - FOLDS_WITH_ASCII: # no other cased non-ASCII
+        for code in range(first, last + 1):
+            char = unichr(code)
+            if unicodedata.category(char) == 'Cn' or char.lower() != char or char.upper() != char:
+                return None
+
+    universe = bound | ASCII_LETTERS | FOLDS_WITH_ASCII
+    leaf_sets = {}
+    for leaf in leaves:
+        codes = property_codes(leaf[1], universe) if leaf[0] == 'property' else exact_codes(leaf) & universe
+        if codes is None:
+            return None
+        leaf_sets[leaf] = codes
+    codes = evaluate_set(node, universe, lambda leaf: leaf_sets[leaf])
+    if not codes:
+        return None
+    result = '[%s%s]' % ('^' if negated else '', ''.join(codes_class_items(codes)))
+    for shorthand, shorthand_codes in sorted(ASCII_SHORTHAND_CODES.items()):
+        if ascii and codes == shorthand_codes:
+            result = '\\' + (shorthand.upper() if negated else shorthand)
+
+    # with IGNORECASE the engine tests case variants per operand, and has its quirks doing so (e.g. under
+    # (?i) [c[^B]&&A-Z] matches B) -- so have the engine confirm, for every character that may match
+    for flags in ('', 'i'):
+        flags = '(?V1%s%s)' % (flags, 'a' if ascii else '')
+        original = regexlib.compile(flags + text)
+        evaluated = regexlib.compile(flags + result)
+        for first, last in universe:
+            for code in range(first, last + 1):
+                char = unichr(code)
+                if bool(original.fullmatch(char)) != bool(evaluated.fullmatch(char)):
+                    return None
+    return result
+
+
+def union_leaves(node):
+    # the leaves of a node of implicit unions only, None if there's a set operation or negation in it
+    if node[0] == '||':
+        left, right = union_leaves(node[1]), union_leaves(node[2])
+        return None if left is None or right is None else left + right
+    if node[0] in ('codes', 'property', 'shorthand'):
+        return [node]
+    return None
+
+
+def canonical_class(text, ascii=False):
+    # the canonical text of a character class without set operations: its characters as sorted, merged
+    # ranges, \d \w \s in place of the ranges they cover (all of them with the ASCII flag, the ASCII ones
+    # without), then the properties -- each item once, but for the properties: with IGNORECASE the engine
+    # takes a lone property differently, [\P{Lu}\P{Lu}] matches \u00df and [\P{Lu}] doesn't. None if it
+    # has set operations or nested negations.
+    try:
+        node = ClassParser(text).parse()
+    except Unparsable:
+        return None
+    negated = node[0] == 'not'
+    leaves = union_leaves(node[1] if negated else node)
+    if leaves is None:
+        return None
+    codes = NO_CODES
+    shorthands = set()
+    properties = []
+    for kind, value in leaves:
+        if kind == 'codes':
+            codes = codes | value
+        elif kind == 'shorthand' and ascii and value.islower():
+            codes = codes | ASCII_SHORTHAND_CODES[value]
+        elif kind == 'shorthand':
+            shorthands.add(value)
+        else:
+            properties.append(value)
+    for shorthand, shorthand_codes in sorted(ASCII_SHORTHAND_CODES.items(), key=lambda item: item[0] != 'w'):
+        if shorthand in shorthands: # covers its ASCII characters whatever the flags
+            codes = codes - shorthand_codes
+        elif ascii and not shorthand_codes - codes:
+            codes = codes - shorthand_codes
+            shorthands.add(shorthand)
+    if 'w' in shorthands:
+        shorthands.discard('d')
+    items = ['\\' + shorthand for shorthand in sorted(shorthands)] + codes_class_items(codes) + sorted(properties)
+    if negated and len(items) == 1 and items[0][:2] in ('\\p', '\\P'):
+        return items[0].swapcase()[:3] + items[0][3:] # \P{..} for [^\p{..}]
+    return '[%s%s]' % ('^' if negated else '', ''.join(items))
+
+
+class OutputParser(object):
+    def __init__(self, text, flags=None):
+        # flags: the flags the regex gets compiled with, None if not known
+        self.text = text
+        self.pos = 0
+        self.ignorecase = [True] # whether IGNORECASE may be on, innermost scope last
+        self.dotall = [True]     # whether DOTALL may be on
+        self.verbose = [False]   # whether VERBOSE may be on
+        self.flags_known = flags is not None
+        if flags is not None:
+            self.ignorecase = [bool(flags & regexlib.IGNORECASE)]
+            self.dotall = [bool(flags & regexlib.DOTALL)]
+            self.verbose = [bool(flags & regexlib.VERBOSE)]
+        self.called_names = set()
+
+    def parse(self):
+        match = GLOBAL_FLAGS_RE.match(self.text)
+        if not match or 'V1' not in match.group(1) or 'r' in match.group(1):
+            raise Unparsable('not a version-1, forward-matching regex')
+        for flag, stack in (('i', self.ignorecase), ('s', self.dotall), ('x', self.verbose)):
+            stack[0] = stack[0] or flag in match.group(1)
+        self.pos = match.end()
+        try:
+            tree = self.alternation()
+        except RuntimeError: # too deeply nested, python's recursion limit reached
+            raise Unparsable('nested too deeply')
+        if self.pos != len(self.text):
+            raise Unparsable('unexpected %s' % self.text[self.pos])
+        global_flags = Assertion(match.group(0), 'flags')
+        if type(tree) is Sequence:
+            return Sequence((global_flags,) + tree.items)
+        return Sequence((global_flags, tree)) # matching nothing, the flags don't bind tighter than the |
+
+    def peek(self, length=1):
+        return self.text[self.pos:self.pos + length]
+
+    def alternation(self):
+        branches = [self.sequence()]
+        while self.peek() == '|':
+            self.pos += 1
+            branches.append(self.sequence())
+        if len(branches) == 1:
+            return branches[0]
+        return Branches(tuple(branches))
+
+    def sequence(self):
+        items = []
+        while self.pos < len(self.text) and self.peek() not in '|)':
+            atom = self.atom()
+            match = QUANTIFIER_RE.match(self.text, self.pos)
+            if match:
+                quantifier = match.group(0)[:len(match.group(0)) - len(match.group(4))]
+                if quantifier[0] == '{':
+                    low, comma, high = match.group(1, 2, 3)
+                    minimum = int(low or 0)
+                    maximum = (int(high) if high else None) if comma else minimum
+                else:
+                    minimum = 1 if quantifier == '+' else 0
+                    maximum = 1 if quantifier == '?' else None
+                atom = Repeat(atom, minimum, maximum, quantifier, match.group(4))
+                self.pos = match.end()
+            items.append(atom)
+        return Sequence(tuple(items))
+
+    def atom(self):
+        char = self.peek()
+        if self.verbose[-1] and (char.isspace() or char == '#'):
+            raise Unparsable('verbose-mode whitespace/comment')
+        if char == '(':
+            return self.group()
+        if char == '[':
+            start = self.pos
+            chars = self.charclass()
+            return CharSet(self.text[start:self.pos], self.fold(chars))
+        if char == '\\':
+            return self.escape()
+        self.pos += 1
+        if char == '.':
+            dot = Chars(CodeSet([(0, 9), (11, MAX_CODEPOINT)]), ALL_CODES) if self.dotall[-1] else ~Chars.exactly(CodeSet.of('\n'))
+            return CharSet(char, dot)
+        if char == '^':
+            return Assertion(char, 'position')
+        if char == '$':
+            return Assertion(char, 'eol')
+        if char in '*+?{':
+            raise Unparsable('misplaced quantifier')
+        if (char.isspace() or char == '#') and not self.flags_known: # not literal if compiled with VERBOSE
+            return Opaque(char)
+        return Char(char, ord(char), self.fold(Chars.exactly(CodeSet([(ord(char), ord(char))]))))
+
+    def fold(self, chars):
+        # what `chars` matches if IGNORECASE may be on: only the characters whose other cases are all in it are
+        # sure to match -- e.g. (?i)[^a] doesn't match A
+        if self.ignorecase[-1]:
+            return Chars(chars.sure - case_closure(chars.sure.complement()), case_closure(chars.maybe))
+        return chars
+
+    def escape(self):
+        match = OUTPUT_ESCAPE_RE.match(self.text, self.pos)
+        if not match:
+            raise Unparsable('unknown escape %s' % self.peek(2))
+        self.pos = match.end()
+        text = match.group(0)
+        if match.group('assertion'):
+            return Assertion(text, 'eos' if text == r'\Z' else 'position')
+        if match.group('opaque'):
+            return Opaque(text)
+        chars = self.escaped_chars(match)
+        if isinstance(chars, Chars):
+            return CharSet(text, self.fold(chars))
+        return Char(text, chars, self.fold(Chars.exactly(CodeSet([(chars, chars)]))))
+
+    def escaped_chars(self, match):
+        # the code point of an escaped character, or Chars for the escapes of character classes
+        if match.group('single'):
+            return SINGLE_ESCAPES[match.group('single')]
+        for group in ('hex', 'hex4', 'hex8'):
+            if match.group(group):
+                return int(match.group(group), 16)
+        if match.group('octal'):
+            return int(match.group('octal'), 8)
+        if match.group('name'):
+            try:
+                char = unicodedata.lookup(match.group('name'))
+            except KeyError:
+                raise Unparsable('unknown character name')
+            return ord(char) if len(char) == 1 else UNKNOWN_CHARS
+        if match.group('property'):
+            return UNKNOWN_CHARS
+        if match.group('shorthand'):
+            return SHORTHAND_CHARS[match.group('shorthand')]
+        return ord(match.group('literal'))
+
+    def group(self):
+        start = self.pos
+        text = self.text
+        if text.startswith('(?P=', start) or text.startswith('(?&', start):
+            end = text.find(')', start)
+            if end < 0:
+                raise Unparsable('unclosed group')
+            self.pos = end + 1
+            if text[start + 2] == '&':
+                self.called_names.add(text[start + 3:end])
+            return Opaque(text[start:self.pos])
+
+        flags = SCOPED_FLAGS_RE.match(text, start)
+        if flags:
+            opener = flags.group(0)
+        elif text.startswith('(?(', start):
+            end = text.find(')', start + 3)
+            if end < 0:
+                raise Unparsable('unclosed condition')
+            opener = text[start:end + 1]
+        else:
+            opener = None
+            for candidate in ('(?:', '(?>', '(?=', '(?!', '(?<=', '(?<!'):
+                if text.startswith(candidate, start):
+                    opener = candidate
+                    break
+            else:
+                if text.startswith('(?P<', start):
+                    end = text.find('>', start)
+                    opener = text[start:end + 1]
+                elif not text.startswith('(?', start):
+                    opener = '('
+            if not opener:
+                raise Unparsable('unknown group %s' % text[start:start + 3])
+
+        self.pos = start + len(opener)
+        if flags:
+            turn_ons, turn_offs = flags.group(1), flags.group(2) or ''
+            for flag, stack in (('i', self.ignorecase), ('s', self.dotall), ('x', self.verbose)):
+                stack.append(stack[-1] and flag not in turn_offs or flag in turn_ons)
+        body = self.alternation()
+        if flags:
+            for stack in (self.ignorecase, self.dotall, self.verbose):
+                stack.pop()
+        if self.peek() != ')':
+            raise Unparsable('unclosed group')
+        self.pos += 1
+
+        if opener.startswith('(?('):
+            if type(body) is not Branches:
+                return Conditional(opener, body, None)
+            if len(body.items) != 2:
+                raise Unparsable('conditional with more than two branches')
+            return Conditional(opener, body.items[0], body.items[1])
+        return Group(opener, body)
+
+    def charclass(self):
+        self.pos += 1 # the [
+        negated = self.peek() == '^'
+        if negated:
+            self.pos += 1
+        chars = self.set_operation(0)
+        if self.peek() != ']':
+            raise Unparsable('unclosed character class')
+        self.pos += 1
+        return ~chars if negated else chars
+
+    def set_operation(self, level):
+        if level == len(SET_OPERATORS):
+            return self.set_items()
+        operator = SET_OPERATORS[level]
+        chars = self.set_operation(level + 1)
+        while self.peek(2) == operator:
+            self.pos += 2
+            operand = self.set_operation(level + 1)
+            chars = {
+                '||' : lambda: chars | operand,
+                '~~' : lambda: chars ^ operand,
+                '&&' : lambda: chars & operand,
+                '--' : lambda: chars - operand,
+            }[operator]()
+        return chars
+
+    def set_items(self):
+        chars = None
+        while self.peek() != ']' and self.peek(2) not in SET_OPERATORS:
+            if self.pos >= len(self.text):
+                raise Unparsable('unclosed character class')
+            if self.peek(2) == '[:':
+                end = self.text.find(':]', self.pos)
+                if end < 0:
+                    raise Unparsable('unclosed POSIX class')
+                self.pos = end + 2
+                item = UNKNOWN_CHARS
+            elif self.peek() == '[':
+                item = self.charclass()
+            else:
+                item = self.class_char()
+                if not isinstance(item, Chars):
+                    first = item
+                    if self.peek() == '-' and self.peek(2) != '--' and self.text[self.pos + 1:self.pos + 2] not in ('', ']'):
+                        self.pos += 1
+                        last = self.class_char()
+                        if isinstance(last, Chars) or last < first:
+                            raise Unparsable('bad range')
+                    else:
+                        last = first
+                    item = Chars.exactly(CodeSet([(first, last)]))
+            chars = item if chars is None else chars | item
+        if chars is None:
+            raise Unparsable('empty set')
+        return chars
+
+    def class_char(self):
+        # the code point of the next character of a character class, or Chars for e.g. \d inside a class
+        char = self.peek()
+        if char != '\\':
+            self.pos += 1
+            return ord(char)
+        if self.peek(2) == r'\b':
+            self.pos += 2
+            return 0x08
+        octal = CLASS_OCTAL_RE.match(self.text, self.pos)
+        if octal:
+            self.pos = octal.end()
+            return int(octal.group(1), 8)
+        match = OUTPUT_ESCAPE_RE.match(self.text, self.pos)
+        if not match or match.group('assertion') or match.group('opaque'):
+            raise Unparsable('unknown escape %s' % self.peek(2))
+        self.pos = match.end()
+        return self.escaped_chars(match)
+
+
+class OutputTree(object):
+    def __init__(self, regex, flags=None):
+        parser = OutputParser(regex, flags)
+        self.root = parser.parse()
+        self.called_names = parser.called_names # groups matched also wherever they're called with (?&name)
+        self.firsts = {}
+
+    def first(self, node):
+        # memoized first_of(), keyed by identity -- the memo keeps the node alive so its id isn't reused
+        try:
+            return self.firsts[id(node)][1]
+        except KeyError:
+            first = first_of(node, self)
+            self.firsts[id(node)] = node, first
+            return first
+
+
+# What can come first in a match of a node, or after it (see follow_of()):
+#   chars    -- CodeSet, the next character has to be one of these
+#   nullable -- the node can match without consuming a character, so what comes after it can come first too
+#   tainted  -- on that empty match, it tests its surroundings (lookarounds, anchors) -- so it may fail at
+#               one position and succeed at another although the next character is the same
+#   unknown  -- can't tell (backreferences, subroutine calls), don't draw any conclusion
+First = namedtuple('First', 'chars nullable tainted unknown')
+
+EMPTY_FIRST = First(NO_CODES, True, False, False)
+UNKNOWN_FIRST = First(ALL_CODES, True, True, True)
+
+
+def concat_first(first, then):
+    if not first.nullable:
+        return first
+    return First(first.chars | then.chars, then.nullable, first.tainted or then.tainted, first.unknown or then.unknown)
+
+
+def union_first(firsts):
+    ranges = []
+    for first in firsts:
+        ranges.extend(first.chars)
+    return First(CodeSet(ranges),
+        any(first.nullable for first in firsts),
+        any(first.tainted for first in firsts),
+        any(first.unknown for first in firsts),
+    )
+
+
+def first_of(node, tree):
+    node_type = type(node)
+    if node_type in (Char, CharSet):
+        first = First(node.chars.maybe, False, False, False)
+    elif node_type is Assertion:
+        first = {
+            'flags'    : EMPTY_FIRST,
+            'position' : First(NO_CODES, True, True, False),
+            'eol'      : First(CodeSet.of('\n'), False, False, False),
+            'eos'      : First(NO_CODES, False, False, False),
+        }[node.kind]
+    elif node_type is Sequence:
+        first = EMPTY_FIRST
+        for item in node.items:
+            first = concat_first(first, tree.first(item))
+            if not first.nullable:
+                break
+    elif node_type is Branches:
+        first = union_first([tree.first(item) for item in node.items])
+    elif node_type is Repeat:
+        first = tree.first(node.body)
+        if node.min == 0 and not first.nullable:
+            first = First(first.chars, True, first.tainted, first.unknown)
+    elif node_type is Group:
+        first = tree.first(node.body)
+        if node.opener == '(?=':
+            if first.nullable:
+                first = First(NO_CODES, True, first.tainted, first.unknown)
+        elif node.opener in ('(?!',) + Group.LOOKBEHINDS:
+            first = First(NO_CODES, True, True, first.unknown)
+    else: # Opaque, Conditional
+        first = UNKNOWN_FIRST
+    return first
+
+
+MAX_LIMITER_RANGES = 8 # the most code point ranges spelled out in a limiter's class of first characters
+
+def codes_class_items(codes):
+    # a CodeSet as character class items
+    def escape(code):
+        if code < 0x80:
+            return class_escape(unichr(code))
+        return '\\u%04x' % code if code <= 0xFFFF else '\\U%08x' % code
+    return [escape(first) if first == last else escape(first) + '-' + escape(last) for first, last in codes]
+
+
+def first_class_items(node, tree, scoped=False):
+    # what a match of the node can start with, as in first_of(): a list of code point ranges and the text of
+    # character classes, None if unknown. It's compiled with the regex' flags but outside the node's scoped
+    # flags (if scoped) -- there, the code points the node may match are taken instead of its text. Like for
+    # string literal limiters, multi-character case folds (ß ~ ss) outside scoped flags aren't accounted for.
+    node_type = type(node)
+    if node_type is Char and not scoped:
+        return [(node.codepoint, node.codepoint)]
+    if node_type is CharSet and not scoped and node.text != '.' and node.chars.sure != node.chars.maybe:
+        return [node.text]
+    if node_type in (Char, CharSet):
+        return list(node.chars.maybe)
+    if node_type is Assertion:
+        return [(0x0A, 0x0A)] if node.kind == 'eol' else []
+    if node_type in (Sequence, Branches):
+        items = []
+        for item in node.items:
+            item_items = first_class_items(item, tree, scoped)
+            if item_items is None:
+                return None
+            items.extend(item_items)
+            if node_type is Sequence and not tree.first(item).nullable:
+                break
+        return items
+    if node_type is Repeat:
+        return first_class_items(node.body, tree, scoped)
+    if node_type is Group:
+        if node.opener in ('(?!',) + Group.LOOKBEHINDS or node.opener == '(?=' and tree.first(node.body).nullable:
+            return []
+        return first_class_items(node.body, tree, scoped or any(opener_flags(node.opener) or ()))
+    return None # Opaque, Conditional
+
+
+def first_chars_class(regex):
+    # CharClass of the characters a match of the regex can start with, None if it can match without consuming
+    # one, if they can't be told, or if they're every printable ASCII character anyway
+    try:
+        tree = OutputTree('(?V1w)' + regex)
+    except Unparsable:
+        return None
+    first = tree.first(tree.root)
+    if first.nullable or first.unknown or CodeSet([(0x20, 0x7E)]) - first.chars == NO_CODES:
+        return None
+    items = first_class_items(tree.root, tree)
+    if items is None:
+        return None
+    codes = CodeSet(item for item in items if type(item) is tuple)
+    if len(codes) > MAX_LIMITER_RANGES:
+        return None
+    class_items = codes_class_items(codes)
+    for item in items:
+        if type(item) is tuple:
+            continue
+        if item.startswith('[') and not item.startswith('[^') and not any(op in item for op in SET_OPERATORS):
+            item = item[1:-1]
+        if item not in class_items:
+            class_items.append(item)
+    return CharClass('[%s]' % ''.join(class_items), is_set_op=False)
+
+
+# After the whole regex comes the end of the match, reaching it untainted means success. The end of an
+# atomic group/lookahead/possessive repeat is never backtracked into either, but is left alone: making what's
+# already atomic possessive gains nothing, and the regex module doesn't always agree -- e.g. (?>\d*)+. fails
+# to match '1' where (?>\d*A*+)+. matches.
+END_FOLLOW = EMPTY_FIRST
+ATOMIC_END_FOLLOW = First(NO_CODES, True, True, False)
+
+
+def for_each_follow(tree, node, follow, visit, in_loop=False):
+    # calls visit(node, follow, in_loop) for the node and all its descendants, with `follow` being what can
+    # come after them, as First, and `in_loop` whether they're inside a repeat of more than one iteration.
+    # Then rebuilds the tree with the nodes visit() returned -- nodes whose descendants are all returned
+    # as they are stay the same objects.
+    # Lookbehinds are matched backwards, so their contents are left alone.
+    node_type = type(node)
+    if node_type is Sequence:
+        follows = []
+        for item in reversed(node.items):
+            follows.append(follow)
+            follow = concat_first(tree.first(item), follow)
+        items = tuple(for_each_follow(tree, item, item_follow, visit, in_loop)
+            for item, item_follow in zip(node.items, reversed(follows)))
+        if any(new is not old for new, old in zip(items, node.items)):
+            node = node._replace(items=items)
+    elif node_type is Branches:
+        items = tuple(for_each_follow(tree, item, follow, visit, in_loop) for item in node.items)
+        if any(new is not old for new, old in zip(items, node.items)):
+            node = node._replace(items=items)
+    elif node_type is Group and node.opener not in Group.LOOKBEHINDS:
+        if node.opener == '(?>' or node.opener in Group.LOOKAHEADS:
+            body_follow = ATOMIC_END_FOLLOW
+        elif node.name in tree.called_names: # also matched wherever it's called
+            body_follow = UNKNOWN_FIRST
+        else:
+            body_follow = follow
+        body = for_each_follow(tree, node.body, body_follow, visit, in_loop)
+        if body is not node.body:
+            node = node._replace(body=body)
+    elif node_type is Repeat:
+        body_follow = ATOMIC_END_FOLLOW if node.mode == '+' else follow
+        if node.max != 1: # another iteration may come after
+            body_follow = union_first([concat_first(tree.first(node.body), body_follow), body_follow])
+        body_in_loop = in_loop or node.max != 1
+        body = for_each_follow(tree, node.body, body_follow, visit, body_in_loop)
+        if body is not node.body:
+            node = node._replace(body=body)
+    elif node_type is Conditional:
+        if node.opener == '(?(DEFINE)':
+            follow = UNKNOWN_FIRST
+        yes = for_each_follow(tree, node.yes, follow, visit, in_loop)
+        no = node.no if node.no is None else for_each_follow(tree, node.no, follow, visit, in_loop)
+        if yes is not node.yes or no is not node.no:
+            node = node._replace(yes=yes, no=no)
+    return visit(node, follow, in_loop)
+
+
+def can_fail_after(follow):
+    # whether what follows can fail to match, i.e. the engine may have to backtrack into what's before it
+    return follow.unknown or follow.tainted or not follow.nullable
+
+
+def gives_back_uselessly(node, follow):
+    # whether a greedy repeat of a single character is never better off giving back characters: nothing that
+    # can follow it starts with a character it matched, nor succeeds without looking at the next character
+    return (type(node) is Repeat and node.mode == '' and node.min != node.max
+        and type(node.body) in (Char, CharSet)
+        and not follow.unknown and not (follow.nullable and follow.tainted)
+        and follow.chars.isdisjoint(node.body.chars.maybe))
+
+
+def possessify(tree):
+    # Greedy quantifiers that only give back characters uselessly can just as well be possessive.
+    # Not inside repeats of more than one iteration though: with regex 2016.6.5, backtracking through more
+    # than ~70 iterations of e.g. (?:a++b)+; crashes the interpreter, and an atomic group repeated possessively
+    # isn't: (?:a(?>a)++)?a matches 'aaa' in full.
+    def visit(node, follow, in_loop):
+        if not in_loop and gives_back_uselessly(node, follow):
+            return node._replace(mode='+')
+        return node
+    tree.root = for_each_follow(tree, tree.root, END_FOLLOW, visit)
+
+
+def consumes(node):
+    # whether every match of the node is at least one character long
+    node_type = type(node)
+    if node_type in (Char, CharSet):
+        return True
+    if node_type is Sequence:
+        return any(consumes(item) for item in node.items)
+    if node_type is Branches:
+        return all(consumes(item) for item in node.items)
+    if node_type is Group:
+        return node.opener not in Group.LOOKAHEADS + Group.LOOKBEHINDS and consumes(node.body)
+    if node_type is Repeat:
+        return node.min > 0 and consumes(node.body)
+    return False # Assertion, Opaque, Conditional
+
+
+def atomize(tree, orblocks):
+    # If the branches of an OR-block each consume a first character none of the others can start with, at most
+    # one of them can match at any position. If moreover none of them can match in more than one way --
+    # they're "rigid" -- backtracking into the OR-block is useless, so it can just as well be atomic: when
+    # what follows fails, the engine then gives up on the block at once instead of retrying every branch.
+    # Not done when what follows can't fail, nor inside repeats of more than one iteration (see possessify()).
+    # Returns the line numbers of the OR-blocks made atomic.
+    lines = defaultdict(list)
+    for lineno, regex in orblocks:
+        lines[regex].append(lineno)
+    rigid = {}  # id(node) -> node, whether it's rigid
+    added = {}  # id(group) -> group, for the atomic groups added
+    atomized = set()
+
+    def is_rigid(node):
+        return id(node) in rigid and rigid[id(node)][1]
+
+    def visit(node, follow, in_loop):
+        node_type = type(node)
+        if node_type in (Char, CharSet, Assertion):
+            is_rigid_node = True
+        elif node_type is Opaque:
+            is_rigid_node = not node.text.startswith('(?&') and node.text != r'\X'
+        elif node_type is Sequence:
+            is_rigid_node = all(is_rigid(item) for item in node.items)
+        elif node_type is Group:
+            if node.opener == '(?:' and id(node.body) in added: # (?:(?>...)) is just (?>...)
+                node = node.body
+            is_rigid_node = node.opener in ('(?>',) + Group.LOOKAHEADS + Group.LOOKBEHINDS or is_rigid(node.body)
+        elif node_type is Repeat:
+            is_rigid_node = (node.mode == '+' or node.min == node.max and is_rigid(node.body)
+                or gives_back_uselessly(node, follow))
+        elif node_type is Branches:
+            is_rigid_node = False
+            chars = NO_CODES
+            for item in node.items:
+                first = tree.first(item)
+                if first.unknown or not is_rigid(item) or not consumes(item) or not chars.isdisjoint(first.chars):
+                    break
+                chars = chars | first.chars
+            else: # rigid, whether it's made atomic or not
+                is_rigid_node = True
+                regex = unparse(node, added)
+                if regex in lines and can_fail_after(follow) and not in_loop:
+                    node = Group('(?>', node)
+                    added[id(node)] = node
+                    atomized.update(lines[regex])
+        else: # Conditional
+            is_rigid_node = False
+        rigid[id(node)] = node, is_rigid_node
+        return node
+
+    tree.root = for_each_follow(tree, tree.root, END_FOLLOW, visit)
+    return sorted(atomized)
+
+
+# Pruning: FAIL! emits (?!), which never matches -- nor does anything needing it to: a sequence containing it, an
+# OR-block whose branches all contain it, a repeat of it that has to match at least once, a lookahead for it.
+# Neither does a backreference to a capture that's never set where it's tried, and a conditional on such a
+# capture always takes its no-branch. The prune option follows this up the output tree and leaves out what the
+# engine would try for nothing: OR-block branches that never match, quantified expressions that can only match
+# zero times, negative lookarounds that always succeed and the yes-branch of those conditionals.
+Pruned = namedtuple('Pruned', 'lineno message')
+
+
+def always_matches(node):
+    # whether the node matches (the empty string) wherever it's tried
+    node_type = type(node)
+    if node_type is Sequence:
+        return all(always_matches(item) for item in node.items)
+    if node_type is Branches:
+        return any(always_matches(item) for item in node.items)
+    if node_type is Group:
+        return node.opener not in ('(?!', '(?<!') and always_matches(node.body)
+    if node_type is Repeat:
+        return node.min == 0 or always_matches(node.body)
+    return False # Char, CharSet, Assertion, Opaque, Conditional
+
+
+def capture_names_in(node):
+    names = set()
+    if type(node) is Group and node.name is not None:
+        names.add(node.name)
+    for child in children_of(node):
+        names.update(capture_names_in(child))
+    return names
+
+
+def pinned(node, called_names):
+    # whether the node can't be left out: it has a numbered group (the ones after it would be renumbered)
+    # or a group called with (?&name) elsewhere
+    if type(node) is Group and (node.opener == '(' or node.name in called_names):
+        return True
+    return any(pinned(child, called_names) for child in children_of(node))
+
+
+def prune(tree, orblocks, quantifiers):
+    # Returns the Pruned parts in source order, and the (lineno, regex) of the OR-blocks rewritten -- so
+    # atomize() still recognizes them.
+    linenos = source_linenos(tree.root, list(orblocks) + list(quantifiers))
+    orblock_lines = {}
+    for lineno, regex in orblocks:
+        orblock_lines.setdefault(regex, lineno)
+    called_names = tree.called_names
+    found = []
+    rewritten = []
+
+    def report(node, kind):
+        found.append(Pruned(linenos[id(node)], '%s: %s' % (kind, excerpt(unparse(node)))))
+
+    def walk(node, seen):
+        # the node pruned, and whether it never matches; seen: names of the captures that may be set by
+        # the time the node is tried, updated with the ones it sets
+        node_type = type(node)
+        if node_type is Opaque:
+            if node.text.startswith('(?P=') and node.text[4:-1] in gone: # (?!) for what's left
+                return Group('(?!', Sequence(())), True
+            return node, node.text.startswith('(?P=') and node.text[4:-1] not in seen
+
+        if node_type is Sequence:
+            items = []
+            never = False
+            for item in node.items:
+                item, item_never = walk(item, seen)
+                items.append(item)
+                never = never or item_never
+            return Sequence(tuple(items)), never
+
+        if node_type is Branches:
+            walked = [] # (item, pruned item, whether it never matches, captures seen after it, what was pruned in it)
+            for item in node.items:
+                item_seen = set(seen)
+                mark = len(found)
+                pruned_item, never = walk(item, item_seen)
+                walked.append((item, pruned_item, never, item_seen, found[mark:]))
+                del found[mark:]
+            all_never = all(never for _, _, never, _, _ in walked)
+            items = []
+            for item, pruned_item, never, item_seen, item_found in walked:
+                if never and not all_never and not pinned(item, called_names):
+                    report(item, 'OR-block branch never matches')
+                    continue
+                items.append(pruned_item)
+                seen.update(item_seen)
+                found.extend(item_found)
+            pruned = Branches(tuple(items))
+            if node.items != pruned.items and unparse(node) in orblock_lines:
+                rewritten.append((orblock_lines[unparse(node)], unparse(pruned)))
+            return pruned, all_never
+
+        if node_type is Group:
+            mark = len(found)
+            body_seen = set(seen)
+            body, never = walk(node.body, body_seen)
+            if node.opener in ('(?!', '(?<!'):
+                if never and not pinned(node, called_names):
+                    del found[mark:] # what was pruned inside goes along
+                    report(node, 'negative lookaround always succeeds')
+                    return Sequence(()), False
+                never = always_matches(body)
+            seen.update(body_seen)
+            if node.name is not None:
+                seen.add(node.name)
+            if (node.opener == '(?:' and type(node.body) is Branches and len(body.items) == 1 < len(node.body.items)
+                    and not ABSORBS_DIGITS_RE.search(unparse(body))): # (?:\1)0 isn't \10
+                return body.items[0], never # an OR-block down to one branch needs no group
+            return Group(node.opener, body), never
+
+        if node_type is Repeat:
+            if node.max != 1: # a later iteration may see the captures of an earlier one
+                seen.update(capture_names_in(node.body) - gone)
+            mark = len(found)
+            body_seen = set(seen)
+            body, never = walk(node.body, body_seen)
+            if type(body) is not type(node.body): # left out, or its group: (?:) can still be repeated as a whole
+                body = Group('(?:', body)
+            if never and node.min == 0 and not pinned(node, called_names):
+                del found[mark:]
+                report(node, 'quantified expression can only match zero times')
+                return Sequence(()), False
+            seen.update(body_seen)
+            return node._replace(body=body), never and node.min > 0
+
+        if node_type is Conditional:
+            if node.opener == '(?(DEFINE)':
+                return node, False
+            name = node.opener[3:-1]
+            if not name.isdigit() and name not in seen and not pinned(node.yes, called_names):
+                report(node, 'condition on a capture never set by then')
+                if node.no is None:
+                    return Sequence(()), False
+                no, never = walk(node.no, seen)
+                if type(no) is Branches or ABSORBS_DIGITS_RE.search(unparse(no)):
+                    return Group('(?:', no), never
+                return no, never
+            yes_seen, no_seen = set(seen), set(seen)
+            yes, yes_never = walk(node.yes, yes_seen)
+            no, no_never = (None, False) if node.no is None else walk(node.no, no_seen)
+            seen.update(yes_seen | no_seen)
+            return Conditional(node.opener, yes, no), yes_never and no_never
+
+        return node, False # Char, CharSet, Assertion
+
+    # Leaving out a capture makes its backreferences & conditionals elsewhere dead too, which may leave out
+    # more captures: repeated until none goes.
+    names = capture_names_in(tree.root)
+    gone = set()
+    while True:
+        del found[:], rewritten[:]
+        # a called group is matched wherever it's called, its captures may be set anywhere
+        seen = names - gone if called_names else set()
+        root = walk(tree.root, seen)[0]
+        if names - capture_names_in(root) <= gone:
+            break
+        gone = names - capture_names_in(root)
+    if gone: # never-matching stubs, so the match objects still have the groups: None, as they'd be
+        stubs = tuple(Group('(?P<%s>' % name, Group('(?!', Sequence(()))) for name in sorted(gone))
+        last = root.items[-1] if root.items else None
+        if type(last) is Conditional and last.opener == '(?(DEFINE)': # the one of share_definitions
+            root = Sequence(root.items[:-1] + (Conditional(last.opener, Sequence(last.yes.items + stubs), None),))
+        else:
+            root = Sequence(root.items + (Conditional('(?(DEFINE)', Sequence(stubs), None),))
+    tree.root = root
+    return sorted(found), rewritten
+
+
+# Lookahead order: lookaheads next to each other are tried at the same position, and the first one failing
+# spares trying the rest. Without captures, backreferences, calls or conditionals in them, their order makes
+# no other difference -- so they're tried cheapest first: by their cost over the chance they fail.
+TYPICAL_LENGTH = 64 # the characters a scan through the rest of the text is taken to go through
+MIN_FAIL_RATE = 0.01
+
+
+def scan_cost(node):
+    # a rough count of the characters trying a node goes through
+    node_type = type(node)
+    if node_type in (Char, CharSet):
+        return 1
+    if node_type is Assertion:
+        return 0
+    if node_type is Opaque: # a backreference or call may go through as much as a scan
+        return TYPICAL_LENGTH
+    if node_type in (Sequence, Branches):
+        return sum(scan_cost(item) for item in node.items)
+    if node_type is Group:
+        return scan_cost(node.body)
+    if node_type is Repeat:
+        return scan_cost(node.body) * (max(node.min, TYPICAL_LENGTH) if node.max is None else node.max)
+    return sum(scan_cost(child) for child in children_of(node)) # Conditional
+
+
+def pass_rate(tree, lookahead):
+    # the chance a lookahead succeeds, going by the printable ASCII characters its body can start with
+    first = tree.first(lookahead.body)
+    if first.nullable or first.unknown:
+        rate = 1.0
+    else:
+        rate = sum(last - start + 1 for start, last in first.chars & PRINTABLE_ASCII) / 95.0
+    return rate if lookahead.opener == '(?=' else 1 - rate
+
+
+def lookahead_cost(tree, lookahead):
+    # the order key of a lookahead, cheapest first
+    return scan_cost(lookahead.body) / max(1 - pass_rate(tree, lookahead), MIN_FAIL_RATE)
+
+
+def independent(node):
+    # whether the node has no captures, backreferences, calls or conditionals, tying it to the rest of the regex
+    if type(node) is Opaque and len(node.text) > 1 or type(node) is Conditional or type(node) is Group and (node.opener == '(' or node.name is not None):
+        return False
+    return all(independent(child) for child in children_of(node))
+
+
+def is_orderable(node):
+    return type(node) is Group and node.opener in Group.LOOKAHEADS and independent(node)
+
+
+def order_lookaheads(tree):
+    # the order_lookaheads option: sorts each run of independent lookaheads by lookahead_cost()
+    def walk(node):
+        node_type = type(node)
+        if node_type is Sequence:
+            items = []
+            run = []
+            for item in node.items + (None,):
+                if item is not None and is_orderable(item):
+                    run.append(Group(item.opener, walk(item.body)))
+                    continue
+                items.extend(sorted(run, key=lambda lookahead: lookahead_cost(tree, lookahead)))
+                run = []
+                if item is not None:
+                    items.append(walk(item))
+            return Sequence(tuple(items))
+        if node_type is Branches:
+            return Branches(tuple(walk(item) for item in node.items))
+        if node_type in (Group, Repeat):
+            return node._replace(body=walk(node.body))
+        if node_type is Conditional:
+            return Conditional(node.opener, walk(node.yes), None if node.no is None else walk(node.no))
+        return node
+
+    tree.root = walk(tree.root)
+
+
+# Peephole: rewrites of the output tree into a shorter regex matching the same, each looking at a node and its
+# immediate surroundings. The flags i, m & s are tracked as True (on), False (off) or None (as compiled) --
+# the pattern may get compiled with any of them.
+PEEPHOLE_FLAGS = 'ims'
+ABSORBS_DIGITS_RE = regexlib.compile(r'\\(?:0[0-7]?|[1-9])\Z') # \0, \01, \1: a next digit would extend them
+
+
+def flag_sensitive(node, flag):
+    # whether what a node matches may depend on the flag
+    node_type = type(node)
+    if node_type is Opaque:
+        return len(node.text) > 1 # backreferences compare case-insensitively, subroutine calls: can't tell
+    if flag == 'i':
+        return node_type in (Char, CharSet) and (
+            node.chars.sure != node.chars.maybe or case_closure(node.chars.maybe) != node.chars.maybe)
+    if flag == 's':
+        return node_type is CharSet and node.text == '.'
+    return node_type is Assertion and node.text in ('^', '$')
+
+
+def matters_in(node, flag):
+    return flag_sensitive(node, flag) or any(matters_in(child, flag) for child in children_of(node))
+
+
+def opener_flags(opener):
+    # the flags a scoped-flags group turns on & off, None for other groups
+    flags = SCOPED_FLAGS_RE.match(opener)
+    if not flags:
+        return None
+    return flags.group(1), flags.group(2) or ''
+
+
+def flags_opener(turn_ons, turn_offs):
+    if not turn_ons and not turn_offs:
+        return '(?:'
+    return '(?%s%s:' % (turn_ons, '-' + turn_offs if turn_offs else '')
+
+
+def scoped_states(opener, states):
+    # the flag states inside a group, given the ones outside it
+    flags = opener_flags(opener)
+    if flags is None:
+        return states
+    states = dict(states)
+    for flag in flags[0]:
+        states[flag] = True
+    for flag in flags[1]:
+        states[flag] = False
+    return states
+
+
+def hoist_flags(root):
+    # A flag that's on wherever it matters can just as well be on globally, and one that matters nowhere needn't
+    # be turned on or off anywhere -- either way, the scoped-flags groups can leave it out.
+    global_flags = root.items[0].text
+    states = dict((flag, True if flag in GLOBAL_FLAGS_RE.match(global_flags).group(1) else None)
+        for flag in PEEPHOLE_FLAGS)
+    seen = defaultdict(set) # flag -> its states where it matters
+
+    def collect(node, states):
+        for flag in PEEPHOLE_FLAGS:
+            if flag_sensitive(node, flag):
+                seen[flag].add(states[flag])
+        if type(node) is Group:
+            states = scoped_states(node.opener, states)
+        for child in children_of(node):
+            collect(child, states)
+    collect(root, states)
+
+    hoisted = ''.join(flag for flag in PEEPHOLE_FLAGS if seen[flag] == set([True]) and not states[flag])
+    dropped = set(flag for flag in PEEPHOLE_FLAGS if not seen[flag] or seen[flag] == set([True]))
+    if not dropped:
+        return root
+
+    def strip(node):
+        if type(node) is Group:
+            flags = opener_flags(node.opener)
+            if flags is not None:
+                node = Group(flags_opener(*(''.join(flag for flag in turns if flag not in dropped) for turns in flags)),
+                    node.body)
+        if type(node) in (Sequence, Branches):
+            return node._replace(items=tuple(strip(item) for item in node.items))
+        if type(node) in (Group, Repeat):
+            return node._replace(body=strip(node.body))
+        if type(node) is Conditional:
+            return node._replace(yes=strip(node.yes), no=None if node.no is None else strip(node.no))
+        return node
+    root = strip(root)
+    return Sequence((Assertion(global_flags[:-1] + hoisted + ')', 'flags'),) + root.items[1:])
+
+
+def quantifier_text(min, max):
+    if max is None:
+        return {0 : '*', 1 : '+'}.get(min, '{%d,}' % min)
+    if (min, max) == (0, 1):
+        return '?'
+    return '{%d}' % min if min == max else '{%d,%d}' % (min, max)
+
+
+def merged_counts(outer, inner):
+    # (min, max) of a repeat of a repeat, e.g. (?:x{2}){3} -> (6, 6), if the counts it can match form a range --
+    # (?:x{2,3})* can't match 1 x, so it isn't x{0,} -- else None
+    (outer_min, outer_max), (inner_min, inner_max) = outer, inner
+    if outer_max == 0 or inner_max == 0:
+        return None
+    if outer_min == 0 and inner_min > 1: # gap between 0 and inner_min
+        return None
+    fewest = max(outer_min, 1) # the gap between k and k+1 iterations is widest at the fewest iterations
+    if (outer_max is None or outer_max > fewest) and inner_max is not None:
+        if inner_min > fewest * (inner_max - inner_min) + 1:
+            return None
+    return outer_min * inner_min, None if outer_max is None or inner_max is None else outer_max * inner_max
+
+
+def merge_keeps_order(outer, inner, mode):
+    # whether the merged repeat tries the counts in the same order as the repeat of a repeat -- merged_counts()
+    # only makes sure it can match the same counts: (?:x{2,3}){1,2} tries 3 x before 4 (another 2..3 x won't fit
+    # in 1), x{2,6} tries 4 first. The same order for a fixed inner count, an optional outer, and both + or *;
+    # and no order at all for a possessive outer, which only tries the one count
+    (outer_min, outer_max), (inner_min, inner_max) = outer, inner
+    if mode == '+' or inner_min == inner_max or (outer_min, outer_max) == (0, 1):
+        return True
+    return outer_max is None and inner_max is None and outer_min <= 1 and inner_min <= 1
+
+
+def already_atomic(node):
+    # whether a node can only match one way, as if in an atomic group
+    node_type = type(node)
+    if node_type in (Char, CharSet, Assertion):
+        return True
+    if node_type is Group:
+        return node.opener in ('(?>',) + Group.LOOKAHEADS + Group.LOOKBEHINDS
+    if node_type is Sequence:
+        return all(already_atomic(item) for item in node.items)
+    if node_type is Opaque: # backreferences, not subroutine calls
+        return node.text.startswith('(?P=')
+    return node_type is Repeat and node.mode == '+'
+
+
+def first_leaf(node):
+    while type(node) in (Sequence, Repeat):
+        if type(node) is Sequence:
+            if not node.items:
+                return None
+            node = node.items[0]
+        else:
+            node = node.body
+    return node
+
+
+def peephole(node, states, context='whole'):
+    # the node simplified: redundant groups, flags & quantifiers left out, nested quantifiers merged.
+    # context: 'whole' if the node is all of a group/branch, 'sequence' if it's among others in a sequence,
+    # 'repeat' if it's quantified -- which decides if a group around it can go
+    node_type = type(node)
+    if node_type is Sequence and len(node.items) == 1:
+        return peephole(node.items[0], states, context)
+    if node_type is Sequence:
+        items = []
+        for item in node.items:
+            item = peephole(item, states, 'sequence')
+            items.extend(item.items if type(item) is Sequence else [item])
+        for index in range(len(items) - 1): # (?:\1)0 isn't \10
+            next_leaf = first_leaf(items[index + 1])
+            if (type(items[index]) in (Char, Opaque) and ABSORBS_DIGITS_RE.search(items[index].text)
+                    and type(next_leaf) in (Char, Opaque) and next_leaf.text[:1].isdigit()):
+                items[index] = Group('(?:', items[index])
+        if len(items) == 1 and context != 'sequence':
+            return items[0]
+        return Sequence(tuple(items))
+
+    if node_type is Branches:
+        items = []
+        for item in node.items:
+            item = peephole(item, states, 'whole')
+            items.extend(item.items if type(item) is Branches else [item]) # a|(?:b|c) is a|b|c
+        return Branches(tuple(items))
+
+    if node_type is Group:
+        opener = node.opener
+        flags = opener_flags(opener)
+        if flags is not None: # leave out the flags already as they'd be, and the ones that don't matter inside
+            def needed(flag, state):
+                return flag not in PEEPHOLE_FLAGS or states[flag] is not state and matters_in(node.body, flag)
+            turn_ons = ''.join(flag for flag in flags[0] if needed(flag, True))
+            turn_offs = ''.join(flag for flag in flags[1] if needed(flag, False))
+            opener = flags_opener(turn_ons, turn_offs)
+            states = scoped_states(opener, states)
+        body = peephole(node.body, states)
+        if opener == '(?>' and already_atomic(body):
+            opener = '(?:'
+        if opener != '(?:':
+            return Group(opener, body)
+        body_type = type(body)
+        if body_type is Sequence and not body.items:
+            return body if context != 'repeat' else Group(opener, body)
+        if body_type is Branches:
+            return body if context == 'whole' else Group(opener, body)
+        if body_type in (Sequence, Repeat):
+            return body if context != 'repeat' else Group(opener, body)
+        if body_type in (Char, CharSet, Group) or body_type is Opaque and len(body.text) > 1:
+            return body
+        return body if context != 'repeat' else Group(opener, body) # assertions, whitespace, conditionals
+
+    if node_type is Repeat:
+        body = peephole(node.body, states, 'repeat')
+        min, max, mode = node.min, node.max, node.mode
+        inner = body.body if type(body) is Group and body.opener == '(?:' else None
+        if (type(inner) is Repeat and consumes(inner.body)
+                and (inner.mode == mode or inner.mode == '' and mode == '+')):
+            counts = merged_counts((min, max), (inner.min, inner.max))
+            if counts is not None and merge_keeps_order((min, max), (inner.min, inner.max), mode):
+                return peephole(Repeat(inner.body, counts[0], counts[1], '', mode), states, context)
+        if min == max == 1 and mode != '+':
+            return body
+        return Repeat(body, min, max, quantifier_text(min, max), mode)
+
+    if node_type is Conditional:
+        no = None if node.no is None else peephole(node.no, states, 'sequence')
+        return Conditional(node.opener, peephole(node.yes, states, 'sequence'), no)
+    return node
+
+
+def simplify(tree):
+    # the peephole option: hoists uniform flags, then simplifies every node
+    root = hoist_flags(tree.root)
+    global_flags = GLOBAL_FLAGS_RE.match(root.items[0].text).group(1)
+    states = dict((flag, True if flag in global_flags else None) for flag in PEEPHOLE_FLAGS)
+    body = peephole(Sequence(root.items[1:]), states)
+    tree.root = Sequence((root.items[0],) + (body.items if type(body) is Sequence else (body,)))
+
+
+def optimize(regex, options, orblocks=(), quantifiers=()):
+    # the options that rewrite the translation as a whole, applied to its output tree,
+    # returns the rewritten regex, the line numbers of the OR-blocks atomized and the Pruned parts
+    if not (options.possessify or options.atomize or options.peephole or options.prune or options.order_lookaheads):
+        return regex, [], []
+    try:
+        tree = OutputTree(regex)
+    except Unparsable:
+        return regex, [], []
+    atomized, pruned = [], []
+    if options.prune: # first, the others needn't bother with what's left out
+        pruned, rewritten = prune(tree, orblocks, quantifiers)
+        orblocks = list(orblocks) + rewritten
+    if options.order_lookaheads:
+        order_lookaheads(tree)
+    if options.atomize:
+        atomized = atomize(tree, orblocks)
+    if options.possessify:
+        possessify(tree)
+    if options.peephole: # last, atomize() recognizes OR-blocks by their regex as emitted
+        simplify(tree)
+    return unparse(tree.root), atomized, pruned
+
+
+# Backtracking risks: when a match attempt fails, a backtracking engine retries every way the input could
+# have been split among the quantifiers and alternatives before giving up. Where these ways grow with the
+# input length, so does the time a failing match takes -- polynomially for adjacent quantifiers over the same
+# characters, as in .*=.*; and exponentially for ambiguous repeats in a repeat, as in (?:\d+,?)+; -- which
+# a crafted input can exploit (ReDoS). The analysis looks for these shapes in the output tree -- a heuristic,
+# which may miss some risks and report some no input can trigger.
+Finding = namedtuple('Finding', 'lineno severity kind message')
+# kind: 'nested-quantifiers', 'ambiguous-alternation' or 'adjacent-quantifiers'
+
+SEVERITIES = ('polynomial', 'exponential') # increasingly severe
+
+
+def single_chars(node):
+    # the characters a single-character node (possibly in groups, e.g. (?s:.)) can match, None for other nodes
+    while type(node) is Group and node.opener not in Group.LOOKAHEADS + Group.LOOKBEHINDS or (
+            type(node) is Sequence and len(node.items) == 1):
+        node = node.body if type(node) is Group else node.items[0]
+    return node.chars.maybe if type(node) in (Char, CharSet) else None
+
+
+def repeat_in(node):
+    # the Repeat a node amounts to, looking through non-atomic groups, or None
+    while True:
+        if type(node) is Group and node.opener not in ('(?>',) + Group.LOOKAHEADS + Group.LOOKBEHINDS:
+            node = node.body
+        elif type(node) is Sequence and len(node.items) == 1:
+            node = node.items[0]
+        else:
+            return node if type(node) is Repeat else None
+
+
+def backtracks(node):
+    # whether a Repeat can match a varying number of iterations and give some back
+    return node.min != node.max and node.mode != '+'
+
+
+MAX_SHAPE_LENGTH = 16
+
+def fixed_shape(node):
+    # what each position of a fixed-length node can match, as a tuple of (chars, is_charset) -- e.g.
+    # ((\d, True), ([a-z], True)) for \d[a-z] -- or None for anything else (or longer than MAX_SHAPE_LENGTH)
+    node_type = type(node)
+    if node_type in (Char, CharSet):
+        return ((node.chars.maybe, node_type is CharSet),)
+    if node_type is Sequence:
+        shape = ()
+        for item in node.items:
+            item_shape = fixed_shape(item)
+            if item_shape is None or len(shape) + len(item_shape) > MAX_SHAPE_LENGTH:
+                return None
+            shape += item_shape
+        return shape
+    if node_type is Group and node.opener not in ('(?>',) + Group.LOOKAHEADS + Group.LOOKBEHINDS:
+        return fixed_shape(node.body)
+    if node_type is Repeat and node.min == node.max:
+        shape = fixed_shape(node.body)
+        if shape is not None and len(shape) * node.min <= MAX_SHAPE_LENGTH:
+            return shape * node.min
+    return None
+
+
+def ambiguous_branches(node):
+    # whether two branches of a Branches node can match the same string -- only told for fixed-length
+    # branches: of the same length, with overlapping characters at every position
+    by_length = defaultdict(list)
+    for item in node.items:
+        shape = fixed_shape(item)
+        if shape:
+            by_length[len(shape)].append(shape)
+    for shapes in by_length.values():
+        if len(set(shapes)) < len(shapes):
+            return True
+        # Chars (a character and its case variants) overlap only when equal, so it's enough to compare the
+        # branches with CharSets with every other branch
+        for shape in shapes:
+            if any(is_charset for _, is_charset in shape):
+                for other in shapes:
+                    if other is not shape and all(not chars.isdisjoint(other_chars)
+                            for (chars, _), (other_chars, _) in zip(shape, other)):
+                        return True
+    return False
+
+
+def excerpt(regex, limit=40):
+    return regex if len(regex) <= limit else regex[:limit - 3] + '...'
+
+
+def children_of(node):
+    node_type = type(node)
+    if node_type in (Sequence, Branches):
+        return node.items
+    if node_type in (Group, Repeat):
+        return (node.body,)
+    if node_type is Conditional:
+        return (node.yes,) if node.no is None else (node.yes, node.no)
+    return ()
+
+
+def source_linenos(root, fragments):
+    # id(node) -> the source line a node comes from: the first line of an OR-block/quantified expression
+    # emitting the node's regex, else the line of the nearest enclosing node that has one (0 at the root)
+    lines = {}
+    for lineno, regex in fragments:
+        if regex not in lines or lineno < lines[regex]:
+            lines[regex] = lineno
+    linenos = {}
+
+    def walk(node, lineno):
+        if type(node) in (Repeat, Branches, Conditional): # an OR-block of conditional branches is a Conditional
+            lineno = lines.get(unparse(node), lineno)
+        linenos[id(node)] = lineno
+        for child in children_of(node):
+            walk(child, lineno)
+
+    walk(root, 0)
+    return linenos
+
+
+def backtracking_risks(tree, fragments):
+    # The Findings in an OutputTree, sorted by line number, `fragments` being the (lineno, regex) of the
+    # OR-blocks and quantified expressions it was emitted from. Reported are:
+    #  - nested-quantifiers: a repeat inside a backtracking repeat (the loop), giving back characters that
+    #    the loop's next iteration can take, e.g. \d+ in (?:\d+,?)+ -- a run of digits can then be split
+    #    among the iterations in exponentially many ways
+    #  - ambiguous-alternation: branches that can match the same string inside a loop, e.g. (?:\w|\d)+,
+    #    each iteration can take either
+    #  - adjacent-quantifiers: two unbounded repeats of single characters in a sequence, with nothing in
+    #    between that tells them apart, e.g. \d+\d+ or .*=.* -- polynomially many splits
+    # all only when what follows can fail, i.e. the engine would have to try them all.
+    # Severity is 'exponential' for loops without a maximum, else 'polynomial'.
+    follows = {} # id(node) -> node, what can follow it
+
+    def record(node, follow, in_loop):
+        follows[id(node)] = node, follow
+        return node
+
+    tree.root = for_each_follow(tree, tree.root, END_FOLLOW, record)
+    linenos = source_linenos(tree.root, fragments)
+    findings = {} # (kind, id(node)) -> Finding
+
+    def report(kind, node, severity, message):
+        key = kind, id(node)
+        if key not in findings or SEVERITIES.index(findings[key].severity) < SEVERITIES.index(severity):
+            findings[key] = Finding(linenos[id(node)], severity, kind, message)
+
+    def check_loop(loop):
+        # for the repeats and alternations in the loop, what can follow them within the loop is the rest of
+        # the iteration, then the next one
+        body_first = tree.first(loop.body)
+        next_iteration = First(body_first.chars, False, False, body_first.unknown)
+        severity = 'exponential' if loop.max is None else 'polynomial'
+        ways = 'exponentially' if loop.max is None else 'polynomially'
+        loop_regex = excerpt(unparse(loop))
+        alternations = []
+        atomic_bodies = set()
+
+        def visit(node, follow, in_loop):
+            node_type = type(node)
+            if node_type is Repeat and backtracks(node) and node.max != 1:
+                chars = tree.first(node.body).chars
+                if follow.unknown or not chars.isdisjoint(follow.chars):
+                    report('nested-quantifiers', node, severity,
+                        "'%s' inside '%s': the same input can be split among their iterations in %s many ways"
+                        % (excerpt(unparse(node)), loop_regex, ways))
+            elif node_type is Branches and ambiguous_branches(node):
+                alternations.append(node)
+            elif node_type is Group and node.opener == '(?>':
+                atomic_bodies.add(id(node.body))
+            return node
+
+        for_each_follow(tree, loop.body, next_iteration, visit)
+        for node in alternations:
+            if id(node) not in atomic_bodies:
+                report('ambiguous-alternation', node, severity,
+                    "'%s' inside '%s': branches can match the same input, so each iteration can take either"
+                    % (excerpt(unparse(node)), loop_regex))
+
+    def check_sequence(sequence):
+        items = sequence.items
+        for index, item in enumerate(items):
+            first = repeat_in(item)
+            if first is None or not backtracks(first) or first.max is not None or single_chars(first.body) is None:
+                continue
+            common = single_chars(first.body)
+            for later in items[index + 1:]: # what's in between has to match characters both can match too
+                second = repeat_in(later)
+                if second is not None and single_chars(second.body) is not None:
+                    chars = single_chars(second.body)
+                    if second.max is None and backtracks(second) and not common.isdisjoint(chars):
+                        if can_fail_after(follows[id(second)][1]):
+                            report('adjacent-quantifiers', first, 'polynomial',
+                                "'%s' followed by '%s': the input both can match can be split between them in "
+                                "polynomially many ways" % (excerpt(unparse(item)), excerpt(unparse(later))))
+                        break
+                    if second.min > 0:
+                        common = common & chars
+                elif single_chars(later) is not None:
+                    common = common & single_chars(later)
+                elif not tree.first(later).nullable or tree.first(later).tainted:
+                    break
+                if not common:
+                    break
+
+    for node, follow in list(follows.values()):
+        if type(node) is Repeat and node.mode != '+' and node.max != 1 and can_fail_after(follow):
+            check_loop(node)
+        elif type(node) is Sequence:
+            check_sequence(node)
+    return sorted(findings.values(), key=lambda finding: (finding.lineno, finding.message))
+
+
+def refuse_backtracking(regex, fragments, severity):
+    # raises OprexBacktrackingError for the first Finding at least as severe as `severity`
+    if severity not in SEVERITIES:
+        raise ValueError('refuse_backtracking must be one of %s' % ', '.join(SEVERITIES))
+    try:
+        findings = backtracking_risks(OutputTree(regex), fragments)
+    except Unparsable as e:
+        raise OprexBacktrackingError(0, "Can't tell the backtracking risks of this regex (%s)" % e)
+    for finding in findings:
+        if SEVERITIES.index(finding.severity) >= SEVERITIES.index(severity):
+            raise OprexBacktrackingError(finding.lineno, '%s backtracking: %s' % (finding.severity.capitalize(), finding.message))
+
+
+# Slow inputs: where analyze() tells what may backtrack, slow_inputs() measures it -- it searches for the
+# inputs that take the regex longest to search, by the local clock:
+#  1. every repeat that can give back characters is "pumped": a matching prefix, then more and more copies
+#     of one iteration, then a character to make the rest fail, growing while the search time does
+#  2. the slowest inputs so far are mutated (characters appended, inserted, deleted, or a bit repeated),
+#     keeping whatever is slower
+# until the time budget is spent. No single search is allowed much over `budget / 20`: inputs are grown a
+# character or so at a time once the time starts growing fast, so an exponential pattern can't run away.
+# The search runs in a worker process, reporting each input before searching it: should the regex engine
+# crash or hang on one, that input is the worst of all, with infinite seconds. (regex 2016.6.5 does crash
+# on some, e.g. on ',5' * 100 + ',' with samples/csv.oprex.)
+SlowInput = namedtuple('SlowInput', 'text seconds')
+
+BMP = CodeSet([(0, 0xD7FF), (0xE000, 0xFFFF)]) # without the surrogates
+
+
+def sample_char(codes, rng):
+    # a character from a CodeSet, printable ASCII if possible, None if it's empty
+    for candidates in (codes & PRINTABLE_ASCII, codes & BMP, codes):
+        if candidates:
+            first, last = rng.choice(candidates)
+            return unichr(rng.randint(first, last))
+    return None
+
+
+class InputSampler(object):
+    # random strings for the nodes of an OutputTree -- ones the node matches, ignoring lookarounds,
+    # backreferences and subroutine calls (those sample as nothing)
+    def __init__(self, tree, rng):
+        self.tree = tree
+        self.rng = rng
+
+    def sample(self, node, shortest=False, stop_at=None):
+        # shortest: repeat everything the minimum number of times, stop_at: sample up to that node only,
+        # through the branches leading to it
+        pieces = []
+        self.stopped = False
+        self.path = set(map(id, path_to(node, stop_at))) if stop_at is not None else set()
+        self.extend(pieces, node, shortest, stop_at)
+        return ''.join(pieces)
+
+    def extend(self, pieces, node, shortest, stop_at):
+        if self.stopped:
+            return
+        if node is stop_at:
+            self.stopped = True
+            return
+        node_type = type(node)
+        if node_type in (Char, CharSet):
+            char = sample_char(node.chars.sure or node.chars.maybe, self.rng)
+            if char is not None:
+                pieces.append(char)
+        elif node_type is Sequence:
+            for item in node.items:
+                self.extend(pieces, item, shortest, stop_at)
+        elif node_type is Branches:
+            leading = [item for item in node.items if id(item) in self.path]
+            self.extend(pieces, leading[0] if leading else self.rng.choice(node.items), shortest, stop_at)
+        elif node_type is Group:
+            if node.opener not in Group.LOOKAHEADS + Group.LOOKBEHINDS:
+                self.extend(pieces, node.body, shortest, stop_at)
+        elif node_type is Repeat:
+            most = node.min + 2 if node.max is None else min(node.max, node.min + 2)
+            times = node.min if shortest else self.rng.randint(node.min, most)
+            if id(node.body) in self.path:
+                times = max(times, 1)
+            for _ in range(times):
+                self.extend(pieces, node.body, shortest, stop_at)
+        elif node_type is Conditional and node.opener != '(?(DEFINE)':
+            self.extend(pieces, node.yes, shortest, stop_at)
+
+
+def path_to(node, target):
+    # the nodes from `node` down to `target`, both included, empty if it's not there
+    if node is target:
+        return [node]
+    for child in children_of(node):
+        path = path_to(child, target)
+        if path:
+            return [node] + path
+    return []
+
+
+def search_time(pattern, text, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = timeit.default_timer()
+        pattern.search(text)
+        elapsed = timeit.default_timer() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+class SlowInputSearch(object):
+    def __init__(self, pattern, tree, rng, budget, max_length, connection):
+        self.pattern = pattern
+        self.tree = tree
+        self.rng = rng
+        self.deadline = timeit.default_timer() + budget
+        self.time_limit = budget / 20.0
+        self.max_length = max_length
+        self.connection = connection # to report the measurements
+        self.times = {} # text -> seconds
+
+    def time_out(self):
+        return timeit.default_timer() > self.deadline
+
+    def measure(self, text):
+        if text not in self.times:
+            self.connection.send(('measuring', text))
+            self.times[text] = search_time(self.pattern, text)
+            self.connection.send(('measured', self.times[text]))
+        return self.times[text]
+
+    def alphabet(self, regex):
+        # characters the regex tests for, and characters it doesn't expect there
+        chars = set(' !x\n') | set(regex)
+        nodes = [self.tree.root]
+        while nodes:
+            node = nodes.pop()
+            if type(node) in (Char, CharSet):
+                for codes in (node.chars.maybe, node.chars.maybe.complement()):
+                    char = sample_char(codes, self.rng)
+                    if char is not None:
+                        chars.add(char)
+            nodes.extend(children_of(node))
+        return sorted(chars)
+
+    def pump(self, repeat, sampler, breakers):
+        # grow prefix + unit * n + breaker while it gets slower
+        prefix = sampler.sample(self.tree.root, stop_at=repeat)
+        units = set([sampler.sample(repeat.body, shortest=True)] + [sampler.sample(repeat.body) for _ in range(2)])
+        for unit in sorted(units):
+            if not unit:
+                continue
+            for breaker in breakers:
+                count = 1
+                previous = None
+                while not self.time_out():
+                    text = prefix + unit * count + breaker
+                    if len(text) > self.max_length:
+                        break
+                    seconds = self.measure(text)
+                    if seconds > self.time_limit:
+                        break
+                    growing_fast = previous is not None and seconds > previous * 1.5
+                    count += 1 if growing_fast else max(1, count // 4)
+                    previous = seconds
+
+    def mutations(self, text, alphabet):
+        rng = self.rng
+        position = rng.randint(0, len(text))
+        char = rng.choice(alphabet)
+        yield text + char
+        yield text[:position] + char + text[position:]
+        if text:
+            yield text[:position] + text[position + 1:]
+            start = rng.randint(0, len(text) - 1)
+            piece = text[start:start + rng.randint(1, 4)]
+            yield text[:start] + piece + text[start:]
+
+    def climb(self, alphabet):
+        while not self.time_out():
+            slowest = sorted(self.times, key=self.times.get, reverse=True)
+            slowest = [text for text in slowest if self.times[text] <= self.time_limit][:8]
+            if not slowest:
+                return
+            for text in slowest:
+                for mutant in self.mutations(text, alphabet):
+                    if self.time_out():
+                        return
+                    if len(mutant) <= self.max_length:
+                        self.measure(mutant)
+
+    def run(self, regex):
+        alphabet = self.alphabet(regex)
+        sampler = InputSampler(self.tree, self.rng)
+        repeats = []
+        nodes = [self.tree.root]
+        while nodes: # outermost first
+            node = nodes.pop(0)
+            if type(node) is Repeat and node.mode != '+' and (node.min != node.max or node.max != 1):
+                repeats.append(node)
+            nodes.extend(children_of(node))
+        self.measure(sampler.sample(self.tree.root))
+        for repeat in repeats:
+            breakers = ['', sample_char(self.tree.first(repeat.body).chars.complement(), self.rng) or '']
+            self.pump(repeat, sampler, sorted(set(breakers)))
+            if self.time_out():
+                break
+        self.climb(alphabet)
+
+
+def search_slow_inputs(regex, flags, seed, budget, max_length, connection):
+    # the worker process of slow_inputs()
+    pattern = regexlib.compile(regex, flags)
+    try:
+        tree = OutputTree(regex)
+    except Unparsable: # nothing to pump, mutations only
+        tree = OutputTree('(?V1)')
+    SlowInputSearch(pattern, tree, random.Random(seed), budget, max_length, connection).run(regex)
+    connection.close()
+
+
+def slow_inputs(source_code, count=10, budget=2.0, max_length=256, flags=0, seed=0, **options):
+    # The `count` slowest inputs found for the regex the source translates to, compiled with `flags`, as
+    # SlowInputs sorted slowest first -- searching for about `budget` seconds, for inputs of up to
+    # `max_length` characters. The search is random, seeded with `seed` -- but it also goes by the timings.
+    regex = translate(sanitize(source_code), Options(**options)).regex
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    worker = multiprocessing.Process(target=search_slow_inputs,
+        args=(regex, flags, seed, budget, max_length, sender))
+    worker.start()
+    sender.close() # leaving the worker's end to the worker, so its exit closes the pipe
+    times = {}
+    measuring = None
+    try:
+        while True:
+            if not receiver.poll(budget + 1): # stuck in a search
+                worker.terminate()
+                break
+            try:
+                message, value = receiver.recv()
+            except EOFError:
+                break
+            if message == 'measuring':
+                measuring = value
+            else:
+                times[measuring] = value
+                measuring = None
+    finally:
+        worker.join()
+        receiver.close()
+    if measuring is not None: # the worker crashed or hung searching it
+        times[measuring] = float('inf')
+    slowest = sorted(times.items(), key=lambda item: (-item[1], len(item[0]), item[0]))
+    return [SlowInput(text, seconds) for text, seconds in slowest[:count]]
+
+
+# Requirements: what the text has to contain for a pattern to match anywhere in it -- checked with `in`,
+# it's much cheaper than a search, and lets most of the non-matching lines of e.g. a log be skipped.
+Requirements = namedtuple('Requirements', 'literals chars')
+# literals -- strings every match contains, longest first
+# chars    -- a frozenset of characters, one of which every match contains -- None if there's no small
+#             enough such set, or the literals already require one of them
+
+MAX_REQUIRED_CHARS = 16
+
+# what a node needs, see needs_of():
+#   exact    -- the string the node always matches, None if it can match different strings
+#   prefix   -- a string every match starts with, suffix -- one every match ends with
+#   literals -- a frozenset of strings every match contains
+#   charsets -- CodeSets every match contains a character of
+Needs = namedtuple('Needs', 'exact prefix suffix literals charsets')
+
+NEEDS_NOTHING = Needs('', '', '', frozenset(), ())
+UNKNOWN_NEEDS = Needs(None, '', '', frozenset(), ())
+
+
+def exact_needs(string, charsets=()):
+    return Needs(string, string, string, frozenset([string]) if string else frozenset(), charsets)
+
+
+def common_prefix(strings):
+    shortest = min(strings, key=len)
+    for length in range(len(shortest)):
+        if any(string[length] != shortest[length] for string in strings):
+            return shortest[:length]
+    return shortest
+
+
+def common_suffix(strings):
+    return common_prefix([string[::-1] for string in strings])[::-1]
+
+
+def smallest_codes(codesets):
+    # the CodeSet with the fewest characters
+    return min(codesets, key=lambda codes: sum(last - first + 1 for first, last in codes))
+
+
+def needs_of(node):
+    node_type = type(node)
+    if node_type in (Char, CharSet):
+        chars = node.chars
+        if chars.sure == chars.maybe and len(chars.maybe) == 1 and chars.maybe[0][0] == chars.maybe[0][1]:
+            return exact_needs(unichr(chars.maybe[0][0]), (chars.maybe,))
+        return Needs(None, '', '', frozenset(), (chars.maybe,))
+    if node_type is Assertion:
+        return NEEDS_NOTHING
+    if node_type is Group:
+        if node.opener in ('(?=', '(?<='): # what they look at has to be in the text too, not in the match
+            needs = needs_of(node.body)
+            return Needs('', '', '', needs.literals, needs.charsets)
+        if node.opener in Group.LOOKAHEADS + Group.LOOKBEHINDS:
+            return NEEDS_NOTHING
+        return needs_of(node.body)
+    if node_type is Sequence:
+        return sequence_needs([needs_of(item) for item in node.items])
+    if node_type is Branches:
+        return branches_needs([needs_of(item) for item in node.items])
+    if node_type is Repeat:
+        needs = needs_of(node.body)
+        if node.min == 0:
+            return NEEDS_NOTHING if needs.exact == '' else UNKNOWN_NEEDS
+        if needs.exact is not None and node.min == node.max:
+            return exact_needs(needs.exact * node.min, needs.charsets)
+        literals = needs.literals
+        if needs.exact is not None: # the least repeats
+            literals = literals | frozenset([needs.exact * node.min])
+        return Needs(None, needs.prefix, needs.suffix, literals, needs.charsets)
+    if node_type is Conditional:
+        if node.opener == '(?(DEFINE)':
+            return NEEDS_NOTHING
+        no = NEEDS_NOTHING if node.no is None else needs_of(node.no)
+        return branches_needs([needs_of(node.yes), no])
+    return UNKNOWN_NEEDS # Opaque
+
+
+def sequence_needs(items):
+    # the exact items next to each other make up longer literals, joined with their neighbors' prefix/suffix
+    literals = set()
+    charsets = []
+    run = ''
+    for needs in items:
+        literals.update(needs.literals)
+        charsets.extend(needs.charsets)
+        if needs.exact is not None:
+            run += needs.exact
+        else:
+            literals.add(run + needs.prefix)
+            run = needs.suffix
+    literals.add(run)
+    literals.discard('')
+    if all(needs.exact is not None for needs in items):
+        return exact_needs(run, tuple(charsets))
+    prefix = ''
+    for needs in items:
+        prefix += needs.exact if needs.exact is not None else needs.prefix
+        if needs.exact is None:
+            break
+    suffix = ''
+    for needs in reversed(items):
+        suffix = (needs.exact if needs.exact is not None else needs.suffix) + suffix
+        if needs.exact is None:
+            break
+    return Needs(None, prefix, suffix, frozenset(literals), tuple(charsets))
+
+
+def branches_needs(items):
+    # what every branch needs: the literals they all need, their common prefix/suffix, and the union of the
+    # smallest CodeSet each needs
+    exacts = set(needs.exact for needs in items)
+    if len(exacts) == 1 and None not in exacts:
+        return items[0]
+    prefix = common_prefix([needs.prefix for needs in items])
+    suffix = common_suffix([needs.suffix for needs in items])
+    literals = functools.reduce(frozenset.intersection, [needs.literals for needs in items])
+    literals = literals | frozenset(literal for literal in (prefix, suffix) if literal)
+    charsets = ()
+    if all(needs.charsets for needs in items):
+        charsets = (CodeSet(code_range for needs in items for code_range in smallest_codes(needs.charsets)),)
+    return Needs(None, prefix, suffix, literals, charsets)
+
+
+def requirements(pattern):
+    # the Requirements of a compiled pattern (e.g. from compile()), going by its flags too
+    try:
+        needs = needs_of(OutputTree(pattern.pattern, pattern.flags).root)
+    except Unparsable:
+        return Requirements((), None)
+    literals = sorted(needs.literals, key=lambda literal: (-len(literal), literal))
+    literals = [literal for index, literal in enumerate(literals) # the ones in a longer literal are implied
+        if not any(literal in longer for longer in literals[:index])]
+    chars = None
+    if needs.charsets:
+        codes = smallest_codes(needs.charsets)
+        if sum(last - first + 1 for first, last in codes) <= MAX_REQUIRED_CHARS:
+            chars = frozenset(unichr(code) for first, last in codes for code in range(first, last + 1))
+            if any(char in literal for literal in literals for char in chars):
+                chars = None
+    return Requirements(tuple(literals), chars)
+
+
+# MatchShape: where a pattern's matches can start, and how long they can be
+MatchShape = namedtuple('MatchShape', 'anchor min_length max_length')
+# anchor     -- 'string' if a match can only start where the search starts (\A, \G, ^ without MULTILINE),
+#               so match() finds what search() would -- 'line' if it can also start after a \n (^ with
+#               MULTILINE), None if it can start anywhere
+# min_length -- the fewest characters a match has, max_length -- the most, None if unbounded
+
+UNKNOWN_SHAPE = MatchShape(None, 0, None)
+MAX_FOLD_LENGTH = 3 # with full case-folding, a character can match up to 3 (e.g. \uFB03 matches 'ffi'), or
+                    # be a third of the characters matching one
+
+
+def match_shape(pattern):
+    # the MatchShape of a compiled pattern (e.g. from compile()), going by its flags too
+    try:
+        tree = OutputTree(pattern.pattern, pattern.flags)
+    except Unparsable:
+        return UNKNOWN_SHAPE
+    on = set(GLOBAL_FLAGS_RE.match(pattern.pattern).group(1))
+    for flag, flag_value in (('i', regexlib.IGNORECASE), ('m', regexlib.MULTILINE)):
+        if pattern.flags & flag_value:
+            on.add(flag)
+    try:
+        least, most = length_bounds(tree.root, frozenset(on))
+    except RuntimeError: # too deeply nested
+        return UNKNOWN_SHAPE
+    return MatchShape(anchor_of(tree.root, frozenset(on)), int(-(-least // 1)), most)
+
+
+def scoped_flags(opener, on):
+    # the flags on inside a group, given the ones on outside it
+    flags = SCOPED_FLAGS_RE.match(opener)
+    if not flags:
+        return on
+    return (on | frozenset(flags.group(1))) - frozenset(flags.group(2) or '')
+
+
+def length_bounds(node, on):
+    # the fewest and the most characters a node matches (the latter None if unbounded), with `on` the flags on
+    node_type = type(node)
+    if node_type in (Char, CharSet):
+        if 'i' in on and not node.chars.maybe.isdisjoint(ASCII_LETTERS | NON_ASCII): # may be case-folded
+            return Fraction(1, MAX_FOLD_LENGTH), MAX_FOLD_LENGTH
+        return 1, 1
+    if node_type is Assertion:
+        return 0, 0
+    if node_type is Opaque:
+        if node.text == r'\X':
+            return 1, None
+        if len(node.text) == 1: # whitespace or #, nothing if the regex gets compiled with VERBOSE
+            return 0, 1
+        return 0, None # backreferences, subroutine calls
+    if node_type is Group:
+        if node.opener in Group.LOOKAHEADS + Group.LOOKBEHINDS:
+            return 0, 0
+        return length_bounds(node.body, scoped_flags(node.opener, on))
+    if node_type is Sequence:
+        bounds = [length_bounds(item, on) for item in node.items]
+        most = [item_most for _, item_most in bounds]
+        return sum(least for least, _ in bounds), None if None in most else sum(most)
+    if node_type is Branches:
+        bounds = [length_bounds(item, on) for item in node.items]
+        most = [item_most for _, item_most in bounds]
+        return min(least for least, _ in bounds), None if None in most else max(most)
+    if node_type is Repeat:
+        least, most = length_bounds(node.body, on)
+        if most == 0:
+            return 0, 0
+        return least * node.min, None if most is None or node.max is None else most * node.max
+    if node_type is Conditional:
+        if node.opener == '(?(DEFINE)':
+            return 0, 0
+        yes = length_bounds(node.yes, on)
+        no = (0, 0) if node.no is None else length_bounds(node.no, on)
+        return min(yes[0], no[0]), None if None in (yes[1], no[1]) else max(yes[1], no[1])
+
+
+def anchor_of(node, on):
+    # the MatchShape.anchor of a node, with `on` the flags on
+    node_type = type(node)
+    if node_type is Assertion:
+        if node.text in (r'\A', r'\G'):
+            return 'string'
+        if node.text == '^':
+            return 'line' if 'm' in on else 'string'
+        return None
+    if node_type is Sequence:
+        for item in node.items:
+            anchor = anchor_of(item, on)
+            if anchor or length_bounds(item, on)[1] != 0: # anchored, or it might consume before any anchor
+                return anchor
+        return None
+    if node_type is Branches:
+        anchors = set(anchor_of(item, on) for item in node.items)
+        if None in anchors:
+            return None
+        return 'line' if 'line' in anchors else 'string'
+    if node_type is Group:
+        if node.opener in Group.LOOKAHEADS + Group.LOOKBEHINDS:
+            return None
+        return anchor_of(node.body, scoped_flags(node.opener, on))
+    if node_type is Repeat and node.min > 0:
+        return anchor_of(node.body, on)
+    return None
+
+
+def prefilter(pattern):
+    # a function telling whether a text may contain a match of the pattern, going by its requirements() and
+    # match_shape()
+    required = requirements(pattern)
+    literals, chars = required.literals, required.chars
+    min_length = match_shape(pattern).min_length
+    def may_match(text):
+        if len(text) < min_length:
+            return False
+        for literal in literals:
+            if literal not in text:
+                return False
+        return chars is None or any(char in text for char in chars)
+    return may_match
+
+
+def scan(source_code, lines, flags=0, **options):
+    # yields the match in each of the lines (any iterable of strings) that has one, not searching the
+    # lines the prefilter() rules out -- nor the rest of a line, if the pattern is anchored to its start
+    pattern = compile(source_code, flags, **options)
+    may_match = prefilter(pattern)
+    anchor = match_shape(pattern).anchor
+    search = pattern.match if anchor == 'string' else pattern.search
+    for line in lines:
+        if may_match(line):
+            match = pattern.match(line) if anchor == 'line' and '\n' not in line else search(line)
+            if match:
+                yield match
+
+
+CacheInfo = namedtuple('CacheInfo', 'hits misses evictions currsize maxsize')
+CacheStats = namedtuple('CacheStats', 'regexes patterns numranges')
+
+
+class LiteralAutomaton(object):
+    # Aho-Corasick automaton: which of many literals a text contains, in one pass over it
+    def __init__(self, literals):
+        self.goto = [{}]    # state -> {char: next state}, state 0 is the root
+        self.fail = [0]     # state -> the state for the longest proper suffix that's also in the trie
+        self.output = [()]  # state -> the literals ending there
+        for literal in set(literals):
+            state = 0
+            for char in literal:
+                next_state = self.goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto[state][char] = next_state
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append(())
+                state = next_state
+            self.output[state] += (literal,)
+
+        queue = deque(self.goto[0].values()) # breadth-first, so the fail states are done before they're needed
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                fail = self.goto[fallback].get(char, 0)
+                self.fail[next_state] = 0 if fail == next_state else fail
+                self.output[next_state] += self.output[self.fail[next_state]]
+
+    def found(self, text):
+        goto, fail, output = self.goto, self.fail, self.output
+        found = set()
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found.update(output[state])
+        return found
+
+
+SetMatch = namedtuple('SetMatch', 'id start end captures') # captures: {capture name: captured string or None}
+
+GROUP_REFERENCE_RE = regexlib.compile(r'(\(\?P=|\(\?&|\\g<)(\w+)([)>])\Z')
+
+
+def rename_groups(node, rename):
+    # a copy of the OutputTree node with its group names, and the references to them, passed through rename()
+    node_type = type(node)
+    if node_type is Opaque:
+        if node.text == r'\X':
+            return node
+        reference = GROUP_REFERENCE_RE.match(node.text)
+        if not reference or reference.group(2).isdigit():
+            raise Unparsable('numbered group reference %s' % node.text)
+        return Opaque(reference.group(1) + rename(reference.group(2)) + reference.group(3))
+    if node_type in (Sequence, Branches):
+        return node_type(tuple(rename_groups(item, rename) for item in node.items))
+    if node_type is Group:
+        opener = node.opener
+        if opener == '(':
+            raise Unparsable('numbered group')
+        if node.name is not None:
+            opener = '(?P<%s>' % rename(node.name)
+        return Group(opener, rename_groups(node.body, rename))
+    if node_type is Repeat:
+        return node._replace(body=rename_groups(node.body, rename))
+    if node_type is Conditional:
+        opener = node.opener
+        if opener != '(?(DEFINE)':
+            name = opener[3:-1]
+            if name.isdigit():
+                raise Unparsable('numbered group reference %s' % opener)
+            opener = '(?(%s)' % rename(name)
+        no = None if node.no is None else rename_groups(node.no, rename)
+        return Conditional(opener, rename_groups(node.yes, rename), no)
+    return node
+
+
+def reads_captures(regex):
+    # backreferences & conditionals: the regex module doesn't always forget what an atomic group captured
+    # when backtracking out of it, so they can see captures from a failed attempt at an earlier position --
+    # search() starts each position afresh, but the lookaheads of a PatternSet retry them within one match
+    return any(construct in regex for construct in ('(?P=', '\\g<')) or '(?(' in regex.replace('(?(DEFINE)', '')
+
+
+COMBINED_CACHE_SIZE = 256 # number of combined patterns, one per set of candidates, each PatternSet keeps
+
+
+class PatternSet(object):
+    # Many oprex patterns searched together: an Aho-Corasick automaton over their requirements() picks the
+    # candidates that may match a text, then one combined pattern searches for all of those at once -- each
+    # pattern in its own lookahead, so every one of them gets its leftmost match like with search().
+    # Their capture names get prefixed with p<index>_ in the combined pattern so they don't collide.
+    def __init__(self, sources, flags=0, **options):
+        # sources: a dict of pattern id -> oprex source, or a sequence of sources (their index is their id)
+        if not hasattr(sources, 'items'):
+            sources = OrderedDict(enumerate(sources))
+        options = Options(**options)
+        self.flags = flags
+        self.ids = []
+        self.standalones = []   # the patterns, compiled on their own
+        self.bodies = []        # their regex with the groups renamed, without the global flags -- None if they
+        self.global_flags = []  # can't be combined (see reads_captures()), searched on their own instead then
+        self.literals = []
+        self.chars = []
+        self.shapes = []
+        for index, (pattern_id, source_code) in enumerate(sources.items()):
+            pattern = compiled_pattern(cached_regex(source_code, options), flags)
+            self.ids.append(pattern_id)
+            self.standalones.append(pattern)
+            prefix = 'p%d_' % index
+            try:
+                if reads_captures(pattern.pattern):
+                    raise Unparsable('reads captures')
+                tree = OutputTree(pattern.pattern, flags)
+                body = rename_groups(Sequence(tree.root.items[1:]), lambda name: prefix + name)
+                self.bodies.append(unparse(body))
+                self.global_flags.append(tree.root.items[0].text)
+            except Unparsable:
+                self.bodies.append(None)
+                self.global_flags.append(None)
+            required = requirements(pattern)
+            self.literals.append(frozenset(required.literals))
+            self.chars.append(required.chars or frozenset())
+            self.shapes.append(match_shape(pattern))
+
+        self.requiring = defaultdict(set) # literal or char -> the indexes of the patterns requiring it
+        self.unrequiring = [] # the indexes of the patterns that don't require anything
+        for index in range(len(self.ids)):
+            required = self.literals[index] | self.chars[index]
+            for literal in required:
+                self.requiring[literal].add(index)
+            if not required:
+                self.unrequiring.append(index)
+        self.automaton = LiteralAutomaton(self.requiring)
+        self.combined = LRUCache(COMBINED_CACHE_SIZE)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def candidates(self, text):
+        # the indexes, in order, of the patterns whose requirements the text meets, and that it's long enough for
+        found = self.automaton.found(text) if self.requiring else set()
+        indexes = set(self.unrequiring)
+        for index in set().union(*(self.requiring[literal] for literal in found)):
+            if self.literals[index] <= found and (not self.chars[index] or self.chars[index] & found):
+                indexes.add(index)
+        length = len(text)
+        return sorted(index for index in indexes if self.shapes[index].min_length <= length)
+
+    def combined_pattern(self, indexes):
+        # one pattern searching for each of the patterns at those indexes, all with the same global flags
+        indexes = tuple(indexes)
+        pattern = self.combined.get(indexes)
+        if pattern is None:
+            lookaheads = ''.join('(?=%s(?P<p%d>%s)|)' % (
+                '' if self.shapes[index].anchor == 'string' else '(?s:.)*?', # no use trying further in
+                index, self.bodies[index]) for index in indexes)
+            pattern = regexlib.compile(self.global_flags[indexes[0]] + lookaheads, self.flags)
+            self.combined.put(indexes, pattern)
+        return pattern
+
+    def search(self, text):
+        # a SetMatch for each of the patterns that match somewhere in the text, in their order
+        by_flags = OrderedDict()
+        standalones = []
+        for index in self.candidates(text):
+            if self.bodies[index] is None:
+                standalones.append(index)
+            else:
+                by_flags.setdefault(self.global_flags[index], []).append(index)
+
+        found = {}
+        for indexes in by_flags.values():
+            match = self.combined_pattern(indexes).match(text)
+            for index in indexes:
+                name = 'p%d' % index
+                if match.start(name) >= 0:
+                    prefix = name + '_'
+                    found[index] = SetMatch(self.ids[index], match.start(name), match.end(name), dict(
+                        (group[len(prefix):], value) for group, value in match.groupdict().items()
+                        if group.startswith(prefix)))
+        for index in standalones:
+            match = self.standalones[index].search(text)
+            if match:
+                found[index] = SetMatch(self.ids[index], match.start(), match.end(), match.groupdict())
+        return [found[index] for index in sorted(found)]
+
+
+Check = namedtuple('Check', 'index regex negative pattern')
+# index    -- the position of the lookahead the check was taken from among the top-level items of the regex
+#             (after the global flags), for the check of what's left: of its first item
+# negative -- the text passes the check if the pattern doesn't match it
+
+class Validator(object):
+    # A pattern whose regex starts with lookaheads, e.g. samples/password-check.oprex, decomposed into
+    # separate checks -- each its own pattern, tried with match() at the start of the text: the independent
+    # lookaheads cheapest first (see order_lookaheads()), then what's left of the regex. The first check
+    # that fails ends it, without the others being tried.
+    def __init__(self, source_code, flags=0, **options):
+        self.pattern = compile(source_code, flags, **options)
+        try:
+            tree = OutputTree(self.pattern.pattern, flags)
+        except Unparsable:
+            self.checks = [Check(0, self.pattern.pattern, False, self.pattern)]
+            return
+        global_flags = tree.root.items[0].text
+        lookaheads = [] # (index, lookahead)
+        rest = []
+        rest_index = None
+        at_start = True # nothing before can have consumed a character
+        for index, item in enumerate(tree.root.items[1:]):
+            if at_start and is_orderable(item):
+                lookaheads.append((index, item))
+                continue
+            if not rest:
+                rest_index = index
+            rest.append(item)
+            at_start = at_start and length_bounds(item, frozenset())[1] == 0
+        lookaheads.sort(key=lambda indexed: lookahead_cost(tree, indexed[1]))
+        self.checks = [Check(index, unparse(lookahead.body), lookahead.opener == '(?!',
+            compiled_pattern(global_flags + unparse(lookahead.body), flags)) for index, lookahead in lookaheads]
+        if rest:
+            regex = unparse(Sequence(tuple(rest)))
+            self.checks.append(Check(rest_index, regex, False, compiled_pattern(global_flags + regex, flags)))
+
+    def failure(self, text):
+        # the first Check the text fails, None if it passes them all
+        for check in self.checks:
+            if bool(check.pattern.match(text)) == check.negative:
+                return check
+        return None
+
+    def match(self, text):
+        # whether the pattern matches at the start of the text
+        return self.failure(text) is None
+
+
+class LRUCache(object):
+    # least-recently-used cache, optionally size-aware: when sizeof is given, maxsize limits
+    # the total of sizeof(value) of the entries instead of the number of entries
+    def __init__(self, maxsize, sizeof=None):
+        self.maxsize = maxsize
+        self.sizeof = sizeof
+        self.entries = OrderedDict()
+        self.currsize = 0
+        self.hits = self.misses = self.evictions = 0
+        self.lock = threading.Lock()
+
+    def weigh(self, value):
+        return self.sizeof(value) if self.sizeof else 1
+
+    def get(self, key):
+        with self.lock:
+            try:
+                value = self.entries.pop(key)
+            except KeyError:
+                self.misses += 1
+                return None
+            self.entries[key] = value # re-insert to mark as most-recently used
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        weight = self.weigh(value)
+        with self.lock:
+            if key in self.entries:
+                self.currsize -= self.weigh(self.entries.pop(key))
+            if weight > self.maxsize: # would evict everything else and still not fit
+                return
+            self.entries[key] = value
+            self.currsize += weight
+            while self.currsize > self.maxsize:
+                _, evicted = self.entries.popitem(last=False)
+                self.currsize -= self.weigh(evicted)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.currsize = 0
+            self.hits = self.misses = self.evictions = 0
+
+    def info(self):
+        with self.lock:
+            return CacheInfo(self.hits, self.misses, self.evictions, self.currsize, self.maxsize)
+
+
+REGEX_CACHE_SIZE = 1024         # number of emitted regex strings to keep
+PATTERN_CACHE_SIZE = 4 * 2**20  # total length of the regex strings whose compiled pattern objects are kept
+NUMRANGE_CACHE_SIZE = 1024      # number of number-range regexes to keep
+regex_cache = LRUCache(REGEX_CACHE_SIZE)
+pattern_cache = LRUCache(PATTERN_CACHE_SIZE, sizeof=lambda pattern: len(pattern.pattern))
+numrange_cache = LRUCache(NUMRANGE_CACHE_SIZE)
+
+
+class DiskCache(object):
+    # content-addressed translation cache shared across processes: one JSON file per entry, named after the
+    # hash of the normalized source, the translation options, the grammar signature and the regex engine version
+    FORMAT = '2'
+    def __init__(self, directory):
+        self.directory = directory
+        self.hits = self.misses = 0
+        self.lock = threading.Lock() # for the counters
+
+    def path_for(self, normalized, options=DEFAULT_OPTIONS):
+        digest = hashlib.sha256()
+        for part in (normalized, json.dumps(options), parsetab._lr_signature, regexlib.__version__, self.FORMAT):
+            digest.update(part.encode('utf-8'))
+            digest.update(b'\0')
+        return os.path.join(self.directory, digest.hexdigest() + '.json')
+
+    def get(self, normalized, options=DEFAULT_OPTIONS):
+        try:
+            with open(self.path_for(normalized, options), 'rb') as f:
+                entry = json.loads(f.read().decode('utf-8'))
+            fields = dict((str(field), value) for field, value in entry.items())
+            fields['pruned'] = [Pruned(*pruned) for pruned in fields.get('pruned', ())] # JSON made them lists
+            translation = Translation(**fields)
+        except (IOError, OSError, ValueError, KeyError, TypeError): # missing, unreadable or corrupt entry
+            with self.lock:
+                self.misses += 1
+            return None
+        with self.lock:
+            self.hits += 1
+        return translation
+
+    def put(self, normalized, translation, options=DEFAULT_OPTIONS):
+        entry = json.dumps(translation._asdict())
+        temp_path = None
+        try:
+            try:
+                if not os.path.isdir(self.directory):
+                    os.makedirs(self.directory)
+            except OSError: # created concurrently by another process
+                if not os.path.isdir(self.directory):
+                    raise
+            # write into a temp file then rename it into place, so concurrent readers never see a partial entry
+            fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp-', suffix='.json')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(entry.encode('utf-8'))
+            replace_file(temp_path, self.path_for(normalized, options))
+        except (IOError, OSError): # read-only, full, etc: the translation just doesn't get cached
+            if temp_path is not None and os.path.exists(temp_path):
+                try:
+                    os.unlink(temp_path)
+                except OSError:
+                    pass
+
+    def info(self):
+        return CacheInfo(self.hits, self.misses, 0, None, None)
+
+
+replace_file = getattr(os, 'replace', os.rename) # os.replace is python3-only, os.rename is atomic on POSIX
+disk_cache = DiskCache(os.environ['OPREX_CACHE_DIR']) if os.environ.get('OPREX_CACHE_DIR') else None
+
+
+def set_disk_cache(directory):
+    # directory=None disables the disk cache
+    global disk_cache
+    disk_cache = DiskCache(directory) if directory else None
+
+
+def compile(source_code, flags=0, **options):
+    # cached front door: translate the oprex source and compile it into a regex pattern object.
+    # Level 1 maps the normalized source + translation options to the emitted regex string, level 2
+    # maps the regex string + regex flags to the compiled pattern object. When a disk cache is set,
+    # level 1 misses are looked up there before translating.
+    return compiled_pattern(cached_regex(source_code, Options(**options)), flags)
+
+
+def cached_regex(source_code, options=DEFAULT_OPTIONS):
+    source_lines = sanitize(source_code)
+    normalized = '\n'.join(source_lines)
+    key = normalized, options
+    regex = regex_cache.get(key)
+    if regex is None:
+        translation = disk_cache and disk_cache.get(normalized, options)
+        if translation is None:
+            translation = translate(source_lines, options)
+            if disk_cache:
+                disk_cache.put(normalized, translation, options)
+        regex = translation.regex
+        regex_cache.put(key, regex)
+    return regex
+
+
+def compiled_pattern(regex, flags):
+    key = regex, flags
+    pattern = pattern_cache.get(key)
+    if pattern is None:
+        pattern = regexlib.compile(regex, flags)
+        pattern_cache.put(key, pattern)
+    return pattern
+
+
+def regex_or_error(source_code, options=DEFAULT_OPTIONS):
+    try:
+        return cached_regex(source_code, options)
+    except OprexError as e:
+        return e
+
+
+def warm_up_worker():
+    get_compiler() # build the lexer & parser once per worker, before any source arrives
+
+
+def translate_many(sources, jobs=None, **options):
+    # Translate the sources using `jobs` worker processes (default: one per CPU, 1: no worker processes).
+    # Returns a list, in input order, of each source's regex string or the OprexError it raised.
+    sources = list(sources)
+    translate_one = functools.partial(regex_or_error, options=Options(**options))
+    if jobs is None:
+        jobs = multiprocessing.cpu_count()
+    jobs = min(jobs, len(sources))
+    if jobs <= 1:
+        return list(map(translate_one, sources))
+
+    pool = multiprocessing.Pool(jobs, initializer=warm_up_worker)
+    try:
+        return pool.map(translate_one, sources, chunksize=max(1, len(sources) // (jobs * 4)))
+    finally:
+        pool.close()
+        pool.join()
+
+
+def compile_many(sources, jobs=None, flags=0, **options):
+    # like translate_many(), but returns compiled pattern objects (for the sources without errors)
+    return [
+        result if isinstance(result, OprexError) else compiled_pattern(result, flags)
+        for result in translate_many(sources, jobs, **options)
+    ]
+
+
+def cache_info():
+    return CacheStats(regex_cache.info(), pattern_cache.info(), numrange_cache.info())
+
+
+def clear_cache():
+    regex_cache.clear()
+    pattern_cache.clear()
+    numrange_cache.clear()
+
+
 if __name__ == "__main__":
     argparser = argparse.ArgumentParser()
-    argparser.add_argument('path/to/source/file')
+    argparser.add_argument('path/to/source/file', nargs='+')
     argparser.add_argument('--encoding', help='encoding of the source file')
+    argparser.add_argument('--jobs', type=int, default=1, help='number of worker processes to translate many files with')
+    argparser.add_argument('--share-definitions', type=int, metavar='MIN_LENGTH',
+        help='emit definitions used more than once in a (?(DEFINE)...) block, if their regex is at least MIN_LENGTH long')
+    argparser.add_argument('--factor-literals', action='store_true',
+        help='factor the string-literal branches of OR-blocks into a prefix trie')
+    argparser.add_argument('--possessify', action='store_true',
+        help='make greedy quantifiers possessive where giving back characters can never lead to a match')
+    argparser.add_argument('--atomize', action='store_true',
+        help='make OR-blocks atomic where backtracking into them can never lead to a match')
+    argparser.add_argument('--peephole', action='store_true',
+        help='simplify the regex: leave out redundant groups and flags, merge nested quantifiers')
+    argparser.add_argument('--prune', action='store_true',
+        help='leave out what can never match, e.g. OR-block branches with FAIL! in them, with a warning for each')
+    argparser.add_argument('--order-lookaheads', action='store_true',
+        help='try the lookaheads next to each other cheapest first')
+    argparser.add_argument('--evaluate-charclasses', action='store_true',
+        help='emit character classes with set operations in them as the ranges they come to')
+    argparser.add_argument('--canonicalize-charclasses', action='store_true',
+        help='emit the other character classes with their items merged and sorted')
+    argparser.add_argument('--keep-captures', nargs='*', metavar='NAME',
+        help='emit only these captures (and those backreferences need), the others as non-capturing')
+    argparser.add_argument('--refuse-backtracking', choices=SEVERITIES, metavar='SEVERITY',
+        help='fail instead of emitting a regex with a backtracking risk at least this severe (%s)' % ', '.join(SEVERITIES))
+    argparser.add_argument('--analyze', action='store_true',
+        help='list the backtracking risks of each source file instead of its regex')
+    argparser.add_argument('--slow-inputs', type=int, metavar='COUNT',
+        help='search for the COUNT slowest inputs of each source file instead of printing its regex')
+    argparser.add_argument('--budget', type=float, default=2.0, help='seconds to search for slow inputs per file')
     args = argparser.parse_args()
-
-    source_file = getattr(args, 'path/to/source/file')
+    options = dict(share_definitions=args.share_definitions, factor_literals=args.factor_literals,
+        possessify=args.possessify, atomize=args.atomize, refuse_backtracking=args.refuse_backtracking,
+        peephole=args.peephole, prune=args.prune, order_lookaheads=args.order_lookaheads,
+        evaluate_charclasses=args.evaluate_charclasses, canonicalize_charclasses=args.canonicalize_charclasses,
+        keep_captures=args.keep_captures)
+    warnings.formatwarning = lambda message, category, *args, **kwargs: 'warning: %s\n' % message
+
+    source_files = getattr(args, 'path/to/source/file')
     default_encoding = 'utf-8'
     encoding = args.encoding or default_encoding
 
-    with codecs.open(source_file, 'r') as f:
-        source_code = f.read()
-
-    print(oprex(source_code))
+    source_codes = []
+    for source_file in source_files:
+        with codecs.open(source_file, 'r', encoding) as f:
+            source_codes.append(f.read())
+
+    if args.analyze:
+        for source_file, source_code in zip(source_files, source_codes):
+            for finding in analyze(source_code, **options):
+                print('%s:%d: %s: %s' % (source_file, finding.lineno, finding.severity, finding.message))
+    elif args.slow_inputs:
+        for source_file, source_code in zip(source_files, source_codes):
+            for slow_input in slow_inputs(source_code, count=args.slow_inputs, budget=args.budget, **options):
+                print('%s: %10.3f ms %r' % (source_file, slow_input.seconds * 1000, slow_input.text))
+    elif len(source_codes) == 1:
+        translation = translate(sanitize(source_codes[0]), Options(**options))
+        print(translation.regex)
+        if translation.atomized:
+            sys.stderr.write('atomized OR-blocks at line %s\n' % ', '.join(map(str, translation.atomized)))
+    else:
+        has_error = False
+        for source_file, result in zip(source_files, translate_many(source_codes, jobs=args.jobs, **options)):
+            if isinstance(result, OprexError):
+                has_error = True
+                sys.stderr.write('%s:%s\n' % (source_file, result))
+            else:
+                print('%s: %s' % (source_file, result))
+        if has_error:
+            sys.exit(1)
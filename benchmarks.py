@@ -0,0 +1,441 @@
+# -*- coding: utf-8 -*-
+
+# Usage: python benchmarks.py [benchmark-name ...]   (no name = run all)
+
+from __future__ import print_function, unicode_literals
+
+import os, subprocess, sys, timeit
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def report(name, seconds, extra=''):
+    print('  %-40s %10.3f ms %s' % (name, seconds * 1000, extra))
+
+
+def bench_import():
+    # import and first-translation time in a fresh interpreter, default vs faststart tables
+    script = '''
+import time
+start = time.time()
+import __init__
+imported = time.time()
+__init__.oprex("\\n/x/\\n  x = 'a'\\n")
+translated = time.time()
+print('%f %f' % (imported - start, translated - imported))
+'''
+    print('import:')
+    for faststart in ('0', '1'):
+        env = dict(os.environ, OPREX_FASTSTART=faststart)
+        runs = []
+        for _ in range(5):
+            output = subprocess.check_output([sys.executable, '-c', script], cwd=HERE, env=env)
+            runs.append(tuple(map(float, output.split())))
+        import_time, first_translation = min(runs)
+        label = 'faststart' if faststart == '1' else 'default'
+        report('import (%s)' % label, import_time)
+        report('first translation (%s)' % label, first_translation)
+
+
+def sample_sources():
+    samples_dir = os.path.join(HERE, 'samples')
+    sources = []
+    for filename in sorted(os.listdir(samples_dir)):
+        with open(os.path.join(samples_dir, filename), 'rb') as f:
+            sources.append(f.read().decode('utf-8'))
+    return sources
+
+
+def bench_batch():
+    # translating a pattern library serially vs with worker processes
+    import multiprocessing
+    from __init__ import translate_many
+    sources = [ # distinct sources, so the translation cache doesn't kick in
+        source.replace('\n', '\n-- %d\n' % i, 1) for i, source in enumerate(sample_sources() * 100)
+    ]
+    print('batch (%d sources):' % len(sources))
+    for jobs in sorted(set([1, 2, multiprocessing.cpu_count()])):
+        start = timeit.default_timer()
+        translate_many(sources, jobs=jobs)
+        report('jobs=%d' % jobs, timeit.default_timer() - start)
+
+
+def time_translation(source, repeat=3):
+    from __init__ import oprex
+    return min(timeit.repeat(lambda: oprex(source), number=1, repeat=repeat))
+
+
+def bench_scaling():
+    # translation time per line should stay flat as the source grows
+    def orblock(num_lines):
+        return '\n<<|\n' + ''.join("  |'word%d'\n" % i for i in range(num_lines)) + '\n'
+
+    def lookarounds(num_lines): # half lookahead lines, half definition lines
+        num_items = num_lines // 2
+        lookaheads = ''.join('|/__/w%d/>\n' % i for i in range(num_items))
+        definitions = ''.join("    w%d = 'word%d'\n" % (i, i) for i in range(num_items))
+        return '\n<@>\n' + lookaheads + '\n' + definitions
+
+    print('scaling:')
+    for generate in (orblock, lookarounds):
+        for num_lines in (1000, 2000, 5000, 10000):
+            seconds = time_translation(generate(num_lines))
+            report('%s, %d lines' % (generate.__name__, num_lines), seconds, '(%.1f us/line)' % (seconds / num_lines * 1e6))
+
+
+def peak_memory(function):
+    # peak memory allocated while running function(), when tracemalloc is available (python 3.4+)
+    try:
+        import tracemalloc
+    except ImportError:
+        function()
+        return ''
+    tracemalloc.start()
+    try:
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return '(peak %.1f MB)' % (peak / 2.0**20)
+
+
+def bench_lists(sizes=(1000, 10000, 100000)):
+    # long OR-blocks, lookup chains + definition lists, and character classes
+    from __init__ import oprex
+
+    def orblock(num_items):
+        return '\n@|\n' + ''.join(" |'word%d'\n" % i for i in range(num_items)) + '\n'
+
+    def chain_and_definitions(num_items):
+        chain = '/' + '/'.join('w%d' % i for i in range(num_items)) + '/'
+        return '\n' + chain + '\n' + ''.join("    w%d = 'word%d'\n" % (i, i) for i in range(num_items))
+
+    def charclass(num_items):
+        return '\n/x/\n    x: ' + ' '.join('\\u%04x' % (0x100 + i % 0xD000) for i in range(num_items)) + '\n'
+
+    print('lists:')
+    for generate in (orblock, chain_and_definitions, charclass):
+        for num_items in sizes:
+            source = generate(num_items)
+            start = timeit.default_timer()
+            memory = peak_memory(lambda: oprex(source))
+            seconds = timeit.default_timer() - start
+            report('%s, %d items' % (generate.__name__, num_items), seconds, memory)
+
+
+def bench_sharing(depths=(2, 4, 6)):
+    # layered definitions, each used 3 times by the layer above: the inlined output grows as 3^depth
+    import regex
+    from __init__ import translate, sanitize, Options
+
+    def layered(depth):
+        lines = ['', '/d%d/' % depth]
+        for level in range(depth, 0, -1):
+            indent = '    ' * (depth - level + 1)
+            lines.append(indent + 'd%d = /d%d/digit/d%d/digit/d%d/' % (level, level - 1, level - 1, level - 1))
+        lines.append('    ' * (depth + 1) + "d0 = 'word'")
+        lines.append('')
+        return '\n'.join(lines)
+
+    print('sharing:')
+    for depth in depths:
+        source_lines = sanitize(layered(depth))
+        for share_definitions in (None, 0):
+            translation = translate(source_lines, Options(share_definitions=share_definitions))
+            regex.purge() # the regex module caches compiled patterns too
+            start = timeit.default_timer()
+            regex.compile(translation.regex)
+            label = 'inlined' if share_definitions is None else 'shared'
+            report('depth %d, %s: regex.compile()' % (depth, label), timeit.default_timer() - start,
+                '(%d chars, %d inlined)' % (len(translation.regex), translation.inlined_size))
+
+
+def bench_keywords(sizes=(100, 1000, 5000)):
+    # matching against OR-blocks of keywords, flat alternation vs factor_literals
+    import random, regex
+    from __init__ import oprex
+    rng = random.Random(0)
+
+    def keyword():
+        return ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(3, 10)))
+
+    print('keywords:')
+    for size in sizes:
+        keywords = sorted(set(keyword() for _ in range(size)))
+        source = '\n@|\n' + ''.join(" |'%s'\n" % word for word in keywords) + '\n'
+        text = ' '.join(keyword() for _ in range(20000))
+        for factor_literals in (False, True):
+            pattern = regex.compile(oprex(source, factor_literals=factor_literals))
+            seconds = min(timeit.repeat(lambda: pattern.findall(text), number=1, repeat=3))
+            label = 'factored' if factor_literals else 'flat'
+            report('%d keywords, %s: findall()' % (len(keywords), label), seconds, '(%d chars)' % len(pattern.pattern))
+
+
+def bench_numranges():
+    # translating number ranges: the same few ranges used over and over, and bounds with many digits
+    from __init__ import clear_cache
+    ranges = [('1', '12'), ('o1', '31'), ('0', '23'), ('00', '59'), ('0', '255'), ('1900', '2099'), ('0', '65535')] * 50
+    source = '\n/' + '/'.join('r%d' % i for i in range(len(ranges))) + '/\n' + ''.join(
+        "    r%d = '%s'..'%s'\n" % ((i,) + bounds) for i, bounds in enumerate(ranges))
+
+    print('numranges:')
+    report('%d ranges' % len(ranges), time_translation(source))
+    for num_digits in (10, 100, 1000):
+        low, high = '1' * num_digits, '9' * num_digits + '8'
+        clear_cache()
+        report('%d-digit bounds' % num_digits, time_translation("\n'%s'..'%s'\n" % (low, high), repeat=1))
+
+
+def bench_possessify():
+    # failing searches, where greedy quantifiers keep giving back characters for nothing
+    import regex
+    from __init__ import oprex
+    source = '''
+/key/equals/value/semicolon/
+    key = 1.. <<- of wordchar
+    equals = '='
+    value = 1.. <<- of digit
+    semicolon = ';'
+'''
+    text = ','.join('key%d=%s' % (i, '9' * 1000) for i in range(100))
+    print('possessify:')
+    for possessify in (False, True):
+        pattern = regex.compile(oprex(source, possessify=possessify))
+        seconds = min(timeit.repeat(lambda: pattern.search(text), number=1, repeat=3))
+        report('possessify=%s: search()' % possessify, seconds, '(%s)' % pattern.pattern)
+
+
+def bench_atomize():
+    # failing searches, where backtracking into OR-blocks retries every way of splitting a run of characters
+    import regex
+    from __init__ import oprex
+    source = '''
+/token/token/semicolon/
+    semicolon = ';'
+    token = <<|
+              |1.. <<- of digit
+              |1.. <<- of alpha
+
+'''
+    text = 'x' * 300 + '9' * 300 + ' ;'
+    print('atomize:')
+    for atomize in (False, True):
+        pattern = regex.compile(oprex(source, atomize=atomize))
+        seconds = min(timeit.repeat(lambda: pattern.search(text), number=1, repeat=3))
+        report('atomize=%s: search()' % atomize, seconds, '(%s)' % pattern.pattern)
+
+
+def bench_match_until(num_near_misses=2000):
+    # __ up to a multi-character limiter in a long line full of its prefixes: the unrolled loop emitted now
+    # vs the repeated alternation of possessive runs emitted before, which the regex module handles in
+    # quadratic time (and gives up on, "too much backtracking", at a few times this length)
+    import regex
+    from __init__ import oprex
+    source = '''
+/__/END/
+    END = 'END'
+'''
+    text = 'xx EN ENx E ' * num_near_misses + 'END'
+    print('match-until (%d near misses):' % num_near_misses)
+    for name, regex_source in (('possessive runs', r'(?V1w)(?:[^E]++|E(?!ND))++END'), ('unrolled', oprex(source))):
+        pattern = regex.compile(regex_source)
+        seconds = min(timeit.repeat(lambda: pattern.search(text), number=1, repeat=3))
+        report('%s: search()' % name, seconds, '(%s)' % regex_source)
+    # up to a limiter that isn't a string or a class: lazy dot vs the unrolled loop around its first characters
+    source = '''
+/__/octet/
+    octet = '0'..'255'
+'''
+    text = 'host: n/a; ' * num_near_misses + '10'
+    lazy_dot = r'(?V1w).+?(?>2(?>5[0-5]|[0-4]\d)|1\d{2}|[1-9]\d?+|0)(?!\d)'
+    for name, regex_source in (('lazy dot', lazy_dot), ('unrolled', oprex(source))):
+        pattern = regex.compile(regex_source)
+        seconds = min(timeit.repeat(lambda: pattern.search(text), number=1, repeat=3))
+        report('%s: search()' % name, seconds, '(%s)' % regex_source)
+
+
+def bench_slow_inputs(budget=1.0):
+    # the slowest input found for each sample, within the budget (inf: the regex engine crashed on it)
+    from __init__ import slow_inputs
+    samples_dir = os.path.join(HERE, 'samples')
+    print('slow inputs (%.1fs per sample):' % budget)
+    for filename in sorted(os.listdir(samples_dir)):
+        with open(os.path.join(samples_dir, filename), 'rb') as f:
+            source = f.read().decode('utf-8')
+        slowest = slow_inputs(source, count=1, budget=budget)[0]
+        report(filename, slowest.seconds, '(%d chars)' % len(slowest.text))
+
+
+def bench_scan(num_lines=100000):
+    # searching log lines for email addresses, every line vs only the ones the prefilter lets through
+    import random, regex
+    from __init__ import oprex, scan
+    with open(os.path.join(HERE, 'samples', 'email.oprex'), 'rb') as f:
+        source = f.read().decode('utf-8')
+    rng = random.Random(0)
+    words = ['GET', 'POST', '/index.html', '200', '404', 'user', 'login', 'ok', 'failed', 'from', 'to']
+    lines = [' '.join(rng.choice(words) for _ in range(12)) for _ in range(num_lines)]
+    for i in range(0, num_lines, 100):
+        lines[i] += ' from alice%d@example.com' % i
+    pattern = regex.compile(oprex(source))
+    print('scan (%d lines):' % num_lines)
+    seconds = min(timeit.repeat(lambda: [pattern.search(line) for line in lines], number=1, repeat=3))
+    report('search() every line', seconds)
+    seconds = min(timeit.repeat(lambda: list(scan(source, lines)), number=1, repeat=3))
+    report('scan()', seconds)
+
+
+def bench_pattern_set(num_patterns=300, num_lines=10000):
+    # log lines against many patterns: each pattern's search() vs one PatternSet
+    import random, regex
+    from __init__ import oprex, PatternSet
+    rng = random.Random(0)
+
+    def word():
+        return ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(4, 8)))
+
+    keywords = [word() for _ in range(num_patterns)]
+    sources = ["\n/keyword/space/code/\n    keyword = '%s'\n    [code] = 3 of digit\n" % keyword for keyword in keywords]
+    lines = [' '.join(word() for _ in range(10)) for _ in range(num_lines)]
+    for i in range(0, num_lines, 10):
+        lines[i] += ' %s %03d' % (rng.choice(keywords), i % 1000)
+    patterns = [regex.compile(oprex(source)) for source in sources]
+    pattern_set = PatternSet(sources)
+    print('pattern set (%d patterns, %d lines):' % (num_patterns, num_lines))
+    seconds = min(timeit.repeat(lambda: [[pattern.search(line) for pattern in patterns] for line in lines],
+        number=1, repeat=3))
+    report('search() with each pattern', seconds)
+    seconds = min(timeit.repeat(lambda: [pattern_set.search(line) for line in lines], number=1, repeat=3))
+    report('PatternSet.search()', seconds)
+
+
+def bench_peephole(num_items=200, repeat=20):
+    # regex.compile() of a regex with a flag scope & nested quantifiers per item, as emitted vs simplified
+    import regex
+    from __init__ import oprex
+    source = '\n/' + '/'.join('w%d' % i for i in range(num_items)) + '/\n' + ''.join(
+        "    w%d = 2 of v%d\n        v%d = 1.. <<- of any\n" % (i, i, i) for i in range(num_items))
+    print('peephole (%d items):' % num_items)
+    for peephole in (False, True):
+        regex_source = oprex(source, peephole=peephole)
+        def compile_once():
+            regex.purge()
+            regex.compile(regex_source)
+        seconds = min(timeit.repeat(compile_once, number=repeat, repeat=3)) / repeat
+        report('peephole=%s: regex.compile()' % peephole, seconds, '(%d chars)' % len(regex_source))
+
+
+def bench_validator(num_texts=2000):
+    # validating free-text form input with a lookahead-only source: the lookaheads in source order, ordered
+    # cheapest first, and decomposed into separate checks (a Python call each, which short texts don't repay)
+    import random
+    from __init__ import Validator, compile
+    source = """
+<@>
+|has_number>
+|has_symbol>
+|!space>
+|!too_long>
+
+    has_number = /__?/digit/
+    has_symbol = /__?/non-alnum/
+    too_long = 33 of any
+"""
+    rng = random.Random(0)
+    chars = 'abcdefghij ABC-123'
+    texts = [''.join(rng.choice(chars) for _ in range(rng.randint(0, 4000))) for _ in range(num_texts)]
+    print('validator (%d texts):' % num_texts)
+    for name, pattern in (('source order', compile(source)), ('ordered', compile(source, order_lookaheads=True)),
+            ('decomposed', Validator(source))):
+        seconds = min(timeit.repeat(lambda: [pattern.match(text) for text in texts], number=1, repeat=3))
+        report('%s: match()' % name, seconds)
+
+
+def bench_charclasses(num_chars=200000):
+    # scanning with set-operation classes, as emitted vs evaluated into their ranges
+    import random
+    from __init__ import compile
+    sources = dict(
+        consonants = """
+/consonants/
+    consonants = @3.. of consonant
+        consonant: alpha not vowel
+            vowel: a i u e o A I U E O
+""",
+        numbers = """
+(ascii)
+/number/
+    number = /nonzero/more/
+        nonzero: digit not 0
+        more = @0.. of digit
+""",
+    )
+    rng = random.Random(0)
+    text = ''.join(rng.choice('abcdefghijklmnopqrstuvwxyzABCDEF0123456789  ,.') for _ in range(num_chars))
+    print('charclasses (%d chars):' % num_chars)
+    for name, source in sorted(sources.items()):
+        for evaluate in (False, True):
+            pattern = compile(source, evaluate_charclasses=evaluate)
+            seconds = min(timeit.repeat(lambda: pattern.findall(text), number=1, repeat=3))
+            report('%s, evaluated=%s: findall()' % (name, evaluate), seconds, pattern.pattern)
+
+
+def bench_keep_captures(num_lines=20000):
+    # yes/no matching of log lines with a capture per field, as emitted vs with keep_captures=()
+    import random
+    from __init__ import compile
+    source = """
+/date/space/time/space/level/space/module/colon/space/message/
+    [date] = /year/dash/month/dash/day/
+        [year] = @4 of digit
+        [month] = @2 of digit
+        [day] = @2 of digit
+        dash: -
+    [time] = /hour/colon/minute/colon/second/
+        [hour] = @2 of digit
+        [minute] = @2 of digit
+        [second] = @2 of digit
+        colon: :
+    [level] = @1.. of upper
+    [module] = @1.. of lower
+    colon: :
+    [message] = @1.. of any
+"""
+    rng = random.Random(0)
+    lines = ['2016-06-%02d %02d:%02d:%02d %s %s: %s' % (rng.randint(1, 30), rng.randint(0, 23), rng.randint(0, 59),
+        rng.randint(0, 59), rng.choice(['INFO', 'WARN', 'ERROR']), rng.choice(['db', 'http', 'cache']),
+        'x' * rng.randint(10, 80)) for _ in range(num_lines)]
+    print('keep-captures (%d lines):' % num_lines)
+    for keep_captures in (None, ()):
+        pattern = compile(source, keep_captures=keep_captures)
+        seconds = min(timeit.repeat(lambda: [pattern.match(line) for line in lines], number=1, repeat=3))
+        report('keep_captures=%r: match()' % (keep_captures,), seconds)
+
+
+BENCHMARKS = [
+    ('import', bench_import),
+    ('batch', bench_batch),
+    ('scaling', bench_scaling),
+    ('lists', bench_lists),
+    ('sharing', bench_sharing),
+    ('keywords', bench_keywords),
+    ('numranges', bench_numranges),
+    ('possessify', bench_possessify),
+    ('atomize', bench_atomize),
+    ('match-until', bench_match_until),
+    ('slow-inputs', bench_slow_inputs),
+    ('scan', bench_scan),
+    ('pattern-set', bench_pattern_set),
+    ('peephole', bench_peephole),
+    ('validator', bench_validator),
+    ('charclasses', bench_charclasses),
+    ('keep-captures', bench_keep_captures),
+]
+
+
+if __name__ == '__main__':
+    sys.path.insert(0, HERE)
+    selected = sys.argv[1:]
+    for name, benchmark in BENCHMARKS:
+        if not selected or name in selected:
+            benchmark()
@@ -0,0 +1,10 @@
+# lextab.py. This file automatically created by PLY (version 3.8). Don't edit!
+_tabversion   = '3.8'
+_lextokens    = set(['DEDENT', 'END_OF_ORBLOCK', 'BAR', 'EXCLAMARK', 'VARNAME', 'GLOBALMARK', 'NUMBER', 'CHAR', 'UNDERSCORE', 'MINUS', 'DOT', 'RPAREN', 'DOUBLEUNDERSCORE', 'BEGIN_ORBLOCK', 'NEWLINE', 'FLAGSET', 'LT', 'COLON', 'PLUS', 'GT', 'STRING', 'END_OF_LOOKAROUND', 'BEGIN_LOOKAROUND', 'AT', 'LPAREN', 'FAIL', 'RBRACKET', 'QUESTMARK', 'LBRACKET', 'NON', 'INDENT', 'WHITESPACE', 'OF', 'SLASH', 'NOT', 'EQUALSIGN'])
+_lexreflags   = 0
+_lexliterals  = ''
+_lexstateinfo = {'LOOKAROUND': 'inclusive', 'ORBLOCK': 'inclusive', 'INITIAL': 'inclusive', 'CHARCLASS': 'exclusive'}
+_lexstatere   = {'LOOKAROUND': [('(?P<t_ANY_comments_whitespace>(?mx)\n    (\n        [ \\t\\n]+\n        (--.*)?  # comments\n    )+\n    (\n        \\*\\)     # globalmark\n        [ \\t]*\n    )*\n    )', [None, ('t_ANY_comments_whitespace', 'comments_whitespace')]), ('(?P<t_COLON>:)|(?P<t_FLAGSET>\\([- \\t\\w]+\\))|(?P<t_BEGIN_LOOKAROUND><@>)|(?P<t_BEGIN_ORBLOCK>(<<\\|)|(@\\|))|(?P<t_STRING>("(\\\\.|[^"\\\\])*")|(\'(\\\\.|[^\'\\\\])*\'))|(?P<t_NON>non-)|(?P<t_FAIL>FAIL!)|(?P<t_VARNAME>[A-Za-z_][A-Za-z0-9_]*)|(?P<t_INITIAL_ORBLOCK_OF>[ \\t]+of(?=[ \\t:])(?![ \\t]+(--|\\n)))|(?P<t_ANY_comments_whitespace>(?mx)\n    (\n        [ \\t\\n]+\n        (--.*)?  # comments\n    )+\n    (\n        \\*\\)     # globalmark\n        [ \\t]*\n    )*\n    )|(?P<t_NUMBER>\\d+)|(?P<t_PLUS>\\+)|(?P<t_RPAREN>\\))|(?P<t_LBRACKET>\\[)|(?P<t_LT>\\<)|(?P<t_SLASH>\\/)|(?P<t_LPAREN>\\()|(?P<t_QUESTMARK>\\?)|(?P<t_BAR>\\|)|(?P<t_MINUS>\\-)|(?P<t_GT>\\>)|(?P<t_DOT>\\.)|(?P<t_AT>\\@)|(?P<t_RBRACKET>\\])|(?P<t_EQUALSIGN>\\=)|(?P<t_EXCLAMARK>\\!)', [None, ('t_COLON', 'COLON'), ('t_FLAGSET', 'FLAGSET'), ('t_BEGIN_LOOKAROUND', 'BEGIN_LOOKAROUND'), ('t_BEGIN_ORBLOCK', 'BEGIN_ORBLOCK'), None, None, ('t_STRING', 'STRING'), None, None, None, None, ('t_NON', 'NON'), ('t_FAIL', 'FAIL'), ('t_VARNAME', 'VARNAME'), ('t_INITIAL_ORBLOCK_OF', 'OF'), None, ('t_ANY_comments_whitespace', 'comments_whitespace'), None, None, None, (None, 'NUMBER'), (None, 'PLUS'), (None, 'RPAREN'), (None, 'LBRACKET'), (None, 'LT'), (None, 'SLASH'), (None, 'LPAREN'), (None, 'QUESTMARK'), (None, 'BAR'), (None, 'MINUS'), (None, 'GT'), (None, 'DOT'), (None, 'AT'), (None, 'RBRACKET'), (None, 'EQUALSIGN'), (None, 'EXCLAMARK')])], 'ORBLOCK': [('(?P<t_INITIAL_ORBLOCK_OF>[ \\t]+of(?=[ \\t:])(?![ \\t]+(--|\\n)))|(?P<t_ANY_comments_whitespace>(?mx)\n    (\n        [ \\t\\n]+\n        (--.*)?  # comments\n    )+\n    (\n        \\*\\)     # globalmark\n        [ \\t]*\n    )*\n    )', [None, ('t_INITIAL_ORBLOCK_OF', 'OF'), None, ('t_ANY_comments_whitespace', 'comments_whitespace')]), ('(?P<t_COLON>:)|(?P<t_FLAGSET>\\([- \\t\\w]+\\))|(?P<t_BEGIN_LOOKAROUND><@>)|(?P<t_BEGIN_ORBLOCK>(<<\\|)|(@\\|))|(?P<t_STRING>("(\\\\.|[^"\\\\])*")|(\'(\\\\.|[^\'\\\\])*\'))|(?P<t_NON>non-)|(?P<t_FAIL>FAIL!)|(?P<t_VARNAME>[A-Za-z_][A-Za-z0-9_]*)|(?P<t_INITIAL_ORBLOCK_OF>[ \\t]+of(?=[ \\t:])(?![ \\t]+(--|\\n)))|(?P<t_ANY_comments_whitespace>(?mx)\n    (\n        [ \\t\\n]+\n        (--.*)?  # comments\n    )+\n    (\n        \\*\\)     # globalmark\n        [ \\t]*\n    )*\n    )|(?P<t_NUMBER>\\d+)|(?P<t_PLUS>\\+)|(?P<t_RPAREN>\\))|(?P<t_LBRACKET>\\[)|(?P<t_LT>\\<)|(?P<t_SLASH>\\/)|(?P<t_LPAREN>\\()|(?P<t_QUESTMARK>\\?)|(?P<t_BAR>\\|)|(?P<t_MINUS>\\-)|(?P<t_GT>\\>)|(?P<t_DOT>\\.)|(?P<t_AT>\\@)|(?P<t_RBRACKET>\\])|(?P<t_EQUALSIGN>\\=)|(?P<t_EXCLAMARK>\\!)', [None, ('t_COLON', 'COLON'), ('t_FLAGSET', 'FLAGSET'), ('t_BEGIN_LOOKAROUND', 'BEGIN_LOOKAROUND'), ('t_BEGIN_ORBLOCK', 'BEGIN_ORBLOCK'), None, None, ('t_STRING', 'STRING'), None, None, None, None, ('t_NON', 'NON'), ('t_FAIL', 'FAIL'), ('t_VARNAME', 'VARNAME'), ('t_INITIAL_ORBLOCK_OF', 'OF'), None, ('t_ANY_comments_whitespace', 'comments_whitespace'), None, None, None, (None, 'NUMBER'), (None, 'PLUS'), (None, 'RPAREN'), (None, 'LBRACKET'), (None, 'LT'), (None, 'SLASH'), (None, 'LPAREN'), (None, 'QUESTMARK'), (None, 'BAR'), (None, 'MINUS'), (None, 'GT'), (None, 'DOT'), (None, 'AT'), (None, 'RBRACKET'), (None, 'EQUALSIGN'), (None, 'EXCLAMARK')])], 'INITIAL': [('(?P<t_COLON>:)|(?P<t_FLAGSET>\\([- \\t\\w]+\\))|(?P<t_BEGIN_LOOKAROUND><@>)|(?P<t_BEGIN_ORBLOCK>(<<\\|)|(@\\|))|(?P<t_STRING>("(\\\\.|[^"\\\\])*")|(\'(\\\\.|[^\'\\\\])*\'))|(?P<t_NON>non-)|(?P<t_FAIL>FAIL!)|(?P<t_VARNAME>[A-Za-z_][A-Za-z0-9_]*)|(?P<t_INITIAL_ORBLOCK_OF>[ \\t]+of(?=[ \\t:])(?![ \\t]+(--|\\n)))|(?P<t_ANY_comments_whitespace>(?mx)\n    (\n        [ \\t\\n]+\n        (--.*)?  # comments\n    )+\n    (\n        \\*\\)     # globalmark\n        [ \\t]*\n    )*\n    )|(?P<t_NUMBER>\\d+)|(?P<t_PLUS>\\+)|(?P<t_RPAREN>\\))|(?P<t_LBRACKET>\\[)|(?P<t_LT>\\<)|(?P<t_SLASH>\\/)|(?P<t_LPAREN>\\()|(?P<t_QUESTMARK>\\?)|(?P<t_BAR>\\|)|(?P<t_MINUS>\\-)|(?P<t_GT>\\>)|(?P<t_DOT>\\.)|(?P<t_AT>\\@)|(?P<t_RBRACKET>\\])|(?P<t_EQUALSIGN>\\=)|(?P<t_EXCLAMARK>\\!)', [None, ('t_COLON', 'COLON'), ('t_FLAGSET', 'FLAGSET'), ('t_BEGIN_LOOKAROUND', 'BEGIN_LOOKAROUND'), ('t_BEGIN_ORBLOCK', 'BEGIN_ORBLOCK'), None, None, ('t_STRING', 'STRING'), None, None, None, None, ('t_NON', 'NON'), ('t_FAIL', 'FAIL'), ('t_VARNAME', 'VARNAME'), ('t_INITIAL_ORBLOCK_OF', 'OF'), None, ('t_ANY_comments_whitespace', 'comments_whitespace'), None, None, None, (None, 'NUMBER'), (None, 'PLUS'), (None, 'RPAREN'), (None, 'LBRACKET'), (None, 'LT'), (None, 'SLASH'), (None, 'LPAREN'), (None, 'QUESTMARK'), (None, 'BAR'), (None, 'MINUS'), (None, 'GT'), (None, 'DOT'), (None, 'AT'), (None, 'RBRACKET'), (None, 'EQUALSIGN'), (None, 'EXCLAMARK')])], 'CHARCLASS': [('(?P<t_CHARCLASS_DOT>\\.)|(?P<t_CHARCLASS_op>not:|not\\b|and\\b)|(?P<t_CHARCLASS_varname>\\w{2,})|(?P<t_CHARCLASS_include>\\+\\w+)|(?P<t_CHARCLASS_prop>/\\w+(=\\w+)?)|(?P<t_CHARCLASS_name>:[\\w-]+)|(?P<t_CHARCLASS_escape>(?x)\\\\\n    ( [\\\\abfnrtv]    # Single-character escapes\n    | N\\{[^}]+\\}     # Unicode character name\n    | U[a-fA-F\\d]{8} # 8-digit hex escapes\n    | u[a-fA-F\\d]{4} # 4-digit hex escapes\n    | x[a-fA-F\\d]{2} # 2-digit hex escapes \n    | [0-7]{1,3}     # Octal escapes\n    )(?=[\\s.]))|(?P<t_CHARCLASS_bad_escape>\\\\\\S+)|(?P<t_CHARCLASS_literal>\\S)|(?P<t_ANY_comments_whitespace>(?mx)\n    (\n        [ \\t\\n]+\n        (--.*)?  # comments\n    )+\n    (\n        \\*\\)     # globalmark\n        [ \\t]*\n    )*\n    )', [None, ('t_CHARCLASS_DOT', 'DOT'), ('t_CHARCLASS_op', 'op'), ('t_CHARCLASS_varname', 'varname'), ('t_CHARCLASS_include', 'include'), ('t_CHARCLASS_prop', 'prop'), None, ('t_CHARCLASS_name', 'name'), ('t_CHARCLASS_escape', 'escape'), None, ('t_CHARCLASS_bad_escape', 'bad_escape'), ('t_CHARCLASS_literal', 'literal'), ('t_ANY_comments_whitespace', 'comments_whitespace')])]}
+_lexstateignore = {'LOOKAROUND': '', 'ORBLOCK': '', 'INITIAL': ''}
+_lexstateerrorf = {'LOOKAROUND': 't_ANY_error', 'ORBLOCK': 't_ANY_error', 'INITIAL': 't_ANY_error', 'CHARCLASS': 't_ANY_error'}
+_lexstateeoff = {}
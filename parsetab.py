@@ -5,9 +5,9 @@ _tabversion = '3.8'
 
 _lr_method = 'LALR'
 
-_lr_signature = 'B5920F7C94BA82BC202282E80B0E5D08'
+_lr_signature = 'CFBDA8EDCCC9A489BAC9CA4FD422F9C5'
     
-_lr_action_items = {'END_OF_ORBLOCK':([5,13,15,17,24,34,43,45,58,59,60,95,96,99,111,113,122,125,131,132,134,136,137,144,156,166,170,197,199,],[-14,-12,-18,-15,-13,-16,-17,-11,-63,-44,-19,131,-47,-20,-29,-28,-21,-27,-46,-48,-52,-51,-26,-55,-88,-22,-25,-50,-49,]),'DEDENT':([5,6,13,15,17,24,34,37,41,43,45,49,58,59,60,77,80,99,111,113,115,120,121,122,125,131,137,144,148,156,157,162,164,165,166,170,181,182,183,194,],[-14,-6,-12,-18,-15,-13,-16,-98,-7,-17,-11,-8,-63,-44,-19,114,-10,-20,-29,-28,-101,-103,164,-21,-27,-46,-26,-55,-9,-88,-102,-104,-100,-97,-22,-25,-105,-106,-98,-107,]),'BAR':([5,7,9,13,15,17,19,21,24,29,34,36,38,43,45,46,47,54,57,58,59,60,65,73,76,81,90,91,92,93,96,99,111,113,122,125,130,131,134,136,137,142,144,146,147,156,166,170,174,197,199,],[-14,-83,-81,-12,-18,-15,-64,-80,-13,-84,-16,-82,-77,-17,-11,-87,-79,-74,94,-63,-44,-19,101,-86,-85,-78,-65,-73,-72,-75,94,-20,-29,-28,-21,-27,-76,-46,-52,-51,-26,173,-55,175,101,-88,-22,-25,191,-50,-49,]),'LPAREN':([3,6,22,35,72,94,97,148,149,159,161,179,184,193,196,],[28,48,48,28,48,-54,48,-9,-45,48,-108,-109,-110,-111,48,]),'VARNAME':([3,5,6,11,13,15,17,22,24,31,33,34,35,37,40,43,45,56,58,59,60,68,72,78,79,80,83,93,94,97,99,101,103,107,108,111,113,115,117,119,120,122,125,131,133,137,140,144,145,148,149,156,159,161,162,164,165,166,170,179,181,182,183,184,193,194,196,],[7,-14,7,7,-12,-18,-15,7,-13,73,76,-16,7,-98,-71,-17,-11,-70,-63,-44,-19,-68,7,-99,118,-10,-69,7,-54,7,-20,7,7,-66,-67,-29,-28,118,118,163,-103,-21,-27,-46,168,-26,7,-55,7,-9,-45,-88,180,-108,-104,-100,-97,-22,-25,-109,-105,-106,-98,-110,-111,-107,7,]),'GLOBALMARK':([5,13,15,17,24,34,37,43,45,58,59,60,78,79,80,99,111,113,115,120,122,125,131,137,144,156,162,164,165,166,170,181,182,183,194,],[-14,-12,-18,-15,-13,-16,-98,-17,-11,-63,-44,-19,-99,117,-10,-20,-29,-28,117,-103,-21,-27,-46,-26,-55,-88,-104,-100,-97,-22,-25,-105,-106,-98,-107,]),'NUMBER':([3,6,22,27,35,72,89,94,97,148,149,159,161,167,179,184,193,196,],[10,10,10,66,10,10,129,-54,10,-9,-45,10,-108,187,-109,-110,-111,10,]),'LBRACKET':([5,13,15,17,24,34,37,43,45,58,59,60,78,79,80,94,97,99,111,113,115,117,120,122,125,131,137,144,156,159,161,162,164,165,166,170,179,181,182,183,184,193,194,],[-14,-12,-18,-15,-13,-16,-98,-17,-11,-63,-44,-19,-99,119,-10,-54,133,-20,-29,-28,119,119,-103,-21,-27,-46,-26,-55,-88,119,-108,-104,-100,-97,-22,-25,-109,-105,-106,-98,-110,-111,-107,]),'UNDERSCORE':([3,6,22,23,35,72,82,94,97,148,149,159,161,179,184,193,196,],[12,12,12,12,12,12,12,-54,12,-9,-45,12,-108,-109,-110,-111,12,]),'MINUS':([64,127,],[100,-40,]),'DOT':([3,6,10,22,23,27,35,53,54,61,66,72,82,88,93,94,97,101,103,110,128,130,140,143,145,148,149,155,159,161,178,179,184,193,196,],[14,14,53,14,61,69,14,89,91,98,53,14,123,128,-75,-54,14,141,141,154,167,-76,141,69,141,-9,-45,178,14,-108,192,-109,-110,-111,14,]),'EXCLAMARK':([101,103,],[140,145,]),'RPAREN':([70,85,],[109,126,]),'DOUBLEUNDERSCORE':([3,6,11,22,35,40,56,68,72,83,93,94,97,101,103,107,108,140,145,148,149,159,161,179,184,193,196,],[46,46,46,46,46,-71,-70,-68,46,-69,46,-54,46,46,46,-66,-67,46,46,-9,-45,46,-108,-109,-110,-111,46,]),'BEGIN_ORBLOCK':([3,6,22,35,72,94,97,148,149,159,161,179,184,193,196,],[18,18,18,18,18,-54,18,-9,-45,18,-108,-109,-110,-111,18,]),'NEWLINE':([0,7,9,12,18,19,20,21,23,26,29,36,38,46,47,54,61,62,73,76,81,82,90,91,92,93,94,97,98,104,109,112,123,124,130,138,150,151,152,153,154,155,172,173,175,177,180,189,190,191,198,],[3,-83,-81,-24,57,-64,58,-80,60,65,-84,-82,-77,-87,-79,-74,-23,99,-86,-85,-78,122,-65,-73,-72,-75,-54,134,137,147,148,156,-23,166,-76,170,-93,-89,-91,-92,-95,-96,-58,-62,-60,-90,-83,197,-59,-61,-94,]),'FLAGSET':([28,48,],[70,85,]),'LT':([50,63,65,87,147,],[87,87,103,127,103,]),'COLON':([4,8,16,30,44,52,74,86,105,106,116,118,139,180,185,186,195,],[-30,-31,-32,71,84,-35,-33,-41,-34,-36,160,-112,-37,-112,-113,-38,-39,]),'PLUS':([51,127,],[88,-40,]),'$end':([0,1,2,3,5,6,13,15,17,24,34,37,41,42,43,45,49,58,59,60,80,99,111,113,114,122,125,131,137,144,148,156,164,165,166,170,],[-1,0,-2,-3,-14,-6,-12,-18,-15,-13,-16,-98,-7,-4,-17,-11,-8,-63,-44,-19,-10,-20,-29,-28,-5,-21,-27,-46,-26,-55,-9,-88,-100,-97,-22,-25,]),'GT':([7,9,19,21,29,36,38,46,47,54,73,76,81,90,91,92,93,130,142,171,],[-83,-81,-64,-80,-84,-82,-77,-87,-79,-74,-86,-85,-78,-65,-73,-72,-75,-76,172,190,]),'STRING':([3,6,12,14,22,35,39,72,94,97,98,148,149,159,161,179,184,193,196,],[23,23,-24,-23,23,23,82,23,-54,23,138,-9,-45,23,-108,-109,-110,-111,23,]),'END_OF_LOOKAROUND':([102,147,176,],[144,-56,-57,]),'BEGIN_LOOKAROUND':([3,6,22,35,72,94,97,148,149,159,161,179,184,193,196,],[26,26,26,26,26,-54,26,-9,-45,26,-108,-109,-110,-111,26,]),'AT':([3,6,22,35,72,94,97,101,103,140,145,148,149,159,161,179,184,193,196,],[27,27,27,27,27,-54,27,143,143,143,143,-9,-45,27,-108,-109,-110,-111,27,]),'SLASH':([3,6,7,9,14,21,22,27,29,35,36,38,40,46,47,54,55,68,69,72,73,76,81,93,94,97,101,103,130,140,141,143,145,148,149,159,161,179,184,193,196,],[40,40,-83,-81,56,-80,40,68,-84,40,-82,-77,83,-87,-79,92,93,107,108,40,-86,-85,-78,-75,-54,40,40,40,-76,40,56,68,40,-9,-45,40,-108,-109,-110,-111,40,]),'FAIL':([3,6,11,22,35,40,56,68,72,83,93,94,97,101,103,107,108,140,145,148,149,159,161,179,184,193,196,],[29,29,29,29,29,-71,-70,-68,29,-69,29,-54,29,29,29,-66,-67,29,29,-9,-45,29,-108,-109,-110,-111,29,]),'RBRACKET':([163,168,],[185,188,]),'QUESTMARK':([3,6,7,9,21,22,29,35,36,38,46,47,72,73,76,94,97,148,149,159,161,169,179,180,184,193,196,],[32,32,-83,-81,-80,32,-84,32,-82,81,-87,-79,32,-86,-85,-54,32,-9,-45,32,-108,189,-109,-83,-110,-111,32,]),'CHAR':([110,192,],[155,198,]),'NON':([3,6,11,22,35,40,56,68,72,83,93,94,97,101,103,107,108,140,145,148,149,159,161,179,184,193,196,],[33,33,33,33,33,-71,-70,-68,33,-69,33,-54,33,33,33,-66,-67,33,33,-9,-45,33,-108,-109,-110,-111,33,]),'INDENT':([3,5,13,15,17,24,34,37,43,45,58,59,60,99,111,113,122,125,131,137,144,156,166,170,183,],[35,-14,-12,-18,-15,-13,-16,78,-17,-11,-63,-44,-19,-20,-29,-28,-21,-27,-46,-26,-55,-88,-22,-25,78,]),'WHITESPACE':([0,4,8,10,16,25,30,32,52,66,67,71,74,84,86,89,100,105,106,109,116,118,126,129,135,139,150,151,152,153,154,155,160,161,167,179,180,185,186,187,188,189,195,198,],[2,-30,-31,50,-32,63,72,75,-35,75,75,110,-33,110,-41,-42,75,-34,-36,149,158,-112,149,-43,169,-37,-93,110,-91,-92,-95,-96,110,184,75,193,-112,-113,-38,75,-53,196,-39,-94,]),'OF':([50,75,],[86,86,]),'NOT':([3,6,22,35,72,94,97,148,149,159,161,179,184,193,196,],[44,44,44,44,44,-54,44,-9,-45,44,-108,-109,-110,-111,44,]),'EQUALSIGN':([3,6,11,22,35,40,56,68,72,83,93,94,97,101,103,107,108,116,118,140,145,148,149,158,159,161,179,180,184,185,193,196,],[31,31,31,31,31,-71,-70,-68,31,-69,31,-54,31,31,31,-66,-67,161,-112,31,31,-9,-45,179,31,-108,-109,-112,-110,-113,-111,31,]),}
+_lr_action_items = {'DEDENT':([5,6,13,15,17,24,34,37,41,43,45,49,58,59,60,77,80,100,112,114,116,121,122,123,126,132,138,145,150,158,164,166,167,168,169,173,184,185,186,197,],[-14,-6,-12,-18,-15,-13,-16,-98,-7,-17,-11,-8,-63,-44,-19,115,-10,-20,-29,-28,-101,-103,166,-21,-27,-46,-26,-55,-9,-88,-104,-100,-102,-97,-22,-25,-105,-106,-98,-107,]),'END_OF_ORBLOCK':([5,13,15,17,24,34,43,45,58,59,60,96,97,100,112,114,123,126,132,133,135,137,138,145,158,169,173,200,202,],[-14,-12,-18,-15,-13,-16,-17,-11,-63,-44,-19,132,-47,-20,-29,-28,-21,-27,-46,-48,-52,-51,-26,-55,-88,-22,-25,-50,-49,]),'BAR':([5,7,9,13,15,17,19,21,24,29,34,36,38,43,45,46,47,54,57,58,59,60,65,73,76,81,91,92,93,94,96,97,100,103,112,114,123,126,131,132,133,135,137,138,143,145,148,149,158,169,173,177,178,200,202,],[-14,-83,-81,-12,-18,-15,-64,-80,-13,-84,-16,-82,-77,-17,-11,-87,-79,-74,95,-63,-44,-19,102,-86,-85,-78,-72,-65,-73,-75,95,-47,-20,102,-29,-28,-21,-27,-76,-46,-48,-52,-51,-26,176,-55,179,-56,-88,-22,-25,-57,194,-50,-49,]),'LPAREN':([3,6,22,35,72,95,98,150,151,161,163,182,187,196,199,],[28,48,48,28,48,-54,48,-9,-45,48,-108,-109,-110,-111,48,]),'VARNAME':([3,5,6,11,13,15,17,22,24,31,33,34,35,37,40,43,45,54,56,58,59,60,68,72,78,79,80,83,94,95,98,100,102,104,108,109,112,114,116,118,120,121,122,123,126,131,132,134,138,141,145,147,150,151,158,161,163,164,166,167,168,169,173,182,184,185,186,187,196,197,199,],[7,-14,7,7,-12,-18,-15,7,-13,73,76,-16,7,-98,-71,-17,-11,7,-70,-63,-44,-19,-68,7,-99,119,-10,-69,-75,-54,7,-20,7,7,-66,-67,-29,-28,-101,119,165,-103,119,-21,-27,-76,-46,171,-26,7,-55,7,-9,-45,-88,183,-108,-104,-100,-102,-97,-22,-25,-109,-105,-106,-98,-110,-111,-107,7,]),'GLOBALMARK':([5,13,15,17,24,34,37,43,45,58,59,60,78,79,80,100,112,114,116,121,122,123,126,132,138,145,158,164,166,167,168,169,173,184,185,186,197,],[-14,-12,-18,-15,-13,-16,-98,-17,-11,-63,-44,-19,-99,118,-10,-20,-29,-28,-101,-103,118,-21,-27,-46,-26,-55,-88,-104,-100,-102,-97,-22,-25,-105,-106,-98,-107,]),'NUMBER':([3,6,22,27,35,72,89,95,98,150,151,161,163,170,182,187,196,199,],[10,10,10,66,10,10,130,-54,10,-9,-45,10,-108,190,-109,-110,-111,10,]),'LBRACKET':([5,13,15,17,24,34,37,43,45,58,59,60,78,79,80,95,98,100,112,114,116,118,121,122,123,126,132,138,145,158,161,163,164,166,167,168,169,173,182,184,185,186,187,196,197,],[-14,-12,-18,-15,-13,-16,-98,-17,-11,-63,-44,-19,-99,120,-10,-54,134,-20,-29,-28,-101,120,-103,120,-21,-27,-46,-26,-55,-88,120,-108,-104,-100,-102,-97,-22,-25,-109,-105,-106,-98,-110,-111,-107,]),'UNDERSCORE':([3,6,22,23,35,72,82,95,98,150,151,161,163,182,187,196,199,],[12,12,12,12,12,12,12,-54,12,-9,-45,12,-108,-109,-110,-111,12,]),'MINUS':([64,128,],[101,-40,]),'DOT':([3,6,10,22,23,27,35,53,54,61,66,72,82,88,94,95,98,102,104,111,129,131,141,144,147,150,151,152,159,161,163,180,182,187,196,199,],[14,14,53,14,61,69,14,89,93,99,53,14,124,129,-75,-54,14,142,142,157,170,-76,142,69,142,-9,-45,180,157,14,-108,195,-109,-110,-111,14,]),'EXCLAMARK':([102,104,],[141,147,]),'RPAREN':([70,85,],[110,127,]),'DOUBLEUNDERSCORE':([3,6,11,22,35,40,54,56,68,72,83,94,95,98,102,104,108,109,131,141,147,150,151,161,163,182,187,196,199,],[46,46,46,46,46,-71,46,-70,-68,46,-69,-75,-54,46,46,46,-66,-67,-76,46,46,-9,-45,46,-108,-109,-110,-111,46,]),'BEGIN_ORBLOCK':([3,6,22,35,72,95,98,150,151,161,163,182,187,196,199,],[18,18,18,18,18,-54,18,-9,-45,18,-108,-109,-110,-111,18,]),'NEWLINE':([0,7,9,12,18,19,20,21,23,26,29,36,38,46,47,54,61,62,73,76,81,82,91,92,93,94,95,98,99,105,110,113,124,125,131,139,146,152,153,154,155,156,157,175,176,179,181,183,192,193,194,201,],[3,-83,-81,-24,57,-64,58,-80,60,65,-84,-82,-77,-87,-79,-74,-23,100,-86,-85,-78,123,-72,-65,-73,-75,-54,135,138,149,150,158,-23,169,-76,173,177,-96,-93,-89,-91,-92,-95,-58,-62,-60,-90,-83,200,-59,-61,-94,]),'FLAGSET':([28,48,],[70,85,]),'LT':([50,63,65,87,103,149,177,],[87,87,104,128,104,-56,-57,]),'COLON':([4,8,16,30,44,52,74,86,106,107,117,119,140,183,188,189,198,],[-30,-31,-32,71,84,-35,-33,-41,-34,-36,162,-112,-37,-112,-113,-38,-39,]),'PLUS':([51,128,],[88,-40,]),'$end':([0,1,2,3,5,6,13,15,17,24,34,37,41,42,43,45,49,58,59,60,80,100,112,114,115,123,126,132,138,145,150,158,166,168,169,173,],[-1,0,-2,-3,-14,-6,-12,-18,-15,-13,-16,-98,-7,-4,-17,-11,-8,-63,-44,-19,-10,-20,-29,-28,-5,-21,-27,-46,-26,-55,-9,-88,-100,-97,-22,-25,]),'GT':([7,9,19,21,29,36,38,46,47,54,73,76,81,91,92,93,94,131,143,174,],[-83,-81,-64,-80,-84,-82,-77,-87,-79,-74,-86,-85,-78,-72,-65,-73,-75,-76,175,193,]),'STRING':([3,6,12,14,22,35,39,72,95,98,99,150,151,161,163,182,187,196,199,],[23,23,-24,-23,23,23,82,23,-54,23,139,-9,-45,23,-108,-109,-110,-111,23,]),'END_OF_LOOKAROUND':([103,149,177,],[145,-56,-57,]),'BEGIN_LOOKAROUND':([3,6,22,35,72,95,98,150,151,161,163,182,187,196,199,],[26,26,26,26,26,-54,26,-9,-45,26,-108,-109,-110,-111,26,]),'AT':([3,6,22,35,72,95,98,102,104,141,147,150,151,161,163,182,187,196,199,],[27,27,27,27,27,-54,27,144,144,144,144,-9,-45,27,-108,-109,-110,-111,27,]),'SLASH':([3,6,7,9,14,21,22,27,29,35,36,38,40,46,47,54,55,68,69,72,73,76,81,90,94,95,98,102,104,131,141,142,144,147,150,151,161,163,182,187,196,199,],[40,40,-83,-81,56,-80,40,68,-84,40,-82,-77,83,-87,-79,91,94,108,109,40,-86,-85,-78,131,-75,-54,40,40,40,-76,40,56,68,40,-9,-45,40,-108,-109,-110,-111,40,]),'FAIL':([3,6,11,22,35,40,54,56,68,72,83,94,95,98,102,104,108,109,131,141,147,150,151,161,163,182,187,196,199,],[29,29,29,29,29,-71,29,-70,-68,29,-69,-75,-54,29,29,29,-66,-67,-76,29,29,-9,-45,29,-108,-109,-110,-111,29,]),'RBRACKET':([165,171,],[188,191,]),'QUESTMARK':([3,6,7,9,21,22,29,35,36,38,46,47,72,73,76,95,98,150,151,161,163,172,182,183,187,196,199,],[32,32,-83,-81,-80,32,-84,32,-82,81,-87,-79,32,-86,-85,-54,32,-9,-45,32,-108,192,-109,-83,-110,-111,32,]),'CHAR':([111,159,195,],[152,152,201,]),'NON':([3,6,11,22,35,40,54,56,68,72,83,94,95,98,102,104,108,109,131,141,147,150,151,161,163,182,187,196,199,],[33,33,33,33,33,-71,33,-70,-68,33,-69,-75,-54,33,33,33,-66,-67,-76,33,33,-9,-45,33,-108,-109,-110,-111,33,]),'INDENT':([3,5,13,15,17,24,34,37,43,45,58,59,60,100,112,114,123,126,132,138,145,158,169,173,186,],[35,-14,-12,-18,-15,-13,-16,78,-17,-11,-63,-44,-19,-20,-29,-28,-21,-27,-46,-26,-55,-88,-22,-25,78,]),'WHITESPACE':([0,4,8,10,16,25,30,32,52,66,67,71,74,84,86,89,101,106,107,110,113,117,119,127,130,136,140,152,153,154,155,156,157,162,163,170,181,182,183,188,189,190,191,192,198,201,],[2,-30,-31,50,-32,63,72,75,-35,75,75,111,-33,111,-41,-42,75,-34,-36,151,159,160,-112,151,-43,172,-37,-96,-93,-89,-91,-92,-95,111,187,75,-90,196,-112,-113,-38,75,-53,199,-39,-94,]),'OF':([50,75,],[86,86,]),'NOT':([3,6,22,35,72,95,98,150,151,161,163,182,187,196,199,],[44,44,44,44,44,-54,44,-9,-45,44,-108,-109,-110,-111,44,]),'EQUALSIGN':([3,6,11,22,35,40,54,56,68,72,83,94,95,98,102,104,108,109,117,119,131,141,147,150,151,160,161,163,182,183,187,188,196,199,],[31,31,31,31,31,-71,31,-70,-68,31,-69,-75,-54,31,31,31,-66,-67,163,-112,-76,31,31,-9,-45,182,31,-108,-109,-112,-110,-113,-111,31,]),}
 
 _lr_action = {}
 for _k, _v in _lr_action_items.items():
@@ -16,7 +16,7 @@ for _k, _v in _lr_action_items.items():
       _lr_action[_x][_k] = _y
 del _lr_action_items
 
-_lr_goto_items = {'scoped_flags':([3,6,22,35,72,97,159,196,],[22,22,22,22,22,22,22,22,]),'repeat_N_times':([3,6,22,35,72,97,159,196,],[4,4,4,4,4,4,4,4,]),'flagged_expr':([3,6,22,35,72,97,159,196,],[5,5,5,5,5,5,5,5,]),'global_flags':([3,35,],[6,6,]),'backtrack':([10,25,],[51,64,]),'repeat_range':([3,6,22,35,72,97,159,196,],[8,8,8,8,8,8,8,8,]),'backreference':([3,6,11,22,35,72,93,97,101,103,140,145,159,196,],[9,9,9,9,9,9,9,9,9,9,9,9,9,9,]),'charclass':([71,84,160,],[111,125,183,]),'chain_begin':([3,6,22,35,72,97,101,103,140,145,159,196,],[11,11,11,11,11,11,11,11,11,11,11,11,]),'lookup_expr':([3,6,22,35,72,97,159,196,],[13,13,13,13,13,13,13,13,]),'charclass_negation':([3,6,22,35,72,97,159,196,],[15,15,15,15,15,15,15,15,]),'optionalize':([3,6,22,35,72,97,159,196,],[16,16,16,16,16,16,16,16,]),'string_expr':([3,6,22,35,72,97,159,196,],[45,45,45,45,45,45,45,45,]),'lookaround_expr':([3,6,22,35,72,97,159,196,],[17,17,17,17,17,17,17,17,]),'charitem':([110,],[151,]),'ranged_char':([110,],[152,]),'lookup_item':([3,6,11,22,35,72,93,97,101,103,140,145,159,196,],[19,19,55,19,19,19,55,19,19,19,19,19,19,19,]),'single_char':([110,],[153,]),'lookup':([3,6,22,35,72,97,101,103,140,145,159,196,],[20,20,20,20,20,20,142,146,171,174,20,20,]),'assignment':([79,115,117,159,],[120,120,162,181,]),'lookitem':([65,147,],[104,104,]),'optional_subblock':([37,183,],[80,194,]),'chain_end':([54,],[90,]),'negated_lookup':([3,6,11,22,35,72,93,97,101,103,140,145,159,196,],[21,21,21,21,21,21,21,21,21,21,21,21,21,21,]),'oprex':([0,],[1,]),'period_char':([110,],[150,]),'orblock_expr':([3,6,22,35,72,97,159,196,],[24,24,24,24,24,24,24,24,]),'begin_subblock':([37,183,],[79,79,]),'of':([10,32,66,67,100,167,187,],[52,74,105,106,139,186,195,]),'equals':([116,],[159,]),'lookitems':([65,147,],[102,176,]),'numrange':([3,6,22,27,35,72,97,159,196,],[25,25,25,67,25,25,25,25,25,]),'lookup_chain':([11,93,],[54,130,]),'end_subblock':([121,],[165,]),'declaration':([79,115,117,159,],[116,116,116,116,]),'charitems':([71,84,151,160,],[112,112,177,112,]),'quantifier':([3,6,22,35,72,97,159,196,],[30,30,30,30,30,30,30,30,]),'oritem':([57,96,],[96,96,]),'condition':([97,],[135,]),'definition':([79,115,],[115,115,]),'quantified_expr':([3,6,22,35,72,97,159,196,],[34,34,34,34,34,34,34,34,]),'match_until':([3,6,11,22,35,72,93,97,101,103,140,145,159,196,],[36,36,36,36,36,36,36,36,36,36,36,36,36,36,]),'expr':([3,6,22,35,72,97,159,196,],[37,37,59,37,113,136,37,199,]),'lookup_type':([3,6,11,22,35,72,93,97,101,103,140,145,159,196,],[38,38,38,38,38,38,38,38,38,38,38,38,38,38,]),'str_b':([3,6,22,23,35,72,82,97,159,196,],[39,39,39,62,39,39,124,39,39,39,]),'root_expression':([3,35,],[42,77,]),'numrange_shortcut':([3,6,22,35,72,97,159,196,],[43,43,43,43,43,43,43,43,]),'definitions':([79,115,],[121,157,]),'oritems':([57,96,],[95,132,]),'expression':([3,6,35,159,],[41,49,41,182,]),'or':([57,96,],[97,97,]),'variable_lookup':([3,6,11,22,35,72,93,97,101,103,140,145,159,196,],[47,47,47,47,47,47,47,47,47,47,47,47,47,47,]),}
+_lr_goto_items = {'scoped_flags':([3,6,22,35,72,98,161,199,],[22,22,22,22,22,22,22,22,]),'repeat_N_times':([3,6,22,35,72,98,161,199,],[4,4,4,4,4,4,4,4,]),'flagged_expr':([3,6,22,35,72,98,161,199,],[5,5,5,5,5,5,5,5,]),'global_flags':([3,35,],[6,6,]),'backtrack':([10,25,],[51,64,]),'repeat_range':([3,6,22,35,72,98,161,199,],[8,8,8,8,8,8,8,8,]),'backreference':([3,6,11,22,35,54,72,98,102,104,141,147,161,199,],[9,9,9,9,9,9,9,9,9,9,9,9,9,9,]),'charclass':([71,84,162,],[112,126,186,]),'chain_begin':([3,6,22,35,72,98,102,104,141,147,161,199,],[11,11,11,11,11,11,11,11,11,11,11,11,]),'lookup_expr':([3,6,22,35,72,98,161,199,],[13,13,13,13,13,13,13,13,]),'charclass_negation':([3,6,22,35,72,98,161,199,],[15,15,15,15,15,15,15,15,]),'optionalize':([3,6,22,35,72,98,161,199,],[16,16,16,16,16,16,16,16,]),'string_expr':([3,6,22,35,72,98,161,199,],[45,45,45,45,45,45,45,45,]),'lookaround_expr':([3,6,22,35,72,98,161,199,],[17,17,17,17,17,17,17,17,]),'charitem':([111,159,],[154,181,]),'ranged_char':([111,159,],[155,155,]),'lookup_item':([3,6,11,22,35,54,72,98,102,104,141,147,161,199,],[19,19,55,19,19,90,19,19,19,19,19,19,19,19,]),'single_char':([111,159,],[156,156,]),'lookup':([3,6,22,35,72,98,102,104,141,147,161,199,],[20,20,20,20,20,20,143,148,174,178,20,20,]),'assignment':([79,118,122,161,],[121,164,121,184,]),'lookitem':([65,103,],[105,146,]),'optional_subblock':([37,186,],[80,197,]),'chain_end':([54,],[92,]),'negated_lookup':([3,6,11,22,35,54,72,98,102,104,141,147,161,199,],[21,21,21,21,21,21,21,21,21,21,21,21,21,21,]),'oprex':([0,],[1,]),'period_char':([111,159,],[153,153,]),'orblock_expr':([3,6,22,35,72,98,161,199,],[24,24,24,24,24,24,24,24,]),'begin_subblock':([37,186,],[79,79,]),'of':([10,32,66,67,101,170,190,],[52,74,106,107,140,189,198,]),'equals':([117,],[161,]),'lookitems':([65,],[103,]),'numrange':([3,6,22,27,35,72,98,161,199,],[25,25,25,67,25,25,25,25,25,]),'lookup_chain':([11,],[54,]),'end_subblock':([122,],[168,]),'declaration':([79,118,122,161,],[117,117,117,117,]),'charitems':([71,84,162,],[113,113,113,]),'quantifier':([3,6,22,35,72,98,161,199,],[30,30,30,30,30,30,30,30,]),'oritem':([57,96,],[97,133,]),'condition':([98,],[136,]),'definition':([79,122,],[116,167,]),'quantified_expr':([3,6,22,35,72,98,161,199,],[34,34,34,34,34,34,34,34,]),'match_until':([3,6,11,22,35,54,72,98,102,104,141,147,161,199,],[36,36,36,36,36,36,36,36,36,36,36,36,36,36,]),'expr':([3,6,22,35,72,98,161,199,],[37,37,59,37,114,137,37,202,]),'lookup_type':([3,6,11,22,35,54,72,98,102,104,141,147,161,199,],[38,38,38,38,38,38,38,38,38,38,38,38,38,38,]),'str_b':([3,6,22,23,35,72,82,98,161,199,],[39,39,39,62,39,39,125,39,39,39,]),'root_expression':([3,35,],[42,77,]),'numrange_shortcut':([3,6,22,35,72,98,161,199,],[43,43,43,43,43,43,43,43,]),'definitions':([79,],[122,]),'oritems':([57,],[96,]),'expression':([3,6,35,161,],[41,49,41,185,]),'or':([57,96,],[98,98,]),'variable_lookup':([3,6,11,22,35,54,72,98,102,104,141,147,161,199,],[47,47,47,47,47,47,47,47,47,47,47,47,47,47,]),}
 
 _lr_goto = {}
 for _k, _v in _lr_goto_items.items():
@@ -26,117 +26,117 @@ for _k, _v in _lr_goto_items.items():
 del _lr_goto_items
 _lr_productions = [
   ("S' -> oprex","S'",1,None,None,None),
-  ('oprex -> <empty>','oprex',0,'p_oprex','__init__.py',792),
-  ('oprex -> WHITESPACE','oprex',1,'p_oprex','__init__.py',793),
-  ('oprex -> NEWLINE','oprex',1,'p_oprex','__init__.py',794),
-  ('oprex -> NEWLINE root_expression','oprex',2,'p_oprex','__init__.py',795),
-  ('oprex -> NEWLINE INDENT root_expression DEDENT','oprex',4,'p_oprex','__init__.py',796),
-  ('root_expression -> global_flags','root_expression',1,'p_root_expression','__init__.py',815),
-  ('root_expression -> expression','root_expression',1,'p_root_expression','__init__.py',816),
-  ('root_expression -> global_flags expression','root_expression',2,'p_root_expression','__init__.py',817),
-  ('global_flags -> LPAREN FLAGSET RPAREN NEWLINE','global_flags',4,'p_global_flags','__init__.py',833),
-  ('expression -> expr optional_subblock','expression',2,'p_expression','__init__.py',858),
-  ('expr -> string_expr','expr',1,'p_expr','__init__.py',874),
-  ('expr -> lookup_expr','expr',1,'p_expr','__init__.py',875),
-  ('expr -> orblock_expr','expr',1,'p_expr','__init__.py',876),
-  ('expr -> flagged_expr','expr',1,'p_expr','__init__.py',877),
-  ('expr -> lookaround_expr','expr',1,'p_expr','__init__.py',878),
-  ('expr -> quantified_expr','expr',1,'p_expr','__init__.py',879),
-  ('expr -> numrange_shortcut','expr',1,'p_expr','__init__.py',880),
-  ('expr -> charclass_negation','expr',1,'p_expr','__init__.py',881),
-  ('string_expr -> STRING NEWLINE','string_expr',2,'p_string_expr','__init__.py',899),
-  ('string_expr -> STRING str_b NEWLINE','string_expr',3,'p_string_expr','__init__.py',900),
-  ('string_expr -> str_b STRING NEWLINE','string_expr',3,'p_string_expr','__init__.py',901),
-  ('string_expr -> str_b STRING str_b NEWLINE','string_expr',4,'p_string_expr','__init__.py',902),
-  ('str_b -> DOT','str_b',1,'p_str_b','__init__.py',907),
-  ('str_b -> UNDERSCORE','str_b',1,'p_str_b','__init__.py',908),
-  ('numrange_shortcut -> STRING DOT DOT STRING NEWLINE','numrange_shortcut',5,'p_numrange_shortcut','__init__.py',916),
-  ('numrange_shortcut -> STRING DOT DOT NEWLINE','numrange_shortcut',4,'p_numrange_shortcut','__init__.py',917),
-  ('charclass_negation -> NOT COLON charclass','charclass_negation',3,'p_charclass_negation','__init__.py',1110),
-  ('quantified_expr -> quantifier WHITESPACE expr','quantified_expr',3,'p_quantified_expr','__init__.py',1123),
-  ('quantified_expr -> quantifier COLON charclass','quantified_expr',3,'p_quantified_expr','__init__.py',1124),
-  ('quantifier -> repeat_N_times','quantifier',1,'p_quantifier','__init__.py',1129),
-  ('quantifier -> repeat_range','quantifier',1,'p_quantifier','__init__.py',1130),
-  ('quantifier -> optionalize','quantifier',1,'p_quantifier','__init__.py',1131),
-  ('optionalize -> QUESTMARK of','optionalize',2,'p_optionalize','__init__.py',1146),
-  ('repeat_N_times -> AT NUMBER of','repeat_N_times',3,'p_repeat_N_times','__init__.py',1151),
-  ('repeat_N_times -> NUMBER of','repeat_N_times',2,'p_repeat_N_times','__init__.py',1152),
-  ('repeat_range -> AT numrange of','repeat_range',3,'p_repeat_range','__init__.py',1158),
-  ('repeat_range -> numrange backtrack MINUS of','repeat_range',4,'p_repeat_range','__init__.py',1159),
-  ('repeat_range -> NUMBER backtrack PLUS DOT DOT of','repeat_range',6,'p_repeat_range','__init__.py',1160),
-  ('repeat_range -> NUMBER backtrack PLUS DOT DOT NUMBER of','repeat_range',7,'p_repeat_range','__init__.py',1161),
-  ('backtrack -> WHITESPACE LT LT','backtrack',3,'p_backtrack','__init__.py',1186),
-  ('of -> WHITESPACE OF','of',2,'p_of','__init__.py',1190),
-  ('numrange -> NUMBER DOT DOT','numrange',3,'p_numrange','__init__.py',1194),
-  ('numrange -> NUMBER DOT DOT NUMBER','numrange',4,'p_numrange','__init__.py',1195),
-  ('flagged_expr -> scoped_flags expr','flagged_expr',2,'p_flagged_expr','__init__.py',1263),
-  ('scoped_flags -> LPAREN FLAGSET RPAREN WHITESPACE','scoped_flags',4,'p_scoped_flags','__init__.py',1273),
-  ('orblock_expr -> BEGIN_ORBLOCK NEWLINE oritems END_OF_ORBLOCK','orblock_expr',4,'p_orblock_expr','__init__.py',1293),
-  ('oritems -> oritem','oritems',1,'p_oritems','__init__.py',1304),
-  ('oritems -> oritem oritems','oritems',2,'p_oritems','__init__.py',1305),
-  ('oritem -> or condition WHITESPACE QUESTMARK WHITESPACE expr','oritem',6,'p_oritem','__init__.py',1322),
-  ('oritem -> or condition WHITESPACE QUESTMARK NEWLINE','oritem',5,'p_oritem','__init__.py',1323),
-  ('oritem -> or expr','oritem',2,'p_oritem','__init__.py',1324),
-  ('oritem -> or NEWLINE','oritem',2,'p_oritem','__init__.py',1325),
-  ('condition -> LBRACKET VARNAME RBRACKET','condition',3,'p_condition','__init__.py',1351),
-  ('or -> BAR','or',1,'p_or','__init__.py',1357),
-  ('lookaround_expr -> BEGIN_LOOKAROUND NEWLINE lookitems END_OF_LOOKAROUND','lookaround_expr',4,'p_lookaround_expr','__init__.py',1378),
-  ('lookitems -> lookitem NEWLINE','lookitems',2,'p_lookitems','__init__.py',1386),
-  ('lookitems -> lookitem NEWLINE lookitems','lookitems',3,'p_lookitems','__init__.py',1387),
-  ('lookitem -> BAR lookup GT','lookitem',3,'p_lookitem','__init__.py',1400),
-  ('lookitem -> BAR EXCLAMARK lookup GT','lookitem',4,'p_lookitem','__init__.py',1401),
-  ('lookitem -> LT lookup BAR','lookitem',3,'p_lookitem','__init__.py',1402),
-  ('lookitem -> LT EXCLAMARK lookup BAR','lookitem',4,'p_lookitem','__init__.py',1403),
-  ('lookitem -> BAR lookup BAR','lookitem',3,'p_lookitem','__init__.py',1404),
-  ('lookup_expr -> lookup NEWLINE','lookup_expr',2,'p_lookup_expr','__init__.py',1474),
-  ('lookup -> lookup_item','lookup',1,'p_lookup','__init__.py',1479),
-  ('lookup -> chain_begin lookup_chain chain_end','lookup',3,'p_lookup','__init__.py',1480),
-  ('chain_begin -> AT SLASH SLASH','chain_begin',3,'p_chain_begin','__init__.py',1505),
-  ('chain_begin -> AT DOT SLASH','chain_begin',3,'p_chain_begin','__init__.py',1506),
-  ('chain_begin -> AT SLASH','chain_begin',2,'p_chain_begin','__init__.py',1507),
-  ('chain_begin -> SLASH SLASH','chain_begin',2,'p_chain_begin','__init__.py',1508),
-  ('chain_begin -> DOT SLASH','chain_begin',2,'p_chain_begin','__init__.py',1509),
-  ('chain_begin -> SLASH','chain_begin',1,'p_chain_begin','__init__.py',1510),
-  ('chain_end -> SLASH','chain_end',1,'p_chain_end','__init__.py',1515),
-  ('chain_end -> DOT','chain_end',1,'p_chain_end','__init__.py',1516),
-  ('chain_end -> <empty>','chain_end',0,'p_chain_end','__init__.py',1517),
-  ('lookup_chain -> lookup_item SLASH','lookup_chain',2,'p_lookup_chain','__init__.py',1528),
-  ('lookup_chain -> lookup_item SLASH lookup_chain','lookup_chain',3,'p_lookup_chain','__init__.py',1529),
-  ('lookup_item -> lookup_type','lookup_item',1,'p_lookup_item','__init__.py',1544),
-  ('lookup_item -> lookup_type QUESTMARK','lookup_item',2,'p_lookup_item','__init__.py',1545),
-  ('lookup_type -> variable_lookup','lookup_type',1,'p_lookup_type','__init__.py',1552),
-  ('lookup_type -> negated_lookup','lookup_type',1,'p_lookup_type','__init__.py',1553),
-  ('lookup_type -> backreference','lookup_type',1,'p_lookup_type','__init__.py',1554),
-  ('lookup_type -> match_until','lookup_type',1,'p_lookup_type','__init__.py',1555),
-  ('variable_lookup -> VARNAME','variable_lookup',1,'p_variable_lookup','__init__.py',1560),
-  ('variable_lookup -> FAIL','variable_lookup',1,'p_variable_lookup','__init__.py',1561),
-  ('negated_lookup -> NON VARNAME','negated_lookup',2,'p_negated_lookup','__init__.py',1566),
-  ('backreference -> EQUALSIGN VARNAME','backreference',2,'p_backreference','__init__.py',1571),
-  ('match_until -> DOUBLEUNDERSCORE','match_until',1,'p_match_until','__init__.py',1576),
-  ('charclass -> charitems NEWLINE','charclass',2,'p_charclass','__init__.py',1655),
-  ('charitems -> WHITESPACE charitem','charitems',2,'p_charitems','__init__.py',1660),
-  ('charitems -> WHITESPACE charitem charitems','charitems',3,'p_charitems','__init__.py',1661),
-  ('charitem -> ranged_char','charitem',1,'p_charitem','__init__.py',1670),
-  ('charitem -> single_char','charitem',1,'p_charitem','__init__.py',1671),
-  ('charitem -> period_char','charitem',1,'p_charitem','__init__.py',1672),
-  ('ranged_char -> CHAR DOT DOT CHAR','ranged_char',4,'p_ranged_char','__init__.py',1677),
-  ('period_char -> DOT','period_char',1,'p_period_char','__init__.py',1696),
-  ('single_char -> CHAR','single_char',1,'p_single_char','__init__.py',1701),
-  ('optional_subblock -> begin_subblock definitions end_subblock','optional_subblock',3,'p_optional_subblock','__init__.py',1706),
-  ('optional_subblock -> <empty>','optional_subblock',0,'p_optional_subblock','__init__.py',1707),
-  ('begin_subblock -> INDENT','begin_subblock',1,'p_begin_subblock','__init__.py',1716),
-  ('end_subblock -> DEDENT','end_subblock',1,'p_end_subblock','__init__.py',1721),
-  ('definitions -> definition','definitions',1,'p_definitions','__init__.py',1732),
-  ('definitions -> definition definitions','definitions',2,'p_definitions','__init__.py',1733),
-  ('definition -> assignment','definition',1,'p_definition','__init__.py',1741),
-  ('definition -> GLOBALMARK assignment','definition',2,'p_definition','__init__.py',1742),
-  ('assignment -> declaration equals assignment','assignment',3,'p_assignment','__init__.py',1795),
-  ('assignment -> declaration equals expression','assignment',3,'p_assignment','__init__.py',1796),
-  ('assignment -> declaration COLON charclass optional_subblock','assignment',4,'p_assignment','__init__.py',1797),
-  ('equals -> EQUALSIGN','equals',1,'p_equals','__init__.py',1816),
-  ('equals -> WHITESPACE EQUALSIGN','equals',2,'p_equals','__init__.py',1817),
-  ('equals -> EQUALSIGN WHITESPACE','equals',2,'p_equals','__init__.py',1818),
-  ('equals -> WHITESPACE EQUALSIGN WHITESPACE','equals',3,'p_equals','__init__.py',1819),
-  ('declaration -> VARNAME','declaration',1,'p_declaration','__init__.py',1823),
-  ('declaration -> LBRACKET VARNAME RBRACKET','declaration',3,'p_declaration','__init__.py',1824),
+  ('oprex -> <empty>','oprex',0,'p_oprex','__init__.py',815),
+  ('oprex -> WHITESPACE','oprex',1,'p_oprex','__init__.py',816),
+  ('oprex -> NEWLINE','oprex',1,'p_oprex','__init__.py',817),
+  ('oprex -> NEWLINE root_expression','oprex',2,'p_oprex','__init__.py',818),
+  ('oprex -> NEWLINE INDENT root_expression DEDENT','oprex',4,'p_oprex','__init__.py',819),
+  ('root_expression -> global_flags','root_expression',1,'p_root_expression','__init__.py',838),
+  ('root_expression -> expression','root_expression',1,'p_root_expression','__init__.py',839),
+  ('root_expression -> global_flags expression','root_expression',2,'p_root_expression','__init__.py',840),
+  ('global_flags -> LPAREN FLAGSET RPAREN NEWLINE','global_flags',4,'p_global_flags','__init__.py',856),
+  ('expression -> expr optional_subblock','expression',2,'p_expression','__init__.py',881),
+  ('expr -> string_expr','expr',1,'p_expr','__init__.py',897),
+  ('expr -> lookup_expr','expr',1,'p_expr','__init__.py',898),
+  ('expr -> orblock_expr','expr',1,'p_expr','__init__.py',899),
+  ('expr -> flagged_expr','expr',1,'p_expr','__init__.py',900),
+  ('expr -> lookaround_expr','expr',1,'p_expr','__init__.py',901),
+  ('expr -> quantified_expr','expr',1,'p_expr','__init__.py',902),
+  ('expr -> numrange_shortcut','expr',1,'p_expr','__init__.py',903),
+  ('expr -> charclass_negation','expr',1,'p_expr','__init__.py',904),
+  ('string_expr -> STRING NEWLINE','string_expr',2,'p_string_expr','__init__.py',922),
+  ('string_expr -> STRING str_b NEWLINE','string_expr',3,'p_string_expr','__init__.py',923),
+  ('string_expr -> str_b STRING NEWLINE','string_expr',3,'p_string_expr','__init__.py',924),
+  ('string_expr -> str_b STRING str_b NEWLINE','string_expr',4,'p_string_expr','__init__.py',925),
+  ('str_b -> DOT','str_b',1,'p_str_b','__init__.py',930),
+  ('str_b -> UNDERSCORE','str_b',1,'p_str_b','__init__.py',931),
+  ('numrange_shortcut -> STRING DOT DOT STRING NEWLINE','numrange_shortcut',5,'p_numrange_shortcut','__init__.py',939),
+  ('numrange_shortcut -> STRING DOT DOT NEWLINE','numrange_shortcut',4,'p_numrange_shortcut','__init__.py',940),
+  ('charclass_negation -> NOT COLON charclass','charclass_negation',3,'p_charclass_negation','__init__.py',1133),
+  ('quantified_expr -> quantifier WHITESPACE expr','quantified_expr',3,'p_quantified_expr','__init__.py',1146),
+  ('quantified_expr -> quantifier COLON charclass','quantified_expr',3,'p_quantified_expr','__init__.py',1147),
+  ('quantifier -> repeat_N_times','quantifier',1,'p_quantifier','__init__.py',1152),
+  ('quantifier -> repeat_range','quantifier',1,'p_quantifier','__init__.py',1153),
+  ('quantifier -> optionalize','quantifier',1,'p_quantifier','__init__.py',1154),
+  ('optionalize -> QUESTMARK of','optionalize',2,'p_optionalize','__init__.py',1169),
+  ('repeat_N_times -> AT NUMBER of','repeat_N_times',3,'p_repeat_N_times','__init__.py',1174),
+  ('repeat_N_times -> NUMBER of','repeat_N_times',2,'p_repeat_N_times','__init__.py',1175),
+  ('repeat_range -> AT numrange of','repeat_range',3,'p_repeat_range','__init__.py',1181),
+  ('repeat_range -> numrange backtrack MINUS of','repeat_range',4,'p_repeat_range','__init__.py',1182),
+  ('repeat_range -> NUMBER backtrack PLUS DOT DOT of','repeat_range',6,'p_repeat_range','__init__.py',1183),
+  ('repeat_range -> NUMBER backtrack PLUS DOT DOT NUMBER of','repeat_range',7,'p_repeat_range','__init__.py',1184),
+  ('backtrack -> WHITESPACE LT LT','backtrack',3,'p_backtrack','__init__.py',1209),
+  ('of -> WHITESPACE OF','of',2,'p_of','__init__.py',1213),
+  ('numrange -> NUMBER DOT DOT','numrange',3,'p_numrange','__init__.py',1217),
+  ('numrange -> NUMBER DOT DOT NUMBER','numrange',4,'p_numrange','__init__.py',1218),
+  ('flagged_expr -> scoped_flags expr','flagged_expr',2,'p_flagged_expr','__init__.py',1286),
+  ('scoped_flags -> LPAREN FLAGSET RPAREN WHITESPACE','scoped_flags',4,'p_scoped_flags','__init__.py',1296),
+  ('orblock_expr -> BEGIN_ORBLOCK NEWLINE oritems END_OF_ORBLOCK','orblock_expr',4,'p_orblock_expr','__init__.py',1316),
+  ('oritems -> oritem','oritems',1,'p_oritems','__init__.py',1336),
+  ('oritems -> oritems oritem','oritems',2,'p_oritems','__init__.py',1337),
+  ('oritem -> or condition WHITESPACE QUESTMARK WHITESPACE expr','oritem',6,'p_oritem','__init__.py',1364),
+  ('oritem -> or condition WHITESPACE QUESTMARK NEWLINE','oritem',5,'p_oritem','__init__.py',1365),
+  ('oritem -> or expr','oritem',2,'p_oritem','__init__.py',1366),
+  ('oritem -> or NEWLINE','oritem',2,'p_oritem','__init__.py',1367),
+  ('condition -> LBRACKET VARNAME RBRACKET','condition',3,'p_condition','__init__.py',1393),
+  ('or -> BAR','or',1,'p_or','__init__.py',1399),
+  ('lookaround_expr -> BEGIN_LOOKAROUND NEWLINE lookitems END_OF_LOOKAROUND','lookaround_expr',4,'p_lookaround_expr','__init__.py',1420),
+  ('lookitems -> lookitem NEWLINE','lookitems',2,'p_lookitems','__init__.py',1428),
+  ('lookitems -> lookitems lookitem NEWLINE','lookitems',3,'p_lookitems','__init__.py',1429),
+  ('lookitem -> BAR lookup GT','lookitem',3,'p_lookitem','__init__.py',1444),
+  ('lookitem -> BAR EXCLAMARK lookup GT','lookitem',4,'p_lookitem','__init__.py',1445),
+  ('lookitem -> LT lookup BAR','lookitem',3,'p_lookitem','__init__.py',1446),
+  ('lookitem -> LT EXCLAMARK lookup BAR','lookitem',4,'p_lookitem','__init__.py',1447),
+  ('lookitem -> BAR lookup BAR','lookitem',3,'p_lookitem','__init__.py',1448),
+  ('lookup_expr -> lookup NEWLINE','lookup_expr',2,'p_lookup_expr','__init__.py',1518),
+  ('lookup -> lookup_item','lookup',1,'p_lookup','__init__.py',1523),
+  ('lookup -> chain_begin lookup_chain chain_end','lookup',3,'p_lookup','__init__.py',1524),
+  ('chain_begin -> AT SLASH SLASH','chain_begin',3,'p_chain_begin','__init__.py',1549),
+  ('chain_begin -> AT DOT SLASH','chain_begin',3,'p_chain_begin','__init__.py',1550),
+  ('chain_begin -> AT SLASH','chain_begin',2,'p_chain_begin','__init__.py',1551),
+  ('chain_begin -> SLASH SLASH','chain_begin',2,'p_chain_begin','__init__.py',1552),
+  ('chain_begin -> DOT SLASH','chain_begin',2,'p_chain_begin','__init__.py',1553),
+  ('chain_begin -> SLASH','chain_begin',1,'p_chain_begin','__init__.py',1554),
+  ('chain_end -> SLASH','chain_end',1,'p_chain_end','__init__.py',1559),
+  ('chain_end -> DOT','chain_end',1,'p_chain_end','__init__.py',1560),
+  ('chain_end -> <empty>','chain_end',0,'p_chain_end','__init__.py',1561),
+  ('lookup_chain -> lookup_item SLASH','lookup_chain',2,'p_lookup_chain','__init__.py',1572),
+  ('lookup_chain -> lookup_chain lookup_item SLASH','lookup_chain',3,'p_lookup_chain','__init__.py',1573),
+  ('lookup_item -> lookup_type','lookup_item',1,'p_lookup_item','__init__.py',1587),
+  ('lookup_item -> lookup_type QUESTMARK','lookup_item',2,'p_lookup_item','__init__.py',1588),
+  ('lookup_type -> variable_lookup','lookup_type',1,'p_lookup_type','__init__.py',1595),
+  ('lookup_type -> negated_lookup','lookup_type',1,'p_lookup_type','__init__.py',1596),
+  ('lookup_type -> backreference','lookup_type',1,'p_lookup_type','__init__.py',1597),
+  ('lookup_type -> match_until','lookup_type',1,'p_lookup_type','__init__.py',1598),
+  ('variable_lookup -> VARNAME','variable_lookup',1,'p_variable_lookup','__init__.py',1603),
+  ('variable_lookup -> FAIL','variable_lookup',1,'p_variable_lookup','__init__.py',1604),
+  ('negated_lookup -> NON VARNAME','negated_lookup',2,'p_negated_lookup','__init__.py',1609),
+  ('backreference -> EQUALSIGN VARNAME','backreference',2,'p_backreference','__init__.py',1614),
+  ('match_until -> DOUBLEUNDERSCORE','match_until',1,'p_match_until','__init__.py',1619),
+  ('charclass -> charitems NEWLINE','charclass',2,'p_charclass','__init__.py',1698),
+  ('charitems -> WHITESPACE charitem','charitems',2,'p_charitems','__init__.py',1703),
+  ('charitems -> charitems WHITESPACE charitem','charitems',3,'p_charitems','__init__.py',1704),
+  ('charitem -> ranged_char','charitem',1,'p_charitem','__init__.py',1714),
+  ('charitem -> single_char','charitem',1,'p_charitem','__init__.py',1715),
+  ('charitem -> period_char','charitem',1,'p_charitem','__init__.py',1716),
+  ('ranged_char -> CHAR DOT DOT CHAR','ranged_char',4,'p_ranged_char','__init__.py',1721),
+  ('period_char -> DOT','period_char',1,'p_period_char','__init__.py',1740),
+  ('single_char -> CHAR','single_char',1,'p_single_char','__init__.py',1745),
+  ('optional_subblock -> begin_subblock definitions end_subblock','optional_subblock',3,'p_optional_subblock','__init__.py',1750),
+  ('optional_subblock -> <empty>','optional_subblock',0,'p_optional_subblock','__init__.py',1751),
+  ('begin_subblock -> INDENT','begin_subblock',1,'p_begin_subblock','__init__.py',1760),
+  ('end_subblock -> DEDENT','end_subblock',1,'p_end_subblock','__init__.py',1765),
+  ('definitions -> definition','definitions',1,'p_definitions','__init__.py',1776),
+  ('definitions -> definitions definition','definitions',2,'p_definitions','__init__.py',1777),
+  ('definition -> assignment','definition',1,'p_definition','__init__.py',1784),
+  ('definition -> GLOBALMARK assignment','definition',2,'p_definition','__init__.py',1785),
+  ('assignment -> declaration equals assignment','assignment',3,'p_assignment','__init__.py',1838),
+  ('assignment -> declaration equals expression','assignment',3,'p_assignment','__init__.py',1839),
+  ('assignment -> declaration COLON charclass optional_subblock','assignment',4,'p_assignment','__init__.py',1840),
+  ('equals -> EQUALSIGN','equals',1,'p_equals','__init__.py',1859),
+  ('equals -> WHITESPACE EQUALSIGN','equals',2,'p_equals','__init__.py',1860),
+  ('equals -> EQUALSIGN WHITESPACE','equals',2,'p_equals','__init__.py',1861),
+  ('equals -> WHITESPACE EQUALSIGN WHITESPACE','equals',3,'p_equals','__init__.py',1862),
+  ('declaration -> VARNAME','declaration',1,'p_declaration','__init__.py',1866),
+  ('declaration -> LBRACKET VARNAME RBRACKET','declaration',3,'p_declaration','__init__.py',1867),
 ]
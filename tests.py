@@ -8,8 +8,10 @@ def to_string(x):
     return x
 
 
-import unittest, regex, os
-from __init__ import oprex, OprexSyntaxError
+import unittest, regex, collections, itertools, os, pickle, shutil, subprocess, sys, tempfile, threading, warnings
+import __init__ as oprex_module
+from ply import yacc
+from __init__ import oprex, OprexSyntaxError, OprexWarning
 
 class TestErrorHandling(unittest.TestCase):
     def given(self, oprex_source, expect_error):
@@ -4975,7 +4977,7 @@ class TestOutput(unittest.TestCase):
         self.given(u'''
             '0'..'19'
         ''',
-        expect_regex=br'(?>1\d|\d)(?!\d)')
+        expect_regex=br'(?>1?\d)(?!\d)')
 
         self.given(u'''
             '1'..'19'
@@ -5015,7 +5017,7 @@ class TestOutput(unittest.TestCase):
         self.given(u'''
             '0'..'29'
         ''',
-        expect_regex=br'(?>[12]\d|\d)(?!\d)')
+        expect_regex=br'(?>[12]?\d)(?!\d)')
 
         self.given(u'''
             '2'..'29'
@@ -6274,19 +6276,19 @@ class TestOutput(unittest.TestCase):
             /__/limiter/
                 limiter = 'END'
         ''',
-        expect_regex=br'(?:[^E]++|E(?!ND))++END')
+        expect_regex=br'(?>(?:[^E]|E(?!ND))[^E]*(?:E(?!ND)[^E]*)*)END')
 
         self.given(u'''
             /__/limiter/
                 limiter = .'END'
         ''',
-        expect_regex=br'(?:[^E]++|(?<!\b)E|E(?!ND))++\bEND')
+        expect_regex=br'(?>(?:[^E]|(?!\bEND)E)[^E]*(?:(?!\bEND)E[^E]*)*)\bEND')
 
         self.given(u'''
             /__/limiter/
                 limiter = _'END'
         ''',
-        expect_regex=br'(?:[^E]++|(?<!\B)E|E(?!ND))++\BEND')
+        expect_regex=br'(?>(?:[^E]|(?!\BEND)E)[^E]*(?:(?!\BEND)E[^E]*)*)\BEND')
 
         self.given(u'''
             /__/limiter/
@@ -6298,13 +6300,77 @@ class TestOutput(unittest.TestCase):
             /__/limiter/
                 limiter = .'.'
         ''',
-        expect_regex=br'(?:[^.]++|(?<!\b)\.)++\b\.')
+        expect_regex=br'(?>(?:[^.]|(?!\b\.)\.)[^.]*(?:(?!\b\.)\.[^.]*)*)\b\.')
 
         self.given(u'''
             /__/limiter/
                 limiter = _'.'
         ''',
-        expect_regex=br'(?:[^.]++|(?<!\B)\.)++\B\.')
+        expect_regex=br'(?>(?:[^.]|(?!\B\.)\.)[^.]*(?:(?!\B\.)\.[^.]*)*)\B\.')
+
+        self.given(u'''
+            /__?/limiter/
+                limiter = 'END'
+        ''',
+        expect_regex=br'(?>[^E]*(?:E(?!ND)[^E]*)*)END')
+
+        self.given(u'''
+            /__/limiter/
+                limiter = <<|
+                            |end
+                            |stop
+                            |digit
+
+                    end = 'END'
+                    stop = .'stop'
+        ''',
+        expect_regex=br'(?>(?:[^Es\d]|(?!END|\bstop|\d)[Es\d])[^Es\d]*(?:(?!END|\bstop|\d)[Es\d][^Es\d]*)*)(?:END|\bstop|\d)')
+
+        self.given(u'''
+            /__/limiter/
+                limiter = <<|
+                            |dash
+                            |digit
+
+                    dash = '-'
+        ''',
+        expect_regex=br'[^\-\d]++(?:-|\d)')
+
+        self.given(u'''
+            /__/limiter/
+                limiter = <<|
+                            |/dash/digit/
+                            |end
+
+                    dash: -
+                    end = 'END'
+        ''',
+        expect_regex=br'(?>(?:[^\-E]|(?!-\d|END)[\-E])[^\-E]*(?:(?!-\d|END)[\-E][^\-E]*)*)(?:-\d|END)')
+
+        self.given(u'''
+            /__/limiter/
+                limiter = /digit/dot/digit/
+                    dot: .
+        ''',
+        expect_regex=br'(?>(?:\D|(?!\d\.\d)\d)\D*(?:(?!\d\.\d)\d\D*)*)\d\.\d')
+
+        self.given(u'''
+            /__?/limiter/
+                limiter = '0'..'255'
+        ''',
+        expect_regex=br'(?>[^0-9]*(?:(?!(?>2(?>5[0-5]|[0-4]\d)|1\d{2}|[1-9]\d?+|0)(?!\d))[0-9][^0-9]*)*)(?>2(?>5[0-5]|[0-4]\d)|1\d{2}|[1-9]\d?+|0)(?!\d)')
+
+        self.given(u'''
+            /__?/limiter/
+                limiter = (ignorecase) 'stop'
+        ''',
+        expect_regex=br'(?>[^Ss\u00df\u017f\u1e9e\ufb05-\ufb06]*(?:(?!(?i:stop))[Ss\u00df\u017f\u1e9e\ufb05-\ufb06][^Ss\u00df\u017f\u1e9e\ufb05-\ufb06]*)*)(?i:stop)')
+
+        self.given(u'''
+            /__/limiter/
+                [limiter] = 'END'
+        ''',
+        expect_regex=br'.+?(?P<limiter>END)')
         
         
 class TestMatches(unittest.TestCase):
@@ -9003,8 +9069,1696 @@ class TestMatches(unittest.TestCase):
         expect_full_match=[b'WoZ', b'ATOZ'],
         no_match=[b'Z', b'A TO Z', b'ZOO'],
         partial_match={'PIZZA' : 'PIZ'})
+
+        self.given(u'''
+            /__/END/
+                END = <<|
+                        |stop
+                        |semicolon
+
+                    stop = .'STOP'
+                    semicolon: ;
+        ''',
+        expect_full_match=[b'GO STOP', b'GO;', b'NONSTOP STOP'],
+        no_match=[b'STOP', b';', b'NONSTOP'],
+        partial_match={
+            'GO; STOP' : 'GO;',
+            'GO SSTOP STOP;' : 'GO SSTOP STOP',
+        })
+
+        self.given(u'''
+            /__/END/
+                END = <<|
+                        |/hyphen/digit/
+                        |stop
+
+                    hyphen: -
+                    stop = (ignorecase) 'stop'
+        ''',
+        expect_full_match=[b'GO STOP', b'A-1', b'NON-STO-P-2'],
+        no_match=[b'STOP', b'-1', b'A-B'],
+        partial_match={
+            'GO Stop-1' : 'GO Stop',
+            'GO -STO-P--9-0' : 'GO -STO-P--9',
+        })
         
 
+class TestCompileCache(unittest.TestCase):
+    def setUp(self):
+        oprex_module.clear_cache()
+
+    def test_compile(self):
+        pattern = oprex_module.compile('''
+            /greeting/name/
+                greeting = 'hello '
+                [name]: alpha
+        ''')
+        self.assertEqual(pattern.pattern, r'(?V1w)hello (?P<name>[a-zA-Z])')
+        self.assertEqual(pattern.match('hello w').group('name'), 'w')
+
+        pattern = oprex_module.compile('''
+            'hello'
+        ''', flags=regex.IGNORECASE)
+        self.assertTrue(pattern.match('HELLO'))
+
+    def test_hits_and_misses(self):
+        source = '''
+            @1.. of digit
+        '''
+        first = oprex_module.compile(source)
+        second = oprex_module.compile(source)
+        self.assertIs(first, second)
+        regexes, patterns, _ = oprex_module.cache_info()
+        self.assertEqual((regexes.hits, regexes.misses), (1, 1))
+        self.assertEqual((patterns.hits, patterns.misses), (1, 1))
+
+        # sources differing only in newline style/first-last line comments normalize into the same key
+        oprex_module.compile('  -- comment\r\n            @1.. of digit\r\n        ')
+        regexes, patterns, _ = oprex_module.cache_info()
+        self.assertEqual((regexes.hits, regexes.misses), (2, 1))
+        self.assertEqual((patterns.hits, patterns.misses), (2, 1))
+
+        # different source emitting the same regex string shares the compiled pattern
+        oprex_module.compile('\n@1.. of digit\n')
+        regexes, patterns, _ = oprex_module.cache_info()
+        self.assertEqual((regexes.hits, regexes.misses), (2, 2))
+        self.assertEqual((patterns.hits, patterns.misses), (3, 1))
+
+        # same regex string, different flags --> different pattern object
+        oprex_module.compile(source, flags=regex.IGNORECASE)
+        regexes, patterns, _ = oprex_module.cache_info()
+        self.assertEqual((regexes.hits, regexes.misses), (3, 2))
+        self.assertEqual((patterns.hits, patterns.misses), (3, 2))
+
+    def test_errors_not_cached(self):
+        source = '''
+            undefined
+        '''
+        for _ in range(2):
+            self.assertRaises(OprexSyntaxError, oprex_module.compile, source)
+        regexes, patterns, _ = oprex_module.cache_info()
+        self.assertEqual((regexes.hits, regexes.misses, regexes.currsize), (0, 2, 0))
+
+    def test_eviction(self):
+        cache = oprex_module.LRUCache(maxsize=2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.get('a')
+        cache.put('c', 3) # evicts the least-recently used, i.e. 'b'
+        self.assertEqual(cache.get('b'), None)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.get('c'), 3)
+        self.assertEqual(cache.info(), oprex_module.CacheInfo(hits=3, misses=1, evictions=1, currsize=2, maxsize=2))
+
+    def test_size_aware_eviction(self):
+        cache = oprex_module.LRUCache(maxsize=10, sizeof=len)
+        cache.put('a', 'xxxx')
+        cache.put('b', 'yyyy')
+        cache.put('c', 'zzzz') # total 12 > 10, evicts 'a'
+        self.assertEqual(cache.get('a'), None)
+        self.assertEqual(cache.info().currsize, 8)
+        cache.put('d', 'w' * 11) # larger than the whole cache, not kept
+        self.assertEqual(cache.get('d'), None)
+        self.assertEqual(cache.info().evictions, 1)
+
+
+class TestNumRange(unittest.TestCase):
+    def setUp(self):
+        oprex_module.clear_cache()
+
+    def test_cached(self):
+        first = oprex_module.numrange_regex('o1', '12', lineno=2)
+        second = oprex_module.numrange_regex('o1', '12', lineno=5)
+        self.assertEqual(first, second)
+        self.assertEqual(first, r'(?>1[0-2]|0?+[1-9])(?!\d)')
+        numranges = oprex_module.cache_info().numranges
+        self.assertEqual((numranges.hits, numranges.misses), (1, 1))
+
+        oprex_module.numrange_regex('1', '12', lineno=2) # the o-led-ness is part of the key
+        numranges = oprex_module.cache_info().numranges
+        self.assertEqual((numranges.hits, numranges.misses), (1, 2))
+
+    def test_errors_not_cached(self):
+        for lineno in (2, 3):
+            with self.assertRaises(OprexSyntaxError) as cm:
+                oprex_module.numrange_regex('12', '1', lineno)
+            self.assertEqual(cm.exception.lineno, lineno)
+        self.assertEqual(oprex_module.cache_info().numranges.currsize, 0)
+
+    def test_many_digits(self):
+        low, high = '1' + '3' * 29, '8' + '1' * 39
+        value = oprex_module.numrange_regex(low, high, lineno=2)
+        pattern = regex.compile(value)
+        for number in (low, high, '5' * 35, '1' + '3' * 28 + '4'):
+            self.assertTrue(pattern.fullmatch(number))
+        for number in ('1' + '3' * 28 + '2', '8' + '1' * 38 + '2', '9' * 40, '5' * 29):
+            self.assertFalse(pattern.fullmatch(number))
+
+        # deeper than the recursion limit (too deeply nested for the regex module to compile, though)
+        low, high = '1' + '3' * 599, '8' + '1' * 799
+        value = oprex_module.numrange_regex(low, high, lineno=2)
+        self.assertTrue(value.endswith(r'(?!\d)'))
+
+
+class TestDiskCache(unittest.TestCase):
+    source = '''
+        /greeting/name/
+            greeting = 'hello '
+            [name]: alpha
+    '''
+
+    def setUp(self):
+        self.directory = os.path.join(tempfile.mkdtemp(), 'cache')
+        oprex_module.clear_cache()
+        oprex_module.set_disk_cache(self.directory)
+
+    def tearDown(self):
+        oprex_module.set_disk_cache(None)
+        shutil.rmtree(os.path.dirname(self.directory))
+
+    def test_translation_roundtrip(self):
+        disk_cache = oprex_module.disk_cache
+        pattern = oprex_module.compile(self.source)
+        self.assertEqual((disk_cache.hits, disk_cache.misses), (0, 1))
+        self.assertEqual(len(os.listdir(self.directory)), 1)
+
+        oprex_module.clear_cache() # simulates a fresh process: memory empty, disk populated
+        self.assertEqual(oprex_module.compile(self.source).pattern, pattern.pattern)
+        self.assertEqual((disk_cache.hits, disk_cache.misses), (1, 1))
+
+        normalized = '\n'.join(oprex_module.sanitize(self.source))
+        translation = disk_cache.get(normalized)
+        self.assertEqual(translation.regex, r'(?V1w)hello (?P<name>[a-zA-Z])')
+        self.assertEqual(translation.capture_names, ['name'])
+
+    def test_key(self):
+        disk_cache = oprex_module.disk_cache
+        self.assertEqual(disk_cache.path_for('x'), disk_cache.path_for('x'))
+        self.assertNotEqual(disk_cache.path_for('x'), disk_cache.path_for('y'))
+        self.assertNotEqual(disk_cache.path_for('x'), disk_cache.path_for('x', oprex_module.Options(share_definitions=0)))
+
+        class OtherFormat(oprex_module.DiskCache):
+            FORMAT = 'other'
+        self.assertNotEqual(disk_cache.path_for('x'), OtherFormat(self.directory).path_for('x'))
+
+    def test_corrupt_entry(self):
+        disk_cache = oprex_module.disk_cache
+        oprex_module.compile(self.source)
+        filename, = os.listdir(self.directory)
+        with open(os.path.join(self.directory, filename), 'wb') as f:
+            f.write(b'{"regex": ')
+
+        oprex_module.clear_cache()
+        pattern = oprex_module.compile(self.source) # corrupt entry is a miss, then gets rewritten
+        self.assertEqual(pattern.pattern, r'(?V1w)hello (?P<name>[a-zA-Z])')
+        self.assertEqual((disk_cache.hits, disk_cache.misses), (0, 2))
+        self.assertEqual(os.listdir(self.directory), [filename]) # no leftover temp files
+
+    def test_same_as_fresh(self):
+        source = '''
+            /x/dash/
+                x = <<|
+                      |/a/FAIL!/
+                      |a
+
+                    a = 'a'
+                dash = '-'
+        '''
+        options = oprex_module.Options(prune=True, atomize=True)
+        with warnings.catch_warnings(record=True):
+            warnings.simplefilter('always')
+            fresh = oprex_module.translate(oprex_module.sanitize(source), options)
+        self.assertEqual(fresh.pruned, [(3, 'OR-block branch never matches: a(?!)')])
+        disk_cache = oprex_module.disk_cache
+        normalized = '\n'.join(oprex_module.sanitize(source))
+        disk_cache.put(normalized, fresh, options)
+        cached = disk_cache.get(normalized, options)
+        self.assertEqual(cached, fresh)
+        self.assertEqual(cached.pruned[0].lineno, 3)
+
+    def test_unwritable(self):
+        # a cache that can't be written to is no cache, the compile still works
+        with open(self.directory, 'wb') as f: # not a directory
+            f.write(b'')
+        pattern = oprex_module.compile(self.source)
+        self.assertEqual(pattern.pattern, r'(?V1w)hello (?P<name>[a-zA-Z])')
+        self.assertEqual(oprex_module.disk_cache.misses, 1)
+
+        os.remove(self.directory)
+        os.mkdir(self.directory)
+        original_replace = oprex_module.replace_file
+        def failing_replace(source, destination):
+            raise OSError(28, 'No space left on device')
+        oprex_module.replace_file = failing_replace
+        try:
+            oprex_module.clear_cache()
+            self.assertEqual(oprex_module.compile(self.source).pattern, pattern.pattern)
+        finally:
+            oprex_module.replace_file = original_replace
+        self.assertEqual(os.listdir(self.directory), []) # no leftover temp file
+
+
+class TestTables(unittest.TestCase):
+    def test_parsetab_up_to_date(self):
+        pinfo = yacc.ParserReflect(vars(oprex_module))
+        pinfo.get_all()
+        self.assertEqual(pinfo.signature(), oprex_module.parsetab._lr_signature)
+
+    def test_lextab_up_to_date(self):
+        lexer0, _ = oprex_module.build_tables(faststart=False)
+        fast_lexer0, _ = oprex_module.build_tables(faststart=True)
+        def rules_of(lexer):
+            rules = {}
+            for state, lexres in lexer.lexstatere.items():
+                alternatives = []
+                for lexre, _ in lexres:
+                    alternatives.extend(regex.split(r'\|(?=\(\?P<t_)', lexre.pattern))
+                is_function_rule = lambda rule: callable(getattr(oprex_module, regex.match(r'\(\?P<(\w+)>', rule).group(1)))
+                function_rules = [rule for rule in alternatives if is_function_rule(rule)] # order matters
+                string_rules = sorted(rule for rule in alternatives if not is_function_rule(rule)) # ordered by length, ties arbitrary
+                rules[state] = function_rules, string_rules
+            return rules
+        self.assertEqual(rules_of(fast_lexer0), rules_of(lexer0))
+
+    def test_faststart(self):
+        tables = oprex_module.tables
+        oprex_module.tables = oprex_module.build_tables(faststart=True)
+        try:
+            self.assertEqual(oprex('''
+                /greeting/name/
+                    greeting = 'hello '
+                    [name]: alpha
+            '''), r'(?V1w)hello (?P<name>[a-zA-Z])')
+            self.assertRaises(OprexSyntaxError, oprex, '''
+                /to/be/?
+            ''')
+        finally:
+            oprex_module.tables = tables
+
+
+class TestConcurrency(unittest.TestCase):
+    def sample_sources(self):
+        samples_dir = os.path.join(os.path.dirname(__file__) or '.', 'samples')
+        sources = []
+        for filename in sorted(os.listdir(samples_dir)):
+            with open(os.path.join(samples_dir, filename)) as f:
+                sources.append(to_string(f.read()))
+        return sources
+
+    def test_compilers_are_independent(self):
+        compiler1 = oprex_module.Compiler()
+        compiler2 = oprex_module.Compiler()
+        self.assertIsNot(compiler1.parser, compiler2.parser)
+        self.assertIsNot(compiler1.lexer0, compiler2.lexer0)
+        self.assertIsNot(compiler1.flag_dependent_builtins['w'][True], compiler2.flag_dependent_builtins['w'][True])
+
+        lexer1 = compiler1.build_lexer(oprex_module.sanitize('\n/x/\n'))
+        lexer2 = compiler2.build_lexer(oprex_module.sanitize('\n/x/\n'))
+        self.assertIsNot(lexer1.lexstatestack, lexer2.lexstatestack)
+
+    def test_per_thread_compiler(self):
+        compilers = []
+        def collect():
+            compilers.append(oprex_module.get_compiler())
+        threads = [threading.Thread(target=collect) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertIsNot(compilers[0], compilers[1])
+        self.assertIs(oprex_module.get_compiler(), oprex_module.get_compiler())
+
+    def test_concurrent_translation(self):
+        sources = self.sample_sources() + ['''
+            /to/be/?
+        ''', '''
+            (unicode)
+            /alpha/linechar/
+        ''']
+        def translate(source):
+            try:
+                return oprex(source)
+            except OprexSyntaxError as e:
+                return str(e)
+        expected = list(map(translate, sources))
+
+        results = {}
+        def worker(index):
+            for _ in range(5):
+                for i, source in enumerate(sources):
+                    output = translate(source)
+                    if output != expected[i]:
+                        results[index] = (source, output)
+                        return
+        threads = [threading.Thread(target=worker, args=(index,)) for index in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, {})
+
+
+class TestCompileMany(unittest.TestCase):
+    sources = ['''
+        /greeting/name/
+            greeting = 'hello '
+            [name]: alpha
+    ''', '''
+        /to/be/?
+    ''', '''
+        @1.. of digit
+    ''']
+
+    def check(self, results):
+        self.assertEqual(len(results), 3)
+        self.assertEqual(results[0].pattern, r'(?V1w)hello (?P<name>[a-zA-Z])')
+        self.assertTrue(isinstance(results[1], OprexSyntaxError))
+        self.assertEqual(str(results[1]), '''
+Line 2: Unexpected QUESTMARK
+        /to/be/?
+               ^''')
+        self.assertEqual(results[2].pattern, r'(?V1w)\d++')
+
+    def test_serial(self):
+        self.check(oprex_module.compile_many(self.sources, jobs=1))
+
+    def test_parallel(self):
+        self.check(oprex_module.compile_many(self.sources * 10, jobs=2)[:3])
+        parallel = oprex_module.translate_many(self.sources * 10, jobs=3)[27:]
+        serial = oprex_module.translate_many(self.sources, jobs=1)
+        self.assertEqual(list(map(str, parallel)), list(map(str, serial)))
+
+    def test_error_pickling(self):
+        error = pickle.loads(pickle.dumps(OprexSyntaxError(2, 'Unexpected\tQUESTMARK')))
+        self.assertEqual(str(error), '\nLine 2: Unexpected QUESTMARK')
+        self.assertEqual(error.lineno, 2)
+
+    def test_cli(self):
+        directory = tempfile.mkdtemp()
+        try:
+            filenames = []
+            for i, source in enumerate(self.sources):
+                filenames.append(os.path.join(directory, '%d.oprex' % i))
+                with open(filenames[-1], 'wb') as f:
+                    f.write(source.encode('utf-8'))
+            module_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '__init__.py')
+            process = subprocess.Popen([sys.executable, module_path, '--jobs', '2'] + filenames, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            stdout, stderr = process.communicate()
+            self.assertEqual(process.returncode, 1)
+            self.assertEqual(to_string(stdout).splitlines(), [
+                filenames[0] + ': (?V1w)hello (?P<name>[a-zA-Z])',
+                filenames[2] + ': (?V1w)\\d++',
+            ])
+            self.assertTrue(to_string(stderr).startswith(filenames[1] + ':\nLine 2: Unexpected QUESTMARK'))
+        finally:
+            shutil.rmtree(directory)
+
+
+class TestFindColumn(unittest.TestCase):
+    def test_find_column(self):
+        source_lines = oprex_module.sanitize('''
+            /greeting/name/
+                greeting = <<|
+                             |'hello '
+
+                [name]: alpha
+        ''')
+        lexdata = '\n'.join(source_lines)
+        newline_positions = oprex_module.find_newline_positions(source_lines)
+        self.assertEqual(newline_positions, [i for i, char in enumerate(lexdata) if char == '\n'])
+
+        Token = collections.namedtuple('Token', 'lexpos lexer')
+        Lexer = collections.namedtuple('Lexer', 'lexdata newline_positions')
+        lexer = Lexer(lexdata, newline_positions)
+        for lexpos in range(len(lexdata) + 1):
+            expected = lexpos - max(lexdata.rfind('\n', 0, lexpos), 0)
+            self.assertEqual(oprex_module.find_column(Token(lexpos, lexer)), expected)
+
+
+class TestShareDefinitions(unittest.TestCase):
+    layered = '''
+        /line/line/line/
+            line = /word/sep/word/sep/word/
+                word = /alpha/alpha/alpha/
+                sep = <<|
+                        |','
+                        |';'
+    '''
+
+    def translate(self, source, share_definitions=0):
+        return oprex_module.translate(oprex_module.sanitize(source), oprex_module.Options(share_definitions))
+
+    def test_shared(self):
+        translation = self.translate(self.layered)
+        self.assertEqual(translation.regex,
+            r'(?V1w)(?1)(?1)(?1)(?(DEFINE)((?2)(?3)(?2)(?3)(?2))([a-zA-Z][a-zA-Z][a-zA-Z])(,|;))'
+        )
+        self.assertEqual(translation.shared_definitions, ['line', 'sep', 'word'])
+        self.assertEqual(translation.capture_names, [])
+        self.assertEqual(translation.inlined_size, len(oprex(self.layered)))
+
+        shared = regex.compile(translation.regex)
+        inlined = regex.compile(oprex(self.layered))
+        for text in ('abc,def;ghi' * 3, 'abc,def;ghiabc,def;ghiabc,def;gh', 'abc;def;ghi' * 3 + 'x'):
+            self.assertEqual(bool(shared.fullmatch(text)), bool(inlined.fullmatch(text)))
+            self.assertEqual(bool(shared.match(text)), bool(inlined.match(text)))
+
+        # the shared definitions are numbered groups, which don't show in groupdict()
+        text = 'abc,def;ghi' * 3
+        self.assertEqual(shared.fullmatch(text).groupdict(), inlined.fullmatch(text).groupdict())
+        self.assertEqual(shared.groupindex, inlined.groupindex)
+
+    def test_threshold(self):
+        translation = self.translate(self.layered, share_definitions=10)
+        self.assertEqual(translation.shared_definitions, ['line', 'word']) # sep is shorter than 10
+
+        translation = self.translate(self.layered, share_definitions=1000)
+        self.assertEqual(translation.shared_definitions, [])
+        self.assertEqual(translation.regex, oprex(self.layered))
+
+    def test_off_by_default(self):
+        translation = self.translate(self.layered, share_definitions=None)
+        self.assertEqual(translation.shared_definitions, [])
+        self.assertEqual(translation.inlined_size, len(translation.regex))
+
+    def test_inline_only(self):
+        # subroutine calls don't pick up scoped flags, and misbehave in lookbehinds
+        source = '''
+            /a/b/c/a/
+                a = 'abcdefghijklmnopqrstuvwxyz'
+                b = (ignorecase) /d/
+                    d = /a/a/
+                c = <@>
+                    <a|
+                      |a>
+
+        '''
+        translation = self.translate(source)
+        self.assertEqual(translation.shared_definitions, [])
+        self.assertEqual(translation.regex, oprex(source))
+
+    def test_captures_not_shared(self):
+        source = '''
+            /a/b/
+                a = /x/x/x/
+                    x = 'abcdefghijklmnopqrstuvwxyz'
+                [b] = /x/
+                    [x] = 'zz'
+        '''
+        translation = self.translate(source)
+        self.assertEqual(translation.regex,
+            r'(?V1w)(?3)(?3)(?3)(?P<b>(?P<x>zz))(?(DEFINE)(abcdefghijklmnopqrstuvwxyz))'
+        )
+        self.assertEqual(translation.shared_definitions, ['x_4'])
+        self.assertEqual(translation.capture_names, ['b', 'x'])
+        match = regex.match(translation.regex, 'abcdefghijklmnopqrstuvwxyz' * 3 + 'zz')
+        self.assertEqual((match.group('b'), match.group('x')), ('zz', 'zz'))
+        self.assertEqual((match.group(1), match.group(2)), ('zz', 'zz')) # the captures keep their numbers
+
+    def test_numbered(self):
+        # what only reads like a call, in a character class, stays as it is
+        source = '''
+            /line/line/cls/
+                line = /word/sep/word/
+                    word = /alpha/alpha/alpha/
+                    sep = <<|
+                            |','
+                            |';'
+
+                cls: ( ? & l i n e )
+        '''
+        self.assertEqual(self.translate(source).regex,
+            r'(?V1w)(?1)(?1)[(?&line)](?(DEFINE)((?2)(?3)(?2))([a-zA-Z][a-zA-Z][a-zA-Z])(,|;))')
+
+    def test_not_smaller(self):
+        source = '''
+            /x/x/
+                x = 'abcdef'
+        '''
+        translation = self.translate(source)
+        self.assertEqual(translation.regex, '(?V1w)abcdefabcdef')
+        self.assertEqual(translation.shared_definitions, [])
+
+    def test_compile(self):
+        oprex_module.clear_cache()
+        shared = oprex_module.compile(self.layered, share_definitions=0)
+        inlined = oprex_module.compile(self.layered)
+        self.assertTrue('(?(DEFINE)' in shared.pattern)
+        self.assertEqual(inlined.pattern, oprex(self.layered))
+        self.assertEqual(oprex(self.layered, share_definitions=0), shared.pattern)
+        self.assertRaises(TypeError, oprex_module.compile, self.layered, no_such_option=True)
+
+
+class OptionTestCase(unittest.TestCase):
+    def assertSameMatches(self, source, alphabet, length, context='%s', **options):
+        # the translation with the options finds the same matches as the plain one, with and without
+        # IGNORECASE, in every text up to length characters over the alphabet -- both put in the context
+        plain = oprex(source)
+        optimized = oprex(source, **options)
+        texts = [''.join(word) for size in range(length + 1)
+                 for word in itertools.product(sorted(alphabet), repeat=size)]
+        for flags in (0, regex.IGNORECASE):
+            plain_pattern = regex.compile(context % plain, flags)
+            optimized_pattern = regex.compile(context % optimized, flags)
+            for text in texts:
+                plain_match = plain_pattern.search(text)
+                optimized_match = optimized_pattern.search(text)
+                self.assertEqual(plain_match and plain_match.span(), optimized_match and optimized_match.span())
+
+
+class TestFactorLiterals(OptionTestCase):
+    def given(self, branches, expect_regex, atomic=False):
+        head = '@|' if atomic else '<<|'
+        source = '\n' + head + '\n' + ''.join(' ' * (len(head) - 1) + '|' + branch + '\n' for branch in branches) + '\n'
+        self.assertEqual(oprex(source, factor_literals=True), '(?V1w)' + expect_regex)
+        # also where backtracking into the OR-block is needed
+        alphabet = set(''.join(branches).replace("'", '')) | set('xX')
+        self.assertSameMatches(source, alphabet, 3, context='(?:%s)(?:x|)$', factor_literals=True)
+
+    def test_prefix_free(self):
+        self.given(["'cat'", "'car'", "'dog'"], 'ca[tr]|dog')
+        self.given(["'a.b'", "'a.c'", "'a-d'", "'a]'"], r'a(?:\.[bc]|-d|\])')
+        self.given(["'x'", "'y'", "'x'"], '[xy]') # duplicates are harmless
+
+    def test_prefixes(self):
+        self.given(["'cat'", "'car'", "'ca'"], 'cat|car|ca') # the order matters, left as is
+        self.given(["'cat'", "'car'", "'ca'"], '(?>ca[tr]?)', atomic=True)
+        self.given(["'ca'", "'cat'", "'car'"], '(?>ca)', atomic=True) # 'ca' always wins
+        self.given(["'ab'", "'x'", "'abc'", "'a'", "'abd'"], '(?>ab?|x)', atomic=True)
+        self.given(["'x'", "''", "'y'"], '(?>x|)', atomic=True)
+
+    def test_case_variants(self):
+        self.given(["'a'", "'A'"], 'a|A') # same char under ignorecase
+        self.given(["'ab'", "'Ax'"], 'ab|Ax')
+
+    def test_non_literal_branches(self):
+        self.given(["'x'", '/alpha/', "'y'", "'z'"], 'x|[a-zA-Z]|[yz]')
+        self.given(["'ab'", ".'ac'", "'ad'"], r'ab|\bac|ad')
+
+    def test_off(self):
+        self.assertEqual(oprex('''
+            <<|
+              |'cat'
+              |'car'
+        '''), '(?V1w)cat|car')
+
+
+class TestPossessify(OptionTestCase):
+    def given(self, oprex_source, expect_regex, alphabet):
+        self.assertEqual(oprex(oprex_source, possessify=True), expect_regex)
+        self.assertSameMatches(oprex_source, alphabet, 4, possessify=True)
+
+    def test_disjoint_follow(self):
+        self.given('''
+            /digits/comma/
+                digits = 1.. <<- of digit
+                comma = ','
+        ''', r'(?V1w)\d++,', '1,x')
+        self.given('''
+            /key/equals/value/
+                key = 1.. <<- of wordchar
+                equals = '='
+                value = 0.. <<- of non-linechar
+        ''', r'(?V1w)\w++=.*+', 'a=\n')
+        self.given('''
+            /digits/sep/digits/
+                digits = 1.. <<- of digit
+                sep = <<|
+                        |','
+                        |';'
+        ''', r'(?V1w)\d++(?:,|;)\d++', '1,;')
+        self.given('''
+            /letters/digits/
+                letters = 1.. <<- of alpha
+                digits = 1.. <<- of digit
+        ''', r'(?V1w)[a-zA-Z]++\d++', 'a1_')
+
+    def test_overlapping_follow(self):
+        self.given('''
+            /letters/word/
+                letters = 1.. <<- of alpha
+                word = 'ab'
+        ''', '(?V1w)[a-zA-Z]+ab', 'abc')
+        self.given('''
+            /lowers/x/
+                lowers = 1.. <<- of lower
+                x = 'X'
+        ''', '(?V1w)[a-z]+X', 'xX') # X matches x if compiled with IGNORECASE
+        self.given('''
+            /digits/five?/comma/
+                digits = 1.. <<- of digit
+                five = '5'
+                comma = ','
+        ''', r'(?V1w)\d+5?+,', '15,')
+
+    def test_position_dependent_follow(self):
+        self.given('''
+            /word/WOB/
+                word = 1.. <<- of wordchar
+        ''', r'(?V1w)\w+\b', 'a ')
+        self.given('''
+            /line/BOL/
+                line = 0.. <<- of non-linechar
+        ''', '(?V1w).*(?m:^)', 'a\n')
+
+    def test_untouched(self):
+        self.given('''
+            /lazy/comma/
+                lazy = 1 <<+.. of digit
+                comma = ','
+        ''', r'(?V1w)\d+?,', '1,')
+        self.given('''
+            /hours/colon/minutes/
+                hours = 1..2 <<- of digit
+                colon = ':'
+                minutes = 2 of digit
+        ''', r'(?V1w)\d{1,2}+:\d{2}', '1:')
+        self.given('''
+            /pairs/semicolon/
+                pairs = 1.. <<- of pair
+                    pair = /digits/comma/
+                        digits = 1.. <<- of digit
+                        comma = ','
+                semicolon = ';'
+        ''', r'(?V1w)(?:\d+,)+;', '1,;') # possessive inside a backtracking loop can crash regex 2016.6.5
+        self.given('''
+            (version0)
+            /digits/comma/
+                digits = 1.. <<- of digit
+                comma = ','
+        ''', r'(?wV0)\d+,', '1,')
+
+    def test_off(self):
+        self.assertEqual(oprex('''
+            /digits/comma/
+                digits = 1.. <<- of digit
+                comma = ','
+        '''), r'(?V1w)\d+,')
+
+    def test_output_tree(self):
+        samples_dir = os.path.join(os.path.dirname(__file__), 'samples')
+        for filename in sorted(os.listdir(samples_dir)):
+            with open(os.path.join(samples_dir, filename)) as f:
+                output = oprex(f.read())
+            self.assertEqual(oprex_module.unparse(oprex_module.OutputTree(output).root), output)
+
+
+class TestAtomize(OptionTestCase):
+    def given(self, oprex_source, expect_regex, alphabet, expect_atomized=()):
+        source_lines = oprex_module.sanitize(oprex_source)
+        translation = oprex_module.translate(source_lines, oprex_module.Options(atomize=True))
+        self.assertEqual(translation.regex, expect_regex)
+        self.assertEqual(tuple(translation.atomized), expect_atomized)
+        self.assertSameMatches(oprex_source, alphabet, 4, atomize=True)
+
+    def test_exclusive_branches(self):
+        self.given('''
+            /animal/comma/
+                comma = ','
+                animal = <<|
+                           |'cat'
+                           |'dog'
+                           |/digit/alpha/
+        ''', r'(?V1w)(?>cat|dog|\d[a-zA-Z]),', 'cat1,', expect_atomized=(4,))
+        self.given('''
+            /number_or_word/comma/
+                comma = ','
+                number_or_word = <<|
+                                   |1.. <<- of digit
+                                   |1.. <<- of alpha
+        ''', r'(?V1w)(?>\d+|[a-zA-Z]+),', '1a,', expect_atomized=(4,))
+
+    def test_overlapping_branches(self):
+        self.given('''
+            /animal/comma/
+                comma = ','
+                animal = <<|
+                           |'cat'
+                           |'car'
+        ''', '(?V1w)(?:cat|car),', 'catr,')
+        self.given('''
+            /number/comma/
+                comma = ','
+                number = <<|
+                           |1.. <<- of digit
+                           |/digit/dot/digit/
+
+                    dot = '.'
+        ''', r'(?V1w)(?:\d+|\d\.\d),', '1.,')
+        self.given('''
+            /word/comma/
+                comma = ','
+                word = <<|
+                         |'a'
+                         |'b'
+                         |/a/b/
+
+                    a = 1.. <<- of 'a'
+                    b = 1.. <<- of 'b'
+        ''', '(?V1w)(?:a|b|a+b+),', 'ab,')
+
+    def test_untouched(self):
+        self.given('''
+            /comma/animal/
+                comma = ','
+                animal = <<|
+                           |'cat'
+                           |'dog'
+        ''', '(?V1w),(?:cat|dog)', ',cat') # nothing after it that could fail
+        self.given('''
+            /pairs/semicolon/
+                semicolon = ';'
+                pairs = 1.. <<- of pair
+                    pair = /animal/comma/
+                        comma = ','
+                        animal = <<|
+                                   |'cat'
+                                   |'dog'
+        ''', '(?V1w)(?:(?:cat|dog),)+;', 'cat,;') # atomic inside a repeat is unreliable in regex 2016.6.5
+        self.given('''
+            /animal/comma/
+                comma = ','
+                animal = @|
+                          |'cat'
+                          |'dog'
+        ''', '(?V1w)(?>cat|dog),', 'cat,') # already atomic
+        self.given('''
+            (version0)
+            /animal/comma/
+                comma = ','
+                animal = <<|
+                           |'cat'
+                           |'dog'
+        ''', '(?wV0)(?:cat|dog),', 'cat,')
+
+    def test_off(self):
+        self.assertEqual(oprex('''
+            /animal/comma/
+                comma = ','
+                animal = <<|
+                           |'cat'
+                           |'dog'
+        '''), '(?V1w)(?:cat|dog),')
+
+
+class TestAnalyze(unittest.TestCase):
+    def given(self, oprex_source, expect_findings):
+        findings = oprex_module.analyze(oprex_source)
+        self.assertEqual([(finding.lineno, finding.severity, finding.kind) for finding in findings], expect_findings)
+
+    def test_nested_quantifiers(self):
+        self.given('''
+            /pairs/semicolon/
+                semicolon = ';'
+                pairs = 1.. <<- of pair
+                    pair = /digits/comma?/
+                        digits = 1.. <<- of digit
+                        comma = ','
+        ''', [(6, 'exponential', 'nested-quantifiers')])
+        self.given('''
+            /pairs/semicolon/
+                semicolon = ';'
+                pairs = 1..5 <<- of pair
+                    pair = /digits/comma?/
+                        digits = 1.. <<- of digit
+                        comma = ','
+        ''', [(6, 'polynomial', 'nested-quantifiers')])
+
+    def test_ambiguous_alternation(self):
+        self.given('''
+            /chars/semicolon/
+                semicolon = ';'
+                chars = 1.. <<- of char
+                    char = <<|
+                             |wordchar
+                             |digit
+        ''', [(5, 'exponential', 'ambiguous-alternation')])
+        self.given('''
+            /words/semicolon/
+                semicolon = ';'
+                words = 1.. <<- of word
+                    word = <<|
+                             |'cat'
+                             |'dog'
+        ''', [])
+
+    def test_adjacent_quantifiers(self):
+        self.given('''
+            /key/equals/value/semicolon/
+                key = 0.. <<- of any
+                equals = '='
+                value = 0.. <<- of any
+                semicolon = ';'
+        ''', [(3, 'polynomial', 'adjacent-quantifiers')])
+        self.given('''
+            /key/equals/value/semicolon/
+                key = 1.. <<- of digit
+                equals = '='
+                value = 1.. <<- of digit
+                semicolon = ';'
+        ''', [])
+
+    def test_nothing_to_retry(self):
+        self.given('''
+            /pairs/semicolon/
+                semicolon = ';'
+                pairs = 1.. <<- of pair
+                    pair = /digits/comma/
+                        digits = 1.. <<- of digit
+                        comma = ','
+        ''', []) # a comma ends every iteration
+        self.given('''
+            /pairs/semicolon/
+                semicolon = ';'
+                pairs = @1.. of pair
+                    pair = /digits/comma?/
+                        digits = 1.. <<- of digit
+                        comma = ','
+        ''', []) # possessive
+        self.given('''
+            /pairs/
+                pairs = 1.. <<- of pair
+                    pair = /digits/comma?/
+                        digits = 1.. <<- of digit
+                        comma = ','
+        ''', []) # nothing after it can fail
+
+    def test_samples(self):
+        samples_dir = os.path.join(os.path.dirname(__file__), 'samples')
+        for filename in sorted(os.listdir(samples_dir)):
+            with open(os.path.join(samples_dir, filename)) as f:
+                self.assertEqual(oprex_module.analyze(f.read()), [])
+
+    def test_refuse(self):
+        source = '''
+            /pairs/semicolon/
+                semicolon = ';'
+                pairs = 1.. <<- of pair
+                    pair = /digits/comma?/
+                        digits = 1.. <<- of digit
+                        comma = ','
+        '''
+        for severity in ('exponential', 'polynomial'):
+            with self.assertRaises(oprex_module.OprexBacktrackingError) as context:
+                oprex(source, refuse_backtracking=severity)
+            self.assertEqual(context.exception.lineno, 6)
+
+        source = '''
+            /key/equals/value/semicolon/
+                key = 0.. <<- of any
+                equals = '='
+                value = 0.. <<- of any
+                semicolon = ';'
+        '''
+        self.assertEqual(oprex(source, refuse_backtracking='exponential'), '(?V1w)(?s:.)*=(?s:.)*;')
+        self.assertRaises(oprex_module.OprexBacktrackingError, oprex, source, refuse_backtracking='polynomial')
+        self.assertRaises(oprex_module.OprexBacktrackingError, oprex_module.compile, source, refuse_backtracking='polynomial')
+        self.assertRaises(ValueError, oprex, source, refuse_backtracking='linear')
+
+        # the shared definitions are checked by their name, before they're numbered
+        layered = TestShareDefinitions.layered
+        self.assertEqual(oprex(layered, share_definitions=0, refuse_backtracking='polynomial'),
+            oprex(layered, share_definitions=0))
+
+    def test_refuse_unparsable(self):
+        self.assertRaises(oprex_module.OprexBacktrackingError, oprex, '''
+            (version0)
+            'a'
+        ''', refuse_backtracking='exponential')
+
+
+class TestSlowInputs(unittest.TestCase):
+    def test_ranked(self):
+        source = '''
+            /digits/even/.
+                digits = 0.. <<- of digit
+                even: 0 2 4 6 8
+        '''
+        found = oprex_module.slow_inputs(source, count=5, budget=0.5, max_length=100)
+        self.assertEqual(len(found), 5)
+        self.assertEqual(sorted(found, key=lambda slow_input: -slow_input.seconds), found)
+        self.assertTrue(all(len(slow_input.text) <= 100 for slow_input in found))
+        self.assertEqual(len(set(slow_input.text for slow_input in found)), 5)
+
+        # what's found, not how long it took (that's up to the machine): long runs of digits, each start
+        # position retrying every split, take quadratic time -- the search gets to them
+        for slow_input in found:
+            longest_run = max([len(run) for run in regex.findall(r'\d+', slow_input.text)] or [0])
+            self.assertGreaterEqual(longest_run, 20, slow_input.text)
+
+
+class TestRequirements(unittest.TestCase):
+    def requirements(self, source, flags=0):
+        return oprex_module.requirements(oprex_module.compile(source, flags))
+
+    def test_samples(self):
+        samples_dir = os.path.join(os.path.dirname(__file__), 'samples')
+        def sample(filename):
+            with open(os.path.join(samples_dir, filename), 'rb') as f:
+                return f.read().decode('utf-8')
+        self.assertEqual(self.requirements(sample('email.oprex')).literals, ('.', '@'))
+        self.assertEqual(self.requirements(sample('ipv4.oprex')).literals, ('.',))
+        self.assertEqual(self.requirements(sample('date.oprex')).chars, frozenset('-/'))
+        self.assertEqual(self.requirements(sample('csv.oprex')), ((), None))
+
+    def test_literals(self):
+        source = """
+            /open/name/close/
+                open = '<title>'
+                name = 1.. <<- of alpha
+                close = '</title>'
+        """
+        self.assertEqual(self.requirements(source), (('</title>', '<title>'), None))
+        # exact neighbors join into one literal, repeats need at least their minimum
+        source = """
+            /ab/ab/digit/
+                ab = 2 of 'ab'
+        """
+        self.assertEqual(self.requirements(source).literals, ('abababab',))
+        source = """
+            /ab/digit/
+                ab = 2.. <<- of 'ab'
+        """
+        self.assertEqual(self.requirements(source).literals, ('abab',))
+        # what every branch of an OR-block has
+        source = """
+            <<|
+              |'foobar'
+              |'fobar'
+        """
+        self.assertEqual(self.requirements(source), (('obar', 'fo'), None))
+
+    def test_chars(self):
+        source = """
+            /digit/sign/digit/
+                sign: + -
+        """
+        self.assertEqual(self.requirements(source), ((), frozenset('+-')))
+        source = """
+            <<|
+              |'+'
+              |'-'
+        """
+        self.assertEqual(self.requirements(source), ((), frozenset('+-')))
+        self.assertEqual(self.requirements("\n/digit/alpha/\n"), ((), None)) # too many to check
+
+    def test_ignorecase(self):
+        self.assertEqual(self.requirements("\n'x@y'\n"), (('x@y',), None))
+        self.assertEqual(self.requirements("\n'x@y'\n", regex.IGNORECASE), (('@',), None))
+        self.assertEqual(self.requirements("\n'xy'\n", regex.IGNORECASE).literals, ())
+
+    def test_scan(self):
+        source = """
+            /user/at/host/
+                user = 1.. <<- of alnum
+                at = '@'
+                host = 1.. <<- of alnum
+        """
+        lines = ['no address here', 'mail bob@example now', '@', 'x@y and z@w']
+        pattern = oprex_module.compile(source)
+        may_match = oprex_module.prefilter(pattern)
+        self.assertEqual([may_match(line) for line in lines], [False, True, False, True])
+        self.assertEqual([match.group() for match in oprex_module.scan(source, lines)], ['bob@example', 'x@y'])
+
+
+class TestPatternSet(unittest.TestCase):
+    def test_automaton(self):
+        automaton = oprex_module.LiteralAutomaton(['he', 'she', 'his', 'hers'])
+        self.assertEqual(automaton.found('ushers'), set(['he', 'she', 'hers']))
+        self.assertEqual(automaton.found('this'), set(['his']))
+        self.assertEqual(automaton.found('hxe'), set())
+
+    def test_search(self):
+        sources = {
+            'date' : """
+                /year/dash/month/
+                    [year] = 4 of digit
+                    dash = '-'
+                    [month] = 2 of digit
+            """,
+            'time' : """
+                /hour/colon/minute/
+                    [hour] = 2 of digit
+                    colon = ':'
+                    [minute] = 2 of digit
+            """,
+            'error' : """
+                /error/space/code/
+                    error = 'ERROR'
+                    [code] = 1.. <<- of digit
+            """,
+            'word' : "\n1.. <<- of alpha\n", # requires nothing, always a candidate
+        }
+        pattern_set = oprex_module.PatternSet(sources)
+        self.assertEqual(len(pattern_set), 4)
+        matches = pattern_set.search('2016-07 09:30 ERROR 404')
+        self.assertEqual(sorted(match.id for match in matches), ['date', 'error', 'time', 'word'])
+        by_id = dict((match.id, match) for match in matches)
+        self.assertEqual(by_id['date'].captures, {'year' : '2016', 'month' : '07'})
+        self.assertEqual(by_id['time'].captures, {'hour' : '09', 'minute' : '30'})
+        self.assertEqual((by_id['error'].start, by_id['error'].end), (14, 23))
+        self.assertEqual(by_id['word'].captures, {})
+
+        self.assertEqual([match.id for match in pattern_set.search('12:34')], ['time'])
+        self.assertEqual(pattern_set.search('-:'), [])
+        # candidates: the patterns whose required literals are there
+        self.assertEqual(sorted(pattern_set.ids[index] for index in pattern_set.candidates('no date: here')),
+            ['time', 'word'])
+
+    def test_same_capture_names(self):
+        # each pattern's captures are its own, same-named ones in other patterns don't interfere
+        sources = [
+            "\n/x/minus/\n    [x]: a b\n    minus: -\n",
+            "\n/x/plus/\n    [x]: c d\n    plus: +\n",
+        ]
+        pattern_set = oprex_module.PatternSet(sources)
+        self.assertEqual(pattern_set.search('b- c+'), [
+            oprex_module.SetMatch(0, 0, 2, {'x' : 'b'}),
+            oprex_module.SetMatch(1, 3, 5, {'x' : 'c'}),
+        ])
+
+    def test_like_search(self):
+        # the same matches as searching with each pattern, also for the ones searched on their own
+        samples_dir = os.path.join(os.path.dirname(__file__), 'samples')
+        sources = []
+        for filename in ('brackets.oprex', 'date.oprex', 'email.oprex', 'quoted-string.oprex', 'time.oprex'):
+            with open(os.path.join(samples_dir, filename), 'rb') as f:
+                sources.append(f.read().decode('utf-8'))
+        pattern_set = oprex_module.PatternSet(sources)
+        patterns = [oprex_module.compile(source) for source in sources]
+        for text in ('{<title>}', "said 'hi\" and \"bye' 12:30:00 AM", 'x@example.com on 2016/07/09', ''):
+            expected = []
+            for index, pattern in enumerate(patterns):
+                match = pattern.search(text)
+                if match:
+                    expected.append(oprex_module.SetMatch(index, match.start(), match.end(), match.groupdict()))
+            self.assertEqual(pattern_set.search(text), expected)
+
+
+class TestMatchShape(unittest.TestCase):
+    def shape(self, source, flags=0):
+        return oprex_module.match_shape(oprex_module.compile(source, flags))
+
+    def test_samples(self):
+        samples_dir = os.path.join(os.path.dirname(__file__), 'samples')
+        def sample(filename):
+            with open(os.path.join(samples_dir, filename), 'rb') as f:
+                return f.read().decode('utf-8')
+        self.assertEqual(self.shape(sample('ipv4.oprex')), (None, 7, 15))
+        self.assertEqual(self.shape(sample('palindrome.oprex')), ('string', 1, None))
+        self.assertEqual(self.shape(sample('csv.oprex')), ('line', 1, None))
+        self.assertEqual(self.shape(sample('css-color.oprex')), (None, 4, 7))
+
+    def test_anchors(self):
+        self.assertEqual(self.shape("\n./digit/\n").anchor, 'string')
+        self.assertEqual(self.shape("\n//digit/\n").anchor, 'line')
+        self.assertEqual(self.shape("\n/digit/.\n").anchor, None)
+        source = """
+            <<|
+              |./digit/
+              |./alpha/
+        """
+        self.assertEqual(self.shape(source).anchor, 'string')
+        source = """
+            <<|
+              |./digit/
+              |/alpha/
+        """
+        self.assertEqual(self.shape(source).anchor, None)
+
+    def test_ignorecase(self):
+        # with full case-folding, 'ffi' matches the single character U+FB03, and U+FB03 matches 'ffi'
+        self.assertEqual(self.shape("\n'ffi'\n"), (None, 3, 3))
+        self.assertEqual(self.shape("\n'ffi'\n", regex.IGNORECASE), (None, 1, 9))
+        self.assertEqual(self.shape("\n'123'\n", regex.IGNORECASE), (None, 3, 3))
+        self.assertTrue(regex.compile(oprex("\n'ffi'\n"), regex.IGNORECASE).match('\ufb03'))
+
+    def test_scan(self):
+        source = """
+            ./key/equals/
+                key = 1.. <<- of alpha
+                equals = '='
+        """
+        pattern = oprex_module.compile(source)
+        may_match = oprex_module.prefilter(pattern)
+        self.assertEqual([may_match(line) for line in ('=', 'a=', 'x = a=b')], [False, True, True])
+        lines = ['key=value', 'not a key=value', 'k=']
+        self.assertEqual([match.group() for match in oprex_module.scan(source, lines)], ['key=', 'k='])
+
+
+class TestPeephole(unittest.TestCase):
+    def given(self, oprex_source, expect_regex, expect_simplified):
+        self.assertEqual(oprex(oprex_source), expect_regex)
+        self.assertEqual(oprex(oprex_source, peephole=True), expect_simplified)
+
+    def simplified(self, regex_source):
+        return oprex_module.optimize(regex_source, oprex_module.Options(peephole=True))[0]
+
+    def test_nested_quantifiers(self):
+        self.given("""
+            /x/
+                x = 1.. <<- of y
+                    y = 1.. <<- of 'a'
+        """,
+        expect_regex='(?V1w)(?:a+)+',
+        expect_simplified='(?V1w)a+')
+        self.assertEqual(self.simplified('(?V1w)(?:x+)?'), '(?V1w)x*')
+        self.assertEqual(self.simplified('(?V1w)(?:x+?)+?'), '(?V1w)x+?')
+        # not a range of counts: never 1 x
+        self.assertEqual(self.simplified('(?V1w)(?:x{2,3})*'), '(?V1w)(?:x{2,3})*')
+        # an inner possessive gives back whole iterations only
+        self.assertEqual(self.simplified('(?V1w)(?:x++)*'), '(?V1w)(?:x++)*')
+        # the same counts, but not tried in the same order: on xxxxz, x{2,6}(?=x?z) would match xxxx
+        self.assertEqual(self.simplified('(?V1w)(?:x{2,3}){1,2}(?=x?z)'), '(?V1w)(?:x{2,3}){1,2}(?=x?z)')
+        self.assertEqual(self.simplified('(?V1w)(?:x{2,3}?){1,2}?(?=x?z)'), '(?V1w)(?:x{2,3}?){1,2}?(?=x?z)')
+        self.assertEqual(regex.match('(?V1w)(?:x{2,3}){1,2}(?=x?z)', 'xxxxz').group(), 'xxx')
+        self.assertEqual(self.simplified('(?V1w)(?:(?:ab){2,}){3}'), '(?V1w)(?:(?:ab){2,}){3}')
+        # unless the outer is possessive
+        self.assertEqual(self.simplified('(?V1w)(?:x{2,3}){1,2}+'), '(?V1w)x{2,6}+')
+
+    def test_flags(self):
+        self.given("""
+            /x/y/
+                x = any
+                y = 'a'
+        """,
+        expect_regex='(?V1w)(?s:.)a',
+        expect_simplified='(?V1ws).a')
+        self.given("""
+            (ignorecase) /x/y/
+                x = 'ab'
+                y = (ignorecase) 'cd'
+        """,
+        expect_regex='(?V1w)(?i:ab(?i:cd))',
+        expect_simplified='(?V1wi)abcd')
+        # the flag only matters for some: kept scoped, but not where it's already on
+        self.assertEqual(self.simplified('(?V1w)(?i:a(?i:b))c'), '(?V1w)(?i:ab)c')
+        # matters nowhere
+        self.assertEqual(self.simplified('(?V1w)(?i:123)(?s:x)'), '(?V1w)123x')
+        # turned off: the pattern may get compiled with the flag on
+        self.assertEqual(self.simplified('(?V1w)(?-i:a)'), '(?V1w)(?-i:a)')
+
+    def test_groups(self):
+        self.assertEqual(self.simplified('(?V1w)(?:x)(?:ab|c)(?:d)'), '(?V1w)x(?:ab|c)d')
+        self.assertEqual(self.simplified('(?V1w)a|(?:b|c)'), '(?V1w)a|b|c')
+        self.assertEqual(self.simplified('(?V1w)(?>(?>a|b))(?>c)'), '(?V1w)(?>a|b)c')
+        self.assertEqual(self.simplified('(?V1w)(?P<x>(?:a|b))'), '(?V1w)(?P<x>a|b)')
+        self.assertEqual(self.simplified('(?V1w)(?:ab)+(?:\\b)?'), '(?V1w)(?:ab)+(?:\\b)?')
+        # would turn into \10
+        self.assertEqual(self.simplified('(?V1w)(?P<x>a)(?:\\1)0'), '(?V1w)(?P<x>a)(?:\\1)0')
+
+    def test_samples(self):
+        samples_dir = os.path.join(os.path.dirname(__file__), 'samples')
+        for filename in sorted(os.listdir(samples_dir)):
+            with open(os.path.join(samples_dir, filename), 'rb') as f:
+                source = f.read().decode('utf-8')
+            regex_source, simplified = oprex(source), oprex(source, peephole=True)
+            self.assertLessEqual(len(simplified), len(regex_source))
+            regex.compile(simplified)
+
+
+class TestPrune(unittest.TestCase):
+    def translate(self, oprex_source, **options):
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            translation = oprex_module.translate(oprex_module.sanitize(oprex_source),
+                oprex_module.Options(prune=True, **options))
+        return translation, [str(warning.message) for warning in caught if warning.category is OprexWarning]
+
+    def given(self, oprex_source, expect_regex, expect_pruned, expect_warnings):
+        translation, caught = self.translate(oprex_source)
+        self.assertEqual(oprex(oprex_source), expect_regex)
+        self.assertEqual(translation.regex, expect_pruned)
+        self.assertEqual(caught, expect_warnings)
+        self.assertEqual(len(translation.pruned), len(expect_warnings))
+
+    def test_dead_branches(self):
+        self.given('''
+            <<|
+              |FAIL!
+              |alpha
+        ''',
+        expect_regex='(?V1w)(?!)|[a-zA-Z]',
+        expect_pruned='(?V1w)[a-zA-Z]',
+        expect_warnings=['Line 2: OR-block branch never matches: (?!)'])
+        self.given('''
+            /x/digit/
+                x = <<|
+                      |/alpha/y/
+                      |'-'
+                      |'+'
+
+                    y = <<|
+                          |FAIL!
+                          |FAIL!
+        ''',
+        expect_regex=r'(?V1w)(?:[a-zA-Z](?:(?!)|(?!))|-|\+)\d',
+        expect_pruned=r'(?V1w)(?:-|\+)\d',
+        expect_warnings=['Line 3: OR-block branch never matches: [a-zA-Z](?:(?!)|(?!))'])
+        # nothing to fall back to: left as it is
+        self.given('''
+            /alpha/FAIL!/
+        ''',
+        expect_regex='(?V1w)[a-zA-Z](?!)',
+        expect_pruned='(?V1w)[a-zA-Z](?!)',
+        expect_warnings=[])
+
+    def test_quantified(self):
+        self.given('''
+            /opt?/alpha/
+                opt = FAIL!
+        ''',
+        expect_regex='(?V1w)(?!)?[a-zA-Z]',
+        expect_pruned='(?V1w)[a-zA-Z]',
+        expect_warnings=['Line 2: quantified expression can only match zero times: (?!)?'])
+        self.given('''
+            2 of FAIL!
+        ''',
+        expect_regex='(?V1w)(?!){2}',
+        expect_pruned='(?V1w)(?!){2}',
+        expect_warnings=[])
+        self.given('''
+            <@>
+             |!FAIL!>
+        ''',
+        expect_regex='(?V1w)(?!(?!))',
+        expect_pruned='(?V1w)',
+        expect_warnings=['negative lookaround always succeeds: (?!(?!))'])
+
+    def test_conditionals(self):
+        # the capture tested is only set in a dead branch
+        self.given('''
+            /x/y/
+                x = <<|
+                      |/az/FAIL!/
+                      |digit
+
+                    [az]: a..z
+                y = <<|
+                      |[az] ? alpha
+                      |digit
+        ''',
+        expect_regex=r'(?V1w)(?:(?P<az>[a-z])(?!)|\d)(?(az)[a-zA-Z]|\d)',
+        expect_pruned=r'(?V1w)\d\d(?(DEFINE)(?P<az>(?!)))',
+        expect_warnings=['Line 3: OR-block branch never matches: (?P<az>[a-z])(?!)',
+                         r'Line 8: condition on a capture never set by then: (?(az)[a-zA-Z]|\d)'])
+        # tested before it's set
+        self.given('''
+            /or/az/
+                [az]: a..z
+                or = <<|
+                       |[az] ? alpha
+                       |digit
+        ''',
+        expect_regex=r'(?V1w)(?(az)[a-zA-Z]|\d)(?P<az>[a-z])',
+        expect_pruned=r'(?V1w)\d(?P<az>[a-z])',
+        expect_warnings=[r'Line 4: condition on a capture never set by then: (?(az)[a-zA-Z]|\d)'])
+        # an else-FAIL! is no dead branch
+        source = '''
+            /opener?/closer/
+                opener = <<|
+                           |paren
+                           |curly
+
+                    [paren]: (
+                    [curly]: {
+
+                closer = <<|
+                           |[paren] ? 1 of: )
+                           |[curly] ? 1 of: }
+                           |FAIL!
+        '''
+        self.assertEqual(self.translate(source)[0].regex, oprex(source))
+        # repeated: a later iteration sees the capture of an earlier one
+        pattern = '(?V1w)(?:(?(x)b|a)(?P<x>c))+'
+        self.assertEqual(oprex_module.optimize(pattern, oprex_module.Options(prune=True))[0], pattern)
+        # a backreference to a capture that's gone can't match either
+        self.assertEqual(oprex_module.optimize('(?V1w)(?:(?P<x>a)(?!)|b)(?:(?P=x)|c)',
+            oprex_module.Options(prune=True))[0], '(?V1w)bc(?(DEFINE)(?P<x>(?!)))')
+
+    def test_group_names_stay(self):
+        # a capture left out stays in the match objects, never set -- as it'd be without pruning
+        source = '''
+            /x/c/
+                x = <<|
+                      |/digit/FAIL!/az/
+                      |digit
+
+                    [az]: a..z
+                c = 'c'
+        '''
+        self.given(source,
+        expect_regex=r'(?V1w)(?:\d(?!)(?P<az>[a-z])|\d)c',
+        expect_pruned=r'(?V1w)\dc(?(DEFINE)(?P<az>(?!)))',
+        expect_warnings=[r'Line 3: OR-block branch never matches: \d(?!)(?P<az>[a-z])'])
+        translation = self.translate(source)[0]
+        self.assertEqual(translation.capture_names, ['az'])
+        for pattern in (oprex_module.compile(source), oprex_module.compile(source, prune=True)):
+            match = pattern.match('1c')
+            self.assertEqual(match.group('az'), None)
+            self.assertEqual(match.groupdict(), {'az': None})
+        # repeated: the group around what's left stays
+        self.assertEqual(oprex_module.optimize('(?V1w)(?:(?P<x>a)(?!)|bc)+', oprex_module.Options(prune=True))[0],
+            '(?V1w)(?:bc)+(?(DEFINE)(?P<x>(?!)))')
+
+    def test_with_other_options(self):
+        source = '''
+            /x/dash/
+                x = <<|
+                      |/a/FAIL!/
+                      |a
+                      |b
+
+                    a = 'a'
+                    b = 'b'
+                dash = '-'
+        '''
+        translation, caught = self.translate(source, atomize=True, peephole=True)
+        self.assertEqual(translation.regex, '(?V1w)(?>a|b)-') # atomize() still recognizes the pruned OR-block
+        self.assertEqual(translation.atomized, [3])
+        self.assertEqual(caught, ['Line 3: OR-block branch never matches: a(?!)'])
+
+
+class TestOrderLookaheads(unittest.TestCase):
+    def given(self, oprex_source, expect_regex, expect_ordered):
+        self.assertEqual(oprex(oprex_source), expect_regex)
+        self.assertEqual(oprex(oprex_source, order_lookaheads=True), expect_ordered)
+
+    def test_cheapest_first(self):
+        self.given('''
+            <@>
+            |has_x>
+            |long>
+            |!dot>
+
+                has_x = /__?/x/
+                    x = 'x'
+                long = @20.. of any
+                dot: .
+        ''',
+        expect_regex=r'(?V1w)(?=[^x]*+x)(?=(?s:.){20,}+)(?!\.)',
+        expect_ordered=r'(?V1w)(?!\.)(?=(?s:.){20,}+)(?=[^x]*+x)')
+        # samples/password-check.oprex is already in order, the same checks written the other way round aren't
+        with open(os.path.join(os.path.dirname(__file__) or '.', 'samples', 'password-check.oprex')) as f:
+            source = f.read()
+        self.assertEqual(oprex(source, order_lookaheads=True), oprex(source))
+        self.given('''
+            (unicode)
+            <@>
+            |has_min_2_symbols>
+            |has_number>
+            |min_length_8>
+
+                min_length_8 = @8.. of any
+                has_number = /__?/digit/
+                has_min_2_symbols = 2 of /__?/non-alnum/
+        ''',
+        expect_regex=r'(?V1wu)(?=(?:\p{Alphanumeric}*+\P{Alphanumeric}){2})(?=\D*+\d)(?=(?s:.){8,}+)',
+        expect_ordered=oprex(source))
+
+    def test_captures_stay(self):
+        # a lookahead with a capture in it is left where it is, the ones around it are ordered apart
+        self.given('''
+            <@>
+            |has_x>
+            |!dot>
+            |cap>
+            |word>
+            |!digit>
+
+                has_x = /__?/x/
+                    x = 'x'
+                dot: .
+                cap = /first/
+                    [first]: alpha
+                word = @3 of alpha
+        ''',
+        expect_regex=r'(?V1w)(?=[^x]*+x)(?!\.)(?=(?P<first>[a-zA-Z]))(?=[a-zA-Z]{3})(?!\d)',
+        expect_ordered=r'(?V1w)(?!\.)(?=[^x]*+x)(?=(?P<first>[a-zA-Z]))(?=[a-zA-Z]{3})(?!\d)')
+        # not next to each other: only at the same position
+        self.given('''
+            /look/alpha/look/
+                look = <@>
+                       |has_x>
+                       |!dot>
+
+                    has_x = /__?/x/
+                        x = 'x'
+                    dot: .
+        ''',
+        expect_regex=r'(?V1w)(?=[^x]*+x)(?!\.)[a-zA-Z](?=[^x]*+x)(?!\.)',
+        expect_ordered=r'(?V1w)(?!\.)(?=[^x]*+x)[a-zA-Z](?!\.)(?=[^x]*+x)')
+
+
+class TestValidator(unittest.TestCase):
+    def test_checks(self):
+        validator = oprex_module.Validator('''
+            <@>
+            |has_x>
+            |long>
+            |!dot>
+            |cap>
+            |word>
+
+                has_x = /__?/x/
+                    x = 'x'
+                long = @10.. of any
+                dot: .
+                cap = /first/
+                    [first]: alpha
+                word = @3 of alpha
+        ''')
+        self.assertEqual([(check.index, check.regex, check.negative) for check in validator.checks], [
+            (4, '[a-zA-Z]{3}', False),
+            (2, r'\.', True),
+            (1, '(?s:.){10,}+', False),
+            (0, '[^x]*+x', False),
+            (3, '(?=(?P<first>[a-zA-Z]))', False), # the rest
+        ])
+        self.assertEqual(validator.failure('.abcdefghijx').index, 4) # the cheapest failing check
+        self.assertEqual(validator.failure('abcx').index, 1)
+        self.assertEqual(validator.failure('abcdefghijk').index, 0)
+        self.assertEqual(validator.failure('ab'), validator.checks[0])
+        self.assertIsNone(validator.failure('abcdefghijx'))
+        self.assertTrue(validator.match('abcdefghijx'))
+        self.assertFalse(validator.match('1bcdefghijx'))
+
+    def test_same_as_pattern(self):
+        with open(os.path.join(os.path.dirname(__file__) or '.', 'samples', 'password-check.oprex')) as f:
+            source = f.read()
+        validator = oprex_module.Validator(source)
+        self.assertEqual(len(validator.checks), 3)
+        for text in ['', 'abc', 'abcdefgh', 'abcdefg1', 'abc def 1!', 'a1!!!!!!', 'a1!', 'Pass word 12']:
+            self.assertEqual(validator.match(text), bool(validator.pattern.match(text)))
+        # lookaheads after something consumed aren't at the start, they're left in the rest
+        validator = oprex_module.Validator('''
+            /alpha/look/
+                look = <@>
+                       |!digit>
+        ''')
+        self.assertEqual([(check.index, check.regex) for check in validator.checks], [(0, r'[a-zA-Z](?!\d)')])
+        self.assertTrue(validator.match('ab'))
+        self.assertFalse(validator.match('a1'))
+
+
+class TestEvaluateCharclasses(unittest.TestCase):
+    def given(self, oprex_source, expect_regex, expect_evaluated):
+        self.assertEqual(oprex(oprex_source), expect_regex)
+        self.assertEqual(oprex(oprex_source, evaluate_charclasses=True), expect_evaluated)
+
+    def test_evaluated(self):
+        self.given('''
+            non-consonant
+                consonant: alpha not vowel
+                    vowel: a i u e o A I U E O
+        ''',
+        expect_regex=r'(?V1w)[^a-zA-Z--aiueoAIUEO]',
+        expect_evaluated=r'(?V1w)[^B-DF-HJ-NP-TV-Zb-df-hj-np-tv-z]')
+        self.given('''
+            a_or_consonant
+                a_or_consonant: A a +consonant
+                    consonant: a..z A..Z not a i u e o A I U E O
+        ''',
+        expect_regex=r'(?V1w)[Aa[a-zA-Z--aiueoAIUEO]]',
+        expect_evaluated=r'(?V1w)[AaB-DF-HJ-NP-TV-Zb-df-hj-np-tv-z]')
+        self.given('''
+            upper_hex
+                upper_hex: /Lu and A..F
+        ''',
+        expect_regex=r'(?V1w)[\p{Lu}&&A-F]',
+        expect_evaluated=r'(?V1w)[A-F]')
+        # with the ASCII flag \d \w \s are known, and come out as such
+        self.given('''
+            (ascii)
+            /hexdigit/notword/
+                hexdigit: digit a..f A..F and lowhex
+                    lowhex: digit a..f
+                notword: not: alnum _ and alnum
+        ''',
+        expect_regex=r'(?V1wa)[\da-fA-F&&\da-f][^a-zA-Z0-9_&&a-zA-Z0-9]',
+        expect_evaluated=r'(?V1wa)[0-9a-f][^0-9A-Za-z]')
+        self.given('''
+            (ascii)
+            digit_only
+                digit_only: digit a..f and digit
+        ''',
+        expect_regex=r'(?V1wa)[\da-f&&\d]',
+        expect_evaluated=r'(?V1wa)\d')
+
+    def test_left_alone(self):
+        for source in [
+            # \d is Unicode's without the ASCII flag
+            '''
+            maestro
+                maestro: m +ae s t r o
+                    ae: +vowel and +hex not +upper
+                        hex: +digit a..f A..F
+                        vowel: a i u e o A I U E O
+            ''',
+            # case-insensitively the engine takes both a..z and A..Z for a letter
+            '''
+            upper_only
+                upper_only: A..Z not a..z
+            ''',
+            # no limit to what it can match
+            '''
+            not_x
+                not_x: /Lu not X
+            ''',
+            '''
+            letter
+                letter: /Alphabetic and a..z
+            ''',
+        ]:
+            self.assertEqual(oprex(source, evaluate_charclasses=True), oprex(source))
+
+    def test_same_matches(self):
+        for text in [
+            '[a-zA-Z--aiueoAIUEO]', '[a-c--[^b]]', r'[\p{Lu}&&A-Za-z]', '[\u0660-\u0669--\u0665]',
+            '[0-9a-f~~a-z]', r'[c[^B]&&A-Z]', r'[Kk\u212a--k]', r'[s\u017f&&\p{Ll}]',
+        ]:
+            for ascii in (False, True):
+                evaluated = oprex_module.evaluated_class(text, ascii)
+                if evaluated is None:
+                    continue
+                for flags in ('', 'i'):
+                    flags = '(?V1%s%s)' % (flags, 'a' if ascii else '')
+                    original = regex.compile(flags + text)
+                    result = regex.compile(flags + evaluated)
+                    for code in range(0x300):
+                        char = '%c' % code
+                        self.assertEqual(bool(result.fullmatch(char)), bool(original.fullmatch(char)), (text, evaluated, flags, char))
+
+
+class TestCanonicalizeCharclasses(unittest.TestCase):
+    def given(self, oprex_source, expect_regex, expect_canonical):
+        self.assertEqual(oprex(oprex_source), expect_regex)
+        self.assertEqual(oprex(oprex_source, canonicalize_charclasses=True), expect_canonical)
+
+    def test_canonical(self):
+        self.given('''
+            /word/digits/id/prop/
+                word: alnum _ digit
+                digits: +digit 0..9
+                id: _ a..z +digit A..Z
+                prop: /Lu z x..y
+        ''',
+        expect_regex=r'(?V1w)[a-zA-Z0-9_\d][\d0-9][_a-z\dA-Z][\p{Lu}zx-y]',
+        expect_canonical=r'(?V1w)[\dA-Z_a-z]\d[\dA-Z_a-z][x-z\p{Lu}]')
+        # with the ASCII flag \d \w \s are exact, and take the place of the ranges they're made of
+        self.given('''
+            (ascii)
+            /word/digits/hex/
+                word: alnum _ digit
+                digits: +digit 0..9
+                hex: a..f 0..9 A..F -
+        ''',
+        expect_regex=r'(?V1wa)[a-zA-Z0-9_\d][\d0-9][a-f0-9A-F\-]',
+        expect_canonical=r'(?V1wa)\w\d[\d\-A-Fa-f]')
+        # set operations are left alone, the classes included in them are canonical already
+        self.given('''
+            non-consonant
+                consonant: alpha not vowel
+                    vowel: a i u e o A I U E O
+        ''',
+        expect_regex=r'(?V1w)[^a-zA-Z--aiueoAIUEO]',
+        expect_canonical=r'(?V1w)[^a-zA-Z--AEIOUaeiou]')
+
+    def test_same_class_same_regex(self):
+        oprex_module.clear_cache()
+        for source in ['''
+            @1.. of hex
+                hex: 0..9 a..f A..F
+        ''', '''
+            @1.. of hex
+                hex: A..F 5..9 +small 0..4
+                    small: c..f a..c
+        ''']:
+            pattern = oprex_module.compile(source, canonicalize_charclasses=True)
+            self.assertEqual(pattern.pattern, r'(?V1w)[0-9A-Fa-f]++')
+        regexes, patterns, _ = oprex_module.cache_info()
+        self.assertEqual((patterns.hits, patterns.misses), (1, 1))
+
+    def test_same_matches(self):
+        for text in ['[ba-c[x-z]y]', r'[\t-\r \s]', r'[\w0-9_\-]', r'[^a-z\dA-Z\p{Lu}]', '[-a]', r'[\]\[\^]']:
+            for ascii in (False, True):
+                canonical = oprex_module.canonical_class(text, ascii)
+                flags = '(?V1a)' if ascii else '(?V1)'
+                original = regex.compile(flags + text)
+                result = regex.compile(flags + canonical)
+                for code in range(0x300):
+                    char = '%c' % code
+                    self.assertEqual(bool(result.fullmatch(char)), bool(original.fullmatch(char)), (text, canonical, char))
+
+
+class TestKeepCaptures(unittest.TestCase):
+    def test_kept(self):
+        source = '''
+            /year/dash/month/dash/day/
+                [year] = @4 of digit
+                [month] = @2 of digit
+                [day] = /d1/d2/
+                    d1: 0..3
+                    d2: digit
+                dash: -
+        '''
+        self.assertEqual(oprex(source), r'(?V1w)(?P<year>\d{4})-(?P<month>\d{2})-(?P<day>[0-3]\d)')
+        self.assertEqual(oprex(source, keep_captures={'year'}), r'(?V1w)(?P<year>\d{4})-\d{2}-[0-3]\d')
+        self.assertEqual(oprex(source, keep_captures=()), r'(?V1w)\d{4}-\d{2}-[0-3]\d')
+
+        pattern = oprex_module.compile(source, keep_captures=['day', 'month'])
+        self.assertEqual(pattern.match('2016-06-05').groupdict(), {'month': '06', 'day': '05'})
+        translation = oprex_module.translate(oprex_module.sanitize(source), oprex_module.Options(keep_captures=['month']))
+        self.assertEqual(translation.capture_names, ['month'])
+        # any iterable of names, the same options whatever order they're in
+        self.assertEqual(oprex_module.Options(keep_captures={'b', 'a'}), oprex_module.Options(keep_captures=['a', 'b', 'a']))
+
+    def test_needed(self):
+        # backreferences, conditionals and recursion need their captures
+        for source, expect_regex in [('''
+            /quote/text/=quote/
+                [quote]: ' "
+                text = @1.. of any
+        ''', r'''(?V1w)(?P<quote>['"])(?s:.)++(?P=quote)'''), ('''
+            /az?/or/other/
+                [az]: a..z
+                [other]: b
+                or = <<|
+                       |[az] ? alpha
+                       |digit
+        ''', r'(?V1w)(?P<az>[a-z])?(?(az)[a-zA-Z]|\d)b'), ('''
+            ./palindrome/.
+                palindrome = <<|
+                               |/letter/palindrome/=letter/
+                               |/letter/=letter/
+                               |letter
+
+                    [letter]: alpha
+        ''', r'(?V1w)\A(?P<palindrome>(?P<letter>[a-zA-Z])(?&palindrome)(?P=letter)|(?P<letter>[a-zA-Z])(?P=letter)|(?P<letter>[a-zA-Z]))\Z'),
+        ]:
+            self.assertEqual(oprex(source, keep_captures=()), expect_regex)
+
+
 class TestSampleFiles(unittest.TestCase):
     def test_sample_files(self):
         try: